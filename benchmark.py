@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Бенчмарк масштабування ScheduleGenerator.
+
+Для кожного розміру набір даних у поточній БД повністю перестворюється (database.seeding),
+після чого генерується розклад для всіх планів. Записуються час, пікова пам'ять Python,
+кількість SQL-запитів і частка виставлених годин. Результати пишуться в JSON-файл.
+
+    python benchmark.py --yes --scales 1 2 4 --output bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from create_schedule import ScheduleGenerator
+from database.models import StudyPlan
+from database.seeding import build_dataset, reset_dataset
+
+# Розмір при scale=1 відповідає константам COUNT_OF_* з test.py
+BASE_SIZE = {
+    'plans': 1,
+    'groups_per_plan': 5,
+    'subgroups_per_group': 2,
+    'courses_per_plan': 6,
+    'courses_per_teacher': 2,
+}
+
+
+def run_case(size, semester, start_date, end_date, strategy, seed):
+    reset_dataset()
+    counts = build_dataset(semester=semester, seed=seed, **size)
+
+    required = placed = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        for study_plan in StudyPlan.objects.order_by('id'):
+            generator = ScheduleGenerator(study_plan, semester, start_date, end_date, strategy=strategy)
+            generator.generate_schedule()
+            needed = sum(generator.lectures_needed.values()) + sum(generator.practices_needed.values())
+            unmet = sum(
+                hours['lecture_hours'] + hours['practice_hours']
+                for hours in generator.unmet_hours.values()
+            ) // generator.HOURS_PER_LESSON
+            required += needed
+            placed += needed - unmet
+    wall_time = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'size': size,
+        'rows': counts,
+        'wall_time_s': round(wall_time, 3),
+        'peak_memory_mb': round(peak / 2 ** 20, 2),
+        'queries': len(queries),
+        'required_lessons': required,
+        'placed_lessons': placed,
+        'placed_share': round(placed / required, 4) if required else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк масштабування ScheduleGenerator")
+    parser.add_argument('--yes', action='store_true',
+                        help="Підтвердити, що всі дані розкладу в поточній БД буде видалено")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4],
+                        help="Множники кількості планів відносно BASE_SIZE")
+    for key, value in BASE_SIZE.items():
+        if key != 'plans':
+            parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=value)
+    parser.add_argument('--semester', type=int, default=2)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 20))
+    parser.add_argument('--end', type=date.fromisoformat, default=date(2025, 5, 31))
+    parser.add_argument('--strategy', choices=ScheduleGenerator.STRATEGIES, default='greedy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default='', help="Мітка запуску, наприклад версія релізу")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    if not args.yes:
+        parser.error("benchmark recreates all schedule data in the configured database; pass --yes")
+
+    results = []
+    for scale in args.scales:
+        size = {key: getattr(args, key) for key in BASE_SIZE if key != 'plans'}
+        size['plans'] = BASE_SIZE['plans'] * scale
+        result = run_case(size, args.semester, args.start, args.end, args.strategy, args.seed)
+        results.append(result)
+        print(f"scale={scale}: {result['wall_time_s']}s, {result['queries']} queries, "
+              f"{result['peak_memory_mb']} MB, placed {result['placed_share']:.1%}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'label': args.label,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'strategy': args.strategy,
+            'semester': [args.start.isoformat(), args.end.isoformat()],
+            'results': results,
+        }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
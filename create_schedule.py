@@ -1,41 +1,129 @@
+import argparse
+import json
 import os
+import sys
 
-from django.db import models, transaction
-from datetime import time, date, timedelta
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connections, models, transaction
+from datetime import date, timedelta
+from collections import Counter, defaultdict
 import logging
 import random
 import django
 
-# Налаштування Django
+# Налаштування Django (при імпорті з manage.py-команд чи views воно вже виконане)
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")  # Вкажіть свій файл налаштувань
-django.setup()
+from django.apps import apps
+if not apps.ready:
+    django.setup()
 
 # Імпорт моделей
-from database.models import StudyPlan, Course, Teacher, Group, Subgroup, Lesson
+from database.models import (
+    StudyPlan, Course, Teacher, Group, Subgroup, Lesson, LessonAttendance, LessonPattern, PatternAttendance,
+    ScheduleVersion, active_version,
+)
+from database.diff import apply_diff
+from database.lessons import save_schedule
+from database.planning import (
+    HOURS_PER_LESSON, LECTURE_TIMESLOTS, MAX_LESSONS_FOR_SUBGROUP, WORK_DAYS, PlannedLesson,
+)
+from database.recurrence import occurrence_dates, occurrence_rows, overlapping, remove_occurrences
+from database.weeks import refresh_weeks
+from database.validation import validate_schedule
+from database.workload import refresh_workload
+from schedule_optimizer import ScheduleOptimizer
+from schedule_solver import ConstraintSolver, Unit
 
 logger = logging.getLogger(__name__)
 
 
+class Occupancy:
+    """Зайнятість викладачів і підгруп у пам'яті, ключі — (id, дата, час)"""
+
+    def __init__(self):
+        self.teacher_slots = set()              # (teacher_id, date, start_time)
+        self.subgroup_slots = set()             # (subgroup_id, date, start_time)
+        self.subgroup_daily = defaultdict(int)  # (subgroup_id, date) -> кількість занять
+        self.teacher_blocked = set()            # (teacher_id, date) — викладач недоступний весь день
+
+    @classmethod
+    def from_db(cls, start_date, end_date, teacher_ids=None, subgroup_ids=None, version=None,
+                exclude_courses=None):
+        """
+        Завантаження наявних занять версії (None — активної) одним запитом по подіях і одним
+        по щотижневих серіях. Якщо задано teacher_ids/subgroup_ids — лише зайнятість цих викладачів і підгруп;
+        заняття курсів exclude_courses (QuerySet Course, що перегенеровуються) слотів не займають.
+        """
+        occupancy = cls()
+        lessons = LessonAttendance.objects.in_version(version)
+        patterns = PatternAttendance.objects.in_version(version)
+        if exclude_courses is not None:
+            lessons = lessons.exclude(lesson__course__in=exclude_courses)
+            patterns = patterns.exclude(pattern__course__in=exclude_courses)
+        if teacher_ids is not None or subgroup_ids is not None:
+            lessons = lessons.filter(
+                models.Q(lesson__course__teacher_id__in=teacher_ids or ())
+                | models.Q(subgroup_id__in=subgroup_ids or ())
+            )
+            patterns = patterns.filter(
+                models.Q(pattern__course__teacher_id__in=teacher_ids or ())
+                | models.Q(subgroup_id__in=subgroup_ids or ())
+            )
+        rows = occurrence_rows(
+            lessons, patterns, ('lesson__course__teacher_id', 'subgroup_id', 'date', 'start_time'), start_date, end_date,
+        )
+        for teacher_id, subgroup_id, day, start_time in rows:
+            occupancy.add(teacher_id, subgroup_id, day, start_time)
+        return occupancy
+
+    def add(self, teacher_id, subgroup_id, day, start_time):
+        self.teacher_slots.add((teacher_id, day, start_time))
+        if (subgroup_id, day, start_time) not in self.subgroup_slots:
+            self.subgroup_slots.add((subgroup_id, day, start_time))
+            self.subgroup_daily[(subgroup_id, day)] += 1
+
+    def remove(self, teacher_id, subgroup_id, day, start_time):
+        """Зворотна до add; слот викладача звільняється, навіть якщо лекція мала кілька підгруп"""
+        self.teacher_slots.discard((teacher_id, day, start_time))
+        if (subgroup_id, day, start_time) in self.subgroup_slots:
+            self.subgroup_slots.discard((subgroup_id, day, start_time))
+            self.subgroup_daily[(subgroup_id, day)] -= 1
+
+    def block_teacher(self, teacher_id, days):
+        self.teacher_blocked.update((teacher_id, day) for day in days)
+
+    def teacher_busy(self, teacher_id, day, start_time):
+        return (
+            (teacher_id, day, start_time) in self.teacher_slots
+            or (teacher_id, day) in self.teacher_blocked
+        )
+
+    def subgroup_busy(self, subgroup_id, day, start_time):
+        return (subgroup_id, day, start_time) in self.subgroup_slots
+
+    def subgroup_load(self, subgroup_id, day):
+        return self.subgroup_daily.get((subgroup_id, day), 0)
+
+
 class ScheduleGenerator:
-    LECTURE_TIMESLOTS = [
-        (time(9, 0), time(10, 20)),
-        (time(10, 30), time(11, 50)),
-        (time(12, 10), time(13, 30)),
-        (time(13, 40), time(15, 0)),
-        (time(15, 10), time(16, 30)),
-        (time(16, 40), time(18, 0)),
-        (time(18, 10), time(19, 30)),
-    ]
-
-    WORK_DAYS = [0, 1, 2, 3, 4]  # Пн-Пт
+    LECTURE_TIMESLOTS = LECTURE_TIMESLOTS  # сітка пар і ліміти — з database.planning
+
+    WORK_DAYS = WORK_DAYS
     LECTURE_DAYS = []
     PRACTICE_DAYS = []
 
-    MAX_LESSONS_FOR_SUBGROUP = 4
+    MAX_LESSONS_FOR_SUBGROUP = MAX_LESSONS_FOR_SUBGROUP
     MAX_LESSONS_FOR_TEACHER = 7 # поки не актуально
 
-    def __init__(self, study_plan, semester, start_date, end_date):
+    BULK_BATCH_SIZE = 1000
+    HOURS_PER_LESSON = HOURS_PER_LESSON
+
+    STRATEGIES = ('greedy', 'csp', 'weekly')
+    SOLVER_TIME_BUDGET = 30  # секунд на пошук для стратегії 'csp'
+    OPTIMIZER_ITERATIONS = 50000
+
+    def __init__(self, study_plan, semester, start_date, end_date, strategy='greedy', time_budget=None,
+                 optimize=False, objective_weights=None, optimizer_iterations=None, version=None):
         self.LECTURE_DAYS = random.sample(self.WORK_DAYS, 2)
         self.PRACTICE_DAYS = [day for day in self.WORK_DAYS if day not in self.LECTURE_DAYS]
 
@@ -43,25 +131,40 @@ class ScheduleGenerator:
         self.semester = semester
         self.start_date = start_date
         self.end_date = end_date
+        self.strategy = strategy
+        self.time_budget = self.SOLVER_TIME_BUDGET if time_budget is None else time_budget
+        # Необов'язкова пост-оптимізація: ваги див. schedule_optimizer.DEFAULT_WEIGHTS
+        self.optimize = optimize
+        self.objective_weights = objective_weights
+        self.optimizer_iterations = optimizer_iterations or self.OPTIMIZER_ITERATIONS
+        # Версія розкладу, яку генератор читає і в яку пише: чернетка (database.versions)
+        # або, за замовчуванням, активна — для часткових змін на кшталт reschedule
+        self.version = version or active_version()
 
         # Перевірка вхідних даних
         self._validate_input()
 
-        self.groups = Group.objects.filter(study_plan=study_plan).prefetch_related('subgroups')
-        self.courses = Course.objects.filter(
+        # Усі довідкові дані завантажуються один раз і далі живуть у пам'яті
+        self.groups = list(Group.objects.filter(study_plan=study_plan))
+        self.courses = list(Course.objects.filter(
             study_plan=study_plan,
             semester=semester
-        ).select_related('teacher')
-        self.subgroups = Subgroup.objects.filter(group__in=self.groups)
+        ).select_related('teacher'))
+        self.subgroups = list(
+            Subgroup.objects.filter(group__study_plan=study_plan).order_by('group_id', 'number')
+        )
 
-        logger.info(f"Initialized with {self.groups.count()} groups, "
-                    f"{self.courses.count()} courses, "
-                    f"{self.subgroups.count()} subgroups")
+        logger.info(f"Initialized with {len(self.groups)} groups, "
+                    f"{len(self.courses)} courses, "
+                    f"{len(self.subgroups)} subgroups")
 
         # Кешування даних
         self.teacher_workload = defaultdict(int)
-        self.group_schedule = defaultdict(list)
-        self.subgroup_schedule = defaultdict(list)
+        self.occupancy = None
+        self.planned_lessons = []
+        self.unmet_hours = {}
+        self.window = (start_date, end_date)
+        self.lectures_needed, self.practices_needed = self._required_counts(self.courses)
 
     def _validate_input(self):
         """Перевірка коректності вхідних параметрів"""
@@ -71,6 +174,9 @@ class ScheduleGenerator:
         if self.start_date > self.end_date:
             raise ValueError("Start date must be before end date")
 
+        if self.strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy {self.strategy!r}, expected one of {self.STRATEGIES}")
+
         logger.info(f"Generating schedule for {self.study_plan.name} "
                     f"(semester {self.semester}) "
                     f"from {self.start_date} to {self.end_date}")
@@ -78,31 +184,277 @@ class ScheduleGenerator:
     def generate_schedule(self):
         """Основна функція генерації розкладу"""
         try:
-            with transaction.atomic():  # Вся транзакція відбувається в цьому блоку
-                self._generate_lectures()
-                self._generate_practices()
-                logger.info("Schedule generated successfully")
-                return self._get_final_schedule()
+            self.plan()
+            with transaction.atomic():  # Один пакетний запис усіх нових занять
+                self._flush()
+                self._refresh_workload(self.courses)
+            logger.info("Schedule generated successfully")
+            return self._get_final_schedule()
         except Exception as e:
             logger.error(f"Schedule generation failed: {str(e)}")
             # Автоматичний rollback відбувається при виході з блоку
             raise
 
-    def _generate_lectures(self):
-        current_date = self.start_date
-        lecture_courses = [c for c in self.courses if c.lecture_hours > 0]
-
+    def dry_run(self, occupancy=None):
+        """
+        Генерація без жодного звернення до БД на запис: розклад лишається в пам'яті
+        і віддається потоком записів PlannedLesson у порядку (дата, час)
+        """
+        self.plan(occupancy)
+        yield from sorted(self.planned_lessons, key=lambda p: (p.date, p.start_time, p.subgroup_id))
+
+    def plan(self, occupancy=None, start_from=None):
+        """
+        Розстановка занять лише в пам'яті, без запису в БД.
+        Спільний occupancy дозволяє кільком генераторам не конфліктувати за викладачів.
+        start_from — ставити лише з цієї дати, зараховуючи вже збережені заняття плану як виконані
+        (так продовжується перерваний запуск).
+        """
+        self.occupancy = occupancy if occupancy is not None else Occupancy.from_db(
+            self.start_date, self.end_date, version=self.version,
+        )
+        if start_from is None:
+            self.window = (self.start_date, self.end_date)
+            self.lectures_needed, self.practices_needed = self._required_counts(self.courses)
+        else:
+            self.window = (max(start_from, self.start_date), self.end_date)
+            self.lectures_needed, self.practices_needed = self._remaining_counts(self.courses)
+        return self._place_needed()
+
+    def reschedule(self, course=None, teacher=None, unavailable_dates=(), week_start=None):
+        """
+        Часткове перепланування: прибирає і заново ставить лише заняття з однієї області —
+        курсу (course) чи тижня (week_start) цього плану або викладача на дати unavailable_dates
+        (teacher) в усіх планах: інші плани, де викладач веде заняття, переплановуються власними
+        генераторами в тій самій транзакції. Решта розкладу лишається незмінною.
+        Повертає (видалено, поставлено).
+        """
+        if sum(scope is not None for scope in (course, teacher, week_start)) != 1:
+            raise ValueError("Exactly one of course, teacher or week_start is required")
+        if teacher is None:
+            return self._reschedule(course, None, (), week_start)
+
+        unavailable_dates = list(unavailable_dates)
+        with transaction.atomic():
+            removed, placed = self._reschedule(None, teacher, unavailable_dates, None)
+            for study_plan in self._teacher_plans(teacher, unavailable_dates):
+                other = ScheduleGenerator(
+                    study_plan, self.semester, self.start_date, self.end_date, strategy=self.strategy,
+                    time_budget=self.time_budget, version=self.version,
+                )
+                other_removed, other_placed = other._reschedule(None, teacher, unavailable_dates, None)
+                removed += other_removed
+                placed += other_placed
+        return removed, placed
+
+    def _teacher_plans(self, teacher, dates):
+        """Інші плани семестру із заняттями викладача в дати dates або його серіями"""
+        events = Lesson.objects.filter(
+            version=self.version, course__teacher=teacher, course__semester=self.semester, date__in=dates,
+        ).values('course__study_plan_id')
+        series = LessonPattern.objects.filter(
+            version=self.version, course__teacher=teacher, course__semester=self.semester,
+        ).values('course__study_plan_id')
+        return (StudyPlan.objects.filter(models.Q(id__in=events) | models.Q(id__in=series))
+                .exclude(pk=self.study_plan.pk).order_by('id'))
+
+    def _reschedule(self, course, teacher, unavailable_dates, week_start):
+        """reschedule в межах підгруп цього плану"""
+        affected = Lesson.objects.filter(
+            version=self.version,
+            id__in=LessonAttendance.objects.filter(subgroup__in=self.subgroups).values('lesson_id'),
+            date__range=(self.start_date, self.end_date),
+        )
+        patterns = LessonPattern.objects.filter(
+            version=self.version,
+            id__in=PatternAttendance.objects.filter(subgroup__in=self.subgroups).values('pattern_id'),
+        )
+        window = (self.start_date, self.end_date)
+        pattern_dates = None
+        if course is not None:
+            affected = affected.filter(course=course)
+            patterns = patterns.filter(course=course)
+        elif teacher is not None:
+            unavailable_dates = pattern_dates = list(unavailable_dates)
+            affected = affected.filter(course__teacher=teacher, date__in=unavailable_dates)
+            patterns = patterns.filter(course__teacher=teacher)
+        else:
+            window = (max(week_start, self.start_date), min(week_start + timedelta(days=6), self.end_date))
+            affected = affected.filter(date__range=window)
+
+        with transaction.atomic():
+            removed_dates = set(affected.values_list('date', flat=True))
+            course_ids = set(affected.values_list('course_id', flat=True))
+            _, deleted = affected.delete()
+            removed = deleted.get(LessonAttendance._meta.label, 0)  # по рядку на підгрупу, як і PlannedLesson
+            # Заняття щотижневих серій у тій самій області стають винятками серій
+            series = remove_occurrences(patterns, *window, dates=pattern_dates)
+            removed += series.count
+            removed_dates |= series.dates
+            course_ids |= series.course_ids
+            if course is not None:
+                course_ids = {course.id}
+            courses = [c for c in self.courses if c.id in course_ids]
+
+            self.occupancy = Occupancy.from_db(
+                *window,
+                teacher_ids={c.teacher_id for c in courses},
+                subgroup_ids=[subgroup.id for subgroup in self.subgroups],
+                version=self.version,
+            )
+            if teacher is not None:
+                self.occupancy.block_teacher(teacher.id, unavailable_dates)
+            self.window = window
+            self.lectures_needed, self.practices_needed = self._remaining_counts(courses)
+            self._place_needed()
+            self._flush()
+            if self._live():
+                refresh_weeks(removed_dates)
+            self._refresh_workload(courses)
+
+        logger.info(f"Rescheduled {len(courses)} courses: removed {removed}, placed {len(self.planned_lessons)} lessons")
+        return removed, len(self.planned_lessons)
+
+    def _required_counts(self, courses):
+        """Скільки лекцій потрібно на курс і скільки практик на пару (курс, підгрупа)"""
         lectures_needed = {
-            c.id: c.lecture_hours // 2 for c in lecture_courses
+            course.id: course.lecture_hours // self.HOURS_PER_LESSON
+            for course in courses if self.subgroups
+        }
+        practices_needed = {
+            (course.id, subgroup.id): course.practice_hours // self.HOURS_PER_LESSON
+            for course in courses
+            for subgroup in self.subgroups
         }
+        return lectures_needed, practices_needed
+
+    def _remaining_counts(self, courses):
+        """Потреби курсів за вирахуванням занять (подій і серій), які вже є в БД за весь семестр"""
+        lectures_needed, practices_needed = self._required_counts(courses)
+        rows = occurrence_rows(
+            LessonAttendance.objects.in_version(self.version).filter(lesson__course__in=courses,
+                                                                    subgroup__in=self.subgroups),
+            PatternAttendance.objects.in_version(self.version).filter(pattern__course__in=courses,
+                                                                     subgroup__in=self.subgroups),
+            ('lesson__course_id', 'subgroup_id', 'date', 'start_time', 'lesson__lesson_type'),
+            self.start_date, self.end_date,
+        )
+
+        lecture_events = set()
+        for course_id, subgroup_id, day, start_time, lesson_type in rows:
+            if lesson_type == 'Lecture':
+                lecture_events.add((course_id, day, start_time))
+            elif (course_id, subgroup_id) in practices_needed:
+                practices_needed[(course_id, subgroup_id)] -= 1
+        for course_id, _, _ in lecture_events:
+            lectures_needed[course_id] -= 1
+
+        return (
+            {key: max(n, 0) for key, n in lectures_needed.items()},
+            {key: max(n, 0) for key, n in practices_needed.items()},
+        )
 
-        lectures_created = defaultdict(int)
+    def _place_needed(self):
+        """Розставляє потреби lectures_needed/practices_needed у вікні self.window"""
+        self.planned_lessons = []
+        if self.strategy == 'csp':
+            self._generate_with_solver()
+        else:
+            if self.strategy == 'weekly':
+                self._generate_weekly()  # решту добирають жадібні проходи
+            self._generate_lectures()
+            self._generate_practices()
+        if self.optimize:
+            self._optimize()
+        self.unmet_hours = self._unmet_hours()
+        return self.planned_lessons
+
+    def _working_dates(self, weekdays):
+        current_date, last_date = self.window
+        while current_date <= last_date:
+            if current_date.weekday() in weekdays:
+                yield current_date
+            current_date += timedelta(days=1)
 
-        while current_date <= self.end_date:
-            if current_date.weekday() not in self.LECTURE_DAYS:
-                current_date += timedelta(days=1)
+    def _place(self, course, subgroup_id, day, start_time, lesson_type):
+        """Додає заняття до плану і одразу враховує його в зайнятості"""
+        self.planned_lessons.append(
+            PlannedLesson(course.id, subgroup_id, day, start_time, lesson_type)
+        )
+        self.occupancy.add(course.teacher_id, subgroup_id, day, start_time)
+
+    def _placed_counts(self):
+        """Уже заплановані лекції (події) на курс і практики на пару (курс, підгрупа)"""
+        lectures = Counter(
+            course_id for course_id, _, _ in {
+                (p.course_id, p.date, p.start_time)
+                for p in self.planned_lessons if p.lesson_type == 'Lecture'
+            }
+        )
+        practices = Counter(
+            (p.course_id, p.subgroup_id)
+            for p in self.planned_lessons if p.lesson_type == 'Practice'
+        )
+        return lectures, practices
+
+    @staticmethod
+    def _series_lengths(needed, weeks):
+        """needed занять -> довжини найменшої кількості серій, не довших за weeks тижнів"""
+        if needed <= 0 or weeks <= 0:
+            return []
+        count = -(-needed // weeks)
+        return [needed // count + (i < needed % count) for i in range(count)]
+
+    def _slot_free(self, course, subgroup_ids, day, start_time, end_time):
+        return (
+            self._is_teacher_available(course.teacher, day, start_time, end_time)
+            and all(
+                not self.occupancy.subgroup_busy(subgroup_id, day, start_time)
+                and self.occupancy.subgroup_load(subgroup_id, day) < self.MAX_LESSONS_FOR_SUBGROUP
+                for subgroup_id in subgroup_ids
+            )
+        )
+
+    def _place_series(self, course, subgroup_ids, lesson_type, weekdays, length):
+        """Перший слот (день тижня, пара), вільний на всі length тижнів поспіль; False — не знайшовся"""
+        for weekday in weekdays:
+            dates = list(self._working_dates([weekday]))[:length]
+            if len(dates) < length:
                 continue
+            for start_time, end_time in self.LECTURE_TIMESLOTS:
+                if all(self._slot_free(course, subgroup_ids, day, start_time, end_time) for day in dates):
+                    for day in dates:
+                        for subgroup_id in subgroup_ids:
+                            self._place(course, subgroup_id, day, start_time, lesson_type)
+                    return True
+        return False
+
+    def _generate_weekly(self):
+        """
+        Стратегія 'weekly': потреби курсу розкладаються щотижневими серіями — те саме заняття
+        в тому самому слоті кожного тижня, — які save_schedule зберігає шаблонами LessonPattern.
+        Лекція серії потребує вільних усіх підгруп плану на кожну дату серії.
+        """
+        first, last = self.window
+        weeks = (last - first).days // 7 + 1
+        subgroup_ids = [subgroup.id for subgroup in self.subgroups]
+        courses = list(self.courses)
+        random.shuffle(courses)
+        for course in courses:
+            if subgroup_ids:
+                for length in self._series_lengths(self.lectures_needed.get(course.id, 0), weeks):
+                    self._place_series(course, subgroup_ids, 'Lecture', self.LECTURE_DAYS, length)
+            for subgroup_id in subgroup_ids:
+                for length in self._series_lengths(self.practices_needed.get((course.id, subgroup_id), 0), weeks):
+                    self._place_series(course, [subgroup_id], 'Practice', self.PRACTICE_DAYS, length)
+
+    def _generate_lectures(self):
+        lectures_needed = self.lectures_needed
+        lecture_courses = [c for c in self.courses if lectures_needed.get(c.id, 0) > 0]
 
+        lectures_created = self._placed_counts()[0]
+
+        for current_date in self._working_dates(self.LECTURE_DAYS):
             for start_time, end_time in self.LECTURE_TIMESLOTS:
                 random.shuffle(lecture_courses)  # рандомізуємо порядок для рівномірності
                 for course in lecture_courses:
@@ -112,70 +464,43 @@ class ScheduleGenerator:
                     if not self._is_teacher_available(course.teacher, current_date, start_time, end_time):
                         continue
 
-                    # daily_teacher_lessons = Lesson.objects.filter(
-                    #     course__teacher=course.teacher, date=current_date
-                    # ).count()
-                    #
-                    # if daily_teacher_lessons >= 4:  # обмеження 4 заняття на день
-                    #     continue
-
-                    subgroups_to_create = []
-                    for subgroup in self.subgroups:
-                        daily_subgroup_lessons = Lesson.objects.filter(
-                            subgroup=subgroup, date=current_date
-                        ).count()
-
-                        if daily_subgroup_lessons < self.MAX_LESSONS_FOR_SUBGROUP:
-                            subgroups_to_create.append(subgroup)
+                    subgroups_to_create = [
+                        subgroup for subgroup in self.subgroups
+                        if not self._has_lesson_at(subgroup, current_date, start_time)
+                        and self.occupancy.subgroup_load(subgroup.id, current_date) < self.MAX_LESSONS_FOR_SUBGROUP
+                    ]
 
                     if not subgroups_to_create:
                         continue
 
-                    lessons = [
-                        Lesson(
-                            course=course,
-                            subgroup=subgroup,
-                            date=current_date,
-                            start_time=start_time,
-                            lesson_type='Lecture'
-                        ) for subgroup in subgroups_to_create
-                    ]
+                    for subgroup in subgroups_to_create:
+                        self._place(course, subgroup.id, current_date, start_time, 'Lecture')
 
-                    Lesson.objects.bulk_create(lessons)
                     lectures_created[course.id] += 1
                     break  # один курс на таймслот
 
-            current_date += timedelta(days=1)
-
     def _generate_practices(self):
-        current_date = self.start_date
-        practice_courses = [c for c in self.courses if c.practice_hours > 0]
+        # Кількість занять, які треба провести для кожної підгрупи
+        practices_needed = self.practices_needed
+        practice_courses = [
+            c for c in self.courses
+            if any(practices_needed.get((c.id, subgroup.id), 0) > 0 for subgroup in self.subgroups)
+        ]
 
-        # Визначаємо кількість занять, які треба провести для кожної підгрупи
-        practices_needed = {
-            (course.id, subgroup.id): course.practice_hours // 2
-            for course in practice_courses
-            for subgroup in self.subgroups
-            if subgroup.group.study_plan == course.study_plan
-        }
-
-        # Створюємо лічильник занять
-        practices_created = defaultdict(int)
+        # Створюємо лічильник занять (з урахуванням уже розставлених серій)
+        practices_created = self._placed_counts()[1]
 
-        while current_date <= self.end_date:
-            if current_date.weekday() not in self.PRACTICE_DAYS:
-                current_date += timedelta(days=1)
-                continue
+        for current_date in self._working_dates(self.PRACTICE_DAYS):
             logger.info(f"Оброблюється {current_date} день")
             for start_time, end_time in self.LECTURE_TIMESLOTS:
                 random.shuffle(practice_courses)  # Для рівномірного розподілу
 
                 for course in practice_courses:
-                    for subgroup in self.subgroups.filter(group__study_plan=course.study_plan):
+                    for subgroup in self.subgroups:
 
                         # Перевірка чи достатньо занять вже створено для цієї підгрупи та курсу
                         key = (course.id, subgroup.id)
-                        if practices_created[key] >= practices_needed[key]:
+                        if practices_created[key] >= practices_needed.get(key, 0):
                             continue
 
                         if self._has_lesson_at(subgroup, current_date, start_time):
@@ -184,90 +509,415 @@ class ScheduleGenerator:
                         if not self._is_teacher_available(course.teacher, current_date, start_time, end_time):
                             continue
 
-                        # daily_teacher_lessons = Lesson.objects.filter(
-                        #     course__teacher=course.teacher, date=current_date
-                        # ).count()
-                        #
-                        # if daily_teacher_lessons >= 5:
-                        #     continue
-
-                        daily_subgroup_lessons = Lesson.objects.filter(
-                            subgroup=subgroup, date=current_date
-                        ).count()
-
-                        if daily_subgroup_lessons >= self.MAX_LESSONS_FOR_SUBGROUP:
+                        if self.occupancy.subgroup_load(subgroup.id, current_date) >= self.MAX_LESSONS_FOR_SUBGROUP:
                             continue
 
-                        Lesson.objects.create(
-                            course=course,
-                            subgroup=subgroup,
-                            date=current_date,
-                            start_time=start_time,
-                            lesson_type='Practice'
-                        )
+                        self._place(course, subgroup.id, current_date, start_time, 'Practice')
 
                         practices_created[key] += 1
-                        self.teacher_workload[course.teacher] += 1
+                        self.teacher_workload[course.teacher_id] += 1
+
+    def _generate_with_solver(self):
+        """Розстановка потреб плану через ConstraintSolver замість жадібного проходу"""
+        days = list(self._working_dates(self.WORK_DAYS))
+        day_index = {day: i for i, day in enumerate(days)}
+        slots_per_day = len(self.LECTURE_TIMESLOTS)
+        slot_of = {
+            (day, start_time): i * slots_per_day + pair
+            for i, day in enumerate(days)
+            for pair, (start_time, _) in enumerate(self.LECTURE_TIMESLOTS)
+        }
 
-            current_date += timedelta(days=1)
+        def slots_on(weekdays):
+            return [slot for (day, _), slot in slot_of.items() if day.weekday() in weekdays]
+
+        lecture_slots = slots_on(self.LECTURE_DAYS)
+        practice_slots = slots_on(self.PRACTICE_DAYS)
+        subgroup_ids = tuple(subgroup.id for subgroup in self.subgroups)
+
+        units = []
+        for course in self.courses:
+            lecture = Unit(course.id, course.teacher_id, subgroup_ids, 'Lecture', lecture_slots)
+            units.extend([lecture] * self.lectures_needed.get(course.id, 0))
+            for subgroup_id in subgroup_ids:
+                practice = Unit(course.id, course.teacher_id, (subgroup_id,), 'Practice', practice_slots)
+                units.extend([practice] * self.practices_needed.get((course.id, subgroup_id), 0))
+
+        occupancy = self.occupancy
+        teacher_busy = {(t, slot_of[(d, s)]) for t, d, s in occupancy.teacher_slots if (d, s) in slot_of}
+        teacher_busy.update(
+            (t, day_index[d] * slots_per_day + pair)
+            for t, d in occupancy.teacher_blocked if d in day_index
+            for pair in range(slots_per_day)
+        )
+        solver = ConstraintSolver(
+            units, slots_per_day, self.MAX_LESSONS_FOR_SUBGROUP,
+            teacher_busy=teacher_busy,
+            subgroup_busy={(g, slot_of[(d, s)]) for g, d, s in occupancy.subgroup_slots if (d, s) in slot_of},
+            subgroup_load={(g, day_index[d]): n for (g, d), n in occupancy.subgroup_daily.items() if d in day_index},
+            time_budget=self.time_budget,
+        )
+        result = solver.solve()
+
+        courses = {course.id: course for course in self.courses}
+        for index, slot in sorted(result.assignment.items(), key=lambda item: item[1]):
+            unit = units[index]
+            day = days[slot // slots_per_day]
+            start_time = self.LECTURE_TIMESLOTS[slot % slots_per_day][0]
+            for subgroup_id in unit.subgroup_ids:
+                self._place(courses[unit.course_id], subgroup_id, day, start_time, unit.lesson_type)
+
+    def _optimize(self):
+        """Імітація відпалу над уже розставленими заняттями, до запису в БД"""
+        days = list(self._working_dates(self.WORK_DAYS))
+        if not days or not self.planned_lessons:
+            return
+        slots_per_day = len(self.LECTURE_TIMESLOTS)
+        day_index = {day: i for i, day in enumerate(days)}
+        first_monday = days[0] - timedelta(days=days[0].weekday())
+        week_of_day = [(day - first_monday).days // 7 for day in days]
+        pair_of = {start_time: pair for pair, (start_time, _) in enumerate(self.LECTURE_TIMESLOTS)}
+        courses = {course.id: course for course in self.courses}
+
+        def slots_on(weekdays):
+            return [
+                i * slots_per_day + pair
+                for i, day in enumerate(days) if day.weekday() in weekdays
+                for pair in range(slots_per_day)
+            ]
+
+        allowed = {'Lecture': slots_on(self.LECTURE_DAYS), 'Practice': slots_on(self.PRACTICE_DAYS)}
+
+        # Лекція для кількох підгруп рухається як одна одиниця
+        grouped = defaultdict(list)
+        for p in self.planned_lessons:
+            key = (p.course_id, p.date, p.start_time, p.lesson_type)
+            if p.lesson_type != 'Lecture':
+                key += (p.subgroup_id,)
+            grouped[key].append(p.subgroup_id)
+            self.occupancy.remove(courses[p.course_id].teacher_id, p.subgroup_id, p.date, p.start_time)
+
+        units, slots = [], []
+        for (course_id, day, start_time, lesson_type, *_), subgroup_ids in grouped.items():
+            teacher_id = courses[course_id].teacher_id
+            units.append(Unit(course_id, teacher_id, tuple(sorted(subgroup_ids)), lesson_type, allowed[lesson_type]))
+            slots.append(day_index[day] * slots_per_day + pair_of[start_time])
+
+        # Решта зайнятості (інші плани, заблоковані дні) — незмінне тло
+        teachers = {unit.teacher_id for unit in units}
+        subgroups = {subgroup.id for subgroup in self.subgroups}
+        teacher_masks, subgroup_masks = defaultdict(int), defaultdict(int)
+        for teacher_id, day, start_time in self.occupancy.teacher_slots:
+            if teacher_id in teachers and day in day_index and start_time in pair_of:
+                teacher_masks[(teacher_id, day_index[day])] |= 1 << pair_of[start_time]
+        for teacher_id, day in self.occupancy.teacher_blocked:
+            if teacher_id in teachers and day in day_index:
+                teacher_masks[(teacher_id, day_index[day])] = (1 << slots_per_day) - 1
+        for subgroup_id, day, start_time in self.occupancy.subgroup_slots:
+            if subgroup_id in subgroups and day in day_index and start_time in pair_of:
+                subgroup_masks[(subgroup_id, day_index[day])] |= 1 << pair_of[start_time]
+
+        optimizer = ScheduleOptimizer(
+            units, slots, slots_per_day, week_of_day, self.MAX_LESSONS_FOR_SUBGROUP,
+            subgroup_masks=subgroup_masks, teacher_masks=teacher_masks,
+            weights=self.objective_weights,
+        )
+        best = optimizer.run(self.optimizer_iterations)
+
+        self.planned_lessons = []
+        for unit, slot in sorted(zip(units, best), key=lambda item: item[1]):
+            day = days[slot // slots_per_day]
+            start_time = self.LECTURE_TIMESLOTS[slot % slots_per_day][0]
+            for subgroup_id in unit.subgroup_ids:
+                self._place(courses[unit.course_id], subgroup_id, day, start_time, unit.lesson_type)
+
+    def _unmet_hours(self):
+        """Невиставлені години по курсах: {course_id: {'lecture_hours': .., 'practice_hours': ..}}"""
+        lectures, practices = self._placed_counts()
+
+        unmet = {}
+        for course in self.courses:
+            lecture_gap = self.lectures_needed.get(course.id, 0) - lectures[course.id]
+            practice_gap = sum(
+                max(self.practices_needed.get((course.id, subgroup.id), 0) - practices[(course.id, subgroup.id)], 0)
+                for subgroup in self.subgroups
+            )
+            if lecture_gap > 0 or practice_gap > 0:
+                unmet[course.id] = {
+                    'lecture_hours': max(lecture_gap, 0) * self.HOURS_PER_LESSON,
+                    'practice_hours': practice_gap * self.HOURS_PER_LESSON,
+                }
+
+        if unmet:
+            logger.warning(f"Unscheduled hours left for {len(unmet)} courses: {unmet}")
+        return unmet
 
     def _is_teacher_available(self, teacher, date, start_time, end_time):
-        """Перевірка доступності викладача з дебаг-логом"""
-        existing_lessons = Lesson.objects.filter(
-            course__teacher=teacher,
-            date=date,
-            start_time=start_time
-        ).exists()
-
-        # teacher_courses = Course.objects.filter(teacher=teacher, semester=self.semester)
-        # total_hours = sum(c.lecture_hours + c.practice_hours for c in teacher_courses)
-
-        # logger.debug(
-        #     f"Teacher {teacher} availability check: "
-        #     f"Existing lessons: {existing_lessons}, "
-        #     f"Workload: {self.teacher_workload[teacher]}/{total_hours}, "
-        #     f"Allowed hours: {teacher.allowed_hours}"
-        # )
+        """Перевірка доступності викладача за зайнятістю в пам'яті"""
+        return not self.occupancy.teacher_busy(teacher.id, date, start_time)
 
-        return (
-                not existing_lessons
-                # and self.teacher_workload[teacher] < total_hours
-                # and self.teacher_workload[teacher] < teacher.allowed_hours
+    def _has_lesson_at(self, subgroup, date, start_time):
+        """Перевірка наявності заняття у підгрупи за зайнятістю в пам'яті"""
+        return self.occupancy.subgroup_busy(subgroup.id, date, start_time)
+
+    def _flush(self):
+        """Пакетний запис запланованих занять у БД"""
+        # Щотижневі повтори стають серіями LessonPattern, решта — подіями Lesson (лекція на кілька
+        # підгруп — одна подія); слот підгрупи, вже зайнятий у БД, відкидає attendance_subgroup_slot_uniq
+        saved = save_schedule(self.planned_lessons, batch_size=self.BULK_BATCH_SIZE, version=self.version)
+        if self._live():
+            refresh_weeks({planned.date for planned in self.planned_lessons})
+        if saved < len(self.planned_lessons):
+            logger.warning(f"Dropped {len(self.planned_lessons) - saved} lessons conflicting with stored ones")
+        logger.info(f"Saved {saved} lessons")
+
+    def _live(self):
+        """Генератор пише в активну версію: індекс тижнів і зведення оновлюються одразу, а не при publish"""
+        return self.version.status == ScheduleVersion.STATUS_ACTIVE
+
+    def _refresh_workload(self, courses):
+        """Зведення навантаження для підгруп плану і викладачів зачеплених курсів"""
+        if not self._live():
+            return
+        refresh_workload(
+            subgroup_ids=[subgroup.id for subgroup in self.subgroups],
+            teacher_ids={course.teacher_id for course in courses},
         )
 
-    def _has_lesson_at(self, subgroup, date, start_time):
-        """Перевірка наявності занять з кешуванням"""
-        return Lesson.objects.filter(
-            subgroup=subgroup,
-            date=date,
-            start_time=start_time
-        ).exists()
+    def validate(self):
+        """
+        Перевірка збереженого розкладу плану у вікні семестру (database.validation):
+        підгрупи плану і всі заняття викладачів його курсів. Повертає список Violation.
+        """
+        return validate_schedule(
+            start_date=self.start_date, end_date=self.end_date,
+            subgroup_ids=[subgroup.id for subgroup in self.subgroups],
+            teacher_ids={course.teacher_id for course in self.courses},
+            max_daily=self.MAX_LESSONS_FOR_SUBGROUP, hours_per_lesson=self.HOURS_PER_LESSON,
+            version=self.version,
+        )
 
     def _get_final_schedule(self):
-        """Формування підсумкового розкладу"""
-        lessons = Lesson.objects.filter(
+        """Формування підсумкового розкладу; заняття серій — незбережені Lesson без id"""
+        attendance = list(LessonAttendance.objects.in_version(self.version).filter(
             date__range=(self.start_date, self.end_date),
             subgroup__in=self.subgroups
-        ).select_related('course', 'subgroup').order_by('date', 'start_time')
+        ).select_related('lesson__course', 'subgroup').order_by('date', 'start_time'))
+        occurrences = [
+            (entry.subgroup, Lesson(course=entry.pattern.course, date=day, start_time=entry.pattern.start_time,
+                                    lesson_type=entry.pattern.lesson_type))
+            for entry in overlapping(
+                PatternAttendance.objects.in_version(self.version).filter(subgroup__in=self.subgroups),
+                self.start_date, self.end_date,
+            ).select_related('pattern__course', 'subgroup')
+            for day in occurrence_dates(entry.pattern.weekday, entry.pattern.start_date, entry.pattern.end_date,
+                                        entry.pattern.exceptions, self.start_date, self.end_date)
+        ]
 
         schedule = defaultdict(lambda: defaultdict(list))
-        for lesson in lessons:
-            schedule[lesson.subgroup][lesson.date].append(lesson)
+        for subgroup, lesson in sorted(
+            [(entry.subgroup, entry.lesson) for entry in attendance] + occurrences,
+            key=lambda item: (item[1].date, item[1].start_time),
+        ):
+            schedule[subgroup][lesson.date].append(lesson)
 
-        logger.info(f"Final schedule contains {lessons.count()} lessons")
+        logger.info(f"Final schedule contains {len(attendance) + len(occurrences)} lessons")
         return schedule
-# Приклад використання
 
 
+def _plan_clusters(semester, plan_ids=None):
+    """
+    Розбиття навчальних планів на незалежні кластери:
+    компоненти зв'язності графа, де плани пов'язані спільними викладачами
+    """
+    study_plans = StudyPlan.objects.order_by('id')
+    if plan_ids:
+        study_plans = study_plans.filter(id__in=plan_ids)
+    plan_ids = list(study_plans.values_list('id', flat=True))
+    parent = {plan_id: plan_id for plan_id in plan_ids}
+
+    def find(plan_id):
+        while parent[plan_id] != plan_id:
+            parent[plan_id] = parent[parent[plan_id]]
+            plan_id = parent[plan_id]
+        return plan_id
+
+    first_plan_of_teacher = {}
+    pairs = Course.objects.filter(
+        semester=semester, study_plan_id__in=plan_ids
+    ).values_list('teacher_id', 'study_plan_id').distinct()
+    for teacher_id, plan_id in pairs:
+        other = first_plan_of_teacher.setdefault(teacher_id, plan_id)
+        parent[find(plan_id)] = find(other)
+
+    clusters = defaultdict(list)
+    for plan_id in plan_ids:
+        clusters[find(plan_id)].append(plan_id)
+    return list(clusters.values())
+
+
+def replaced_courses(semester, plan_ids=None):
+    """Курси семестру, заняття яких замінює перегенерація планів plan_ids (None — усіх планів)"""
+    courses = Course.objects.filter(semester=semester)
+    return courses.filter(study_plan_id__in=plan_ids) if plan_ids else courses
+
+
+def _generate_cluster(plan_ids, semester, start_date, end_date, strategy, optimize, start_from=None, version=None,
+                      replace=None):
+    """
+    Генерація одного кластера планів (виконується в окремому процесі).
+    replace — id планів, що перегенеровуються (порожній список — усі): їхні збережені заняття семестру
+    у вікні генерації слотів не займають.
+    """
+    random.seed()  # інакше всі форкнуті процеси отримують однакові дні лекцій
+    version = version or active_version()
+    occupancy = Occupancy.from_db(
+        start_date, end_date, version=version,
+        exclude_courses=None if replace is None else replaced_courses(semester, replace),
+    )
+    planned, unmet = [], {}
+    for study_plan in StudyPlan.objects.filter(id__in=plan_ids).order_by('id'):
+        generator = ScheduleGenerator(
+            study_plan, semester, start_date, end_date, strategy=strategy, optimize=optimize, version=version,
+        )
+        planned.extend(generator.plan(occupancy, start_from))
+        unmet.update(generator.unmet_hours)
+    return planned, unmet
+
+
+def _drop_conflicts(planned, unmet):
+    """
+    Фінальна перевірка злитого результату: прибирає подвійні бронювання викладачів,
+    а години прибраних занять додає до unmet (лекція на кілька підгруп — одна пара).
+    Подвійні бронювання підгруп відкидає сама БД (attendance_subgroup_slot_uniq + ignore_conflicts).
+    """
+    teacher_of = dict(Course.objects.filter(
+        id__in={p.course_id for p in planned}
+    ).values_list('id', 'teacher_id'))
+    teacher_slots = {}
+    accepted = []
+    dropped_lectures = set()
+    for p in planned:
+        teacher_key = (teacher_of[p.course_id], p.date, p.start_time)
+        if teacher_slots.setdefault(teacher_key, p.course_id) == p.course_id:
+            accepted.append(p)
+            continue
+        hours = unmet.setdefault(p.course_id, {'lecture_hours': 0, 'practice_hours': 0})
+        if p.lesson_type != 'Lecture':
+            hours['practice_hours'] += ScheduleGenerator.HOURS_PER_LESSON
+        elif (p.course_id, p.date, p.start_time) not in dropped_lectures:
+            dropped_lectures.add((p.course_id, p.date, p.start_time))
+            hours['lecture_hours'] += ScheduleGenerator.HOURS_PER_LESSON
+
+    if len(accepted) != len(planned):
+        logger.warning(f"Dropped {len(planned) - len(accepted)} conflicting lessons after merge")
+    return accepted
+
+
+def plan_all_plans(semester, start_date, end_date, strategy='greedy', optimize=False,
+                   workers=None, plan_ids=None, start_from=None, version=None, replace=False):
+    """
+    Розстановка занять для всіх (або вибраних) навчальних планів у пам'яті; зайнятість —
+    із заняття версії version (None — активної), з replace — без наявних занять самих цих планів.
+    Кластери без спільних викладачів рахуються паралельно в окремих процесах,
+    результат зливається і перевіряється на конфлікти. Повертає (заплановані заняття, unmet_hours).
+    """
+    clusters = _plan_clusters(semester, plan_ids)
+    logger.info(f"Generating {sum(map(len, clusters))} study plans in {len(clusters)} independent clusters")
+
+    replaced = list(plan_ids or ()) if replace else None
+    jobs = [(cluster, semester, start_date, end_date, strategy, optimize, start_from, version, replaced)
+            for cluster in clusters]
+    if workers == 1 or len(jobs) <= 1:
+        results = [_generate_cluster(*job) for job in jobs]
+    else:
+        connections.close_all()  # дочірні процеси мають відкрити власні з'єднання
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_generate_cluster, *zip(*jobs)))
+
+    planned, unmet = [], {}
+    for cluster_planned, cluster_unmet in results:
+        planned.extend(cluster_planned)
+        unmet.update(cluster_unmet)
+    return _drop_conflicts(planned, unmet), unmet
+
+
+def generate_all_plans(semester, start_date, end_date, strategy='greedy', optimize=False,
+                       workers=None, plan_ids=None):
+    """
+    Перегенерація розкладу всіх (або вибраних) навчальних планів в активній версії: замінюються лише
+    заняття курсів семестру semester у вікні start_date–end_date. Новий розклад порівнюється
+    зі збереженим (database.diff) і записується лише різницею однією транзакцією: незмінені заняття
+    лишаються як є, індекс тижнів і кеш скидаються лише для змінених тижнів. Повертає unmet_hours.
+    """
+    planned, unmet = plan_all_plans(
+        semester, start_date, end_date, strategy=strategy, optimize=optimize,
+        workers=workers, plan_ids=plan_ids, replace=True,
+    )
+    with transaction.atomic():
+        diff = apply_diff(
+            planned, replaced_courses(semester, plan_ids), batch_size=ScheduleGenerator.BULK_BATCH_SIZE,
+            start_date=start_date, end_date=end_date,
+        )
+        if diff.inserted or diff.deleted:
+            refresh_workload()
+    logger.info(f"Schedule updated: {diff.inserted} lessons inserted, {diff.deleted} deleted, "
+                f"{len(diff.weeks)} weeks changed")
+    return unmet
+
+
+def write_jsonl(records, stream):
+    """Вивід запланованих занять як JSON Lines, по одному запису на рядок"""
+    pair_of = {start_time: pair for pair, (start_time, _) in enumerate(ScheduleGenerator.LECTURE_TIMESLOTS)}
+    for p in records:
+        stream.write(json.dumps({
+            'course_id': p.course_id,
+            'subgroup_id': p.subgroup_id,
+            'date': p.date.isoformat(),
+            'slot': pair_of.get(p.start_time),
+            'start_time': p.start_time.strftime('%H:%M'),
+            'type': p.lesson_type,
+        }) + '\n')
+
+
+def dry_run_plans(plan_ids, semester, start_date, end_date, strategy='greedy', optimize=False):
+    """Потік запланованих занять для кількох планів зі спільною зайнятістю, без запису в БД"""
+    occupancy = Occupancy.from_db(start_date, end_date)
+    study_plans = StudyPlan.objects.order_by('id')
+    if plan_ids:
+        study_plans = study_plans.filter(id__in=plan_ids)
+    for study_plan in study_plans:
+        generator = ScheduleGenerator(
+            study_plan, semester, start_date, end_date, strategy=strategy, optimize=optimize
+        )
+        yield from generator.dry_run(occupancy)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Генерація розкладу занять")
+    parser.add_argument('--plan', type=int, action='append', dest='plan_ids',
+                        help="ID навчального плану (можна кілька разів; за замовчуванням — усі)")
+    parser.add_argument('--semester', type=int, default=2)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 20), help="Початок семестру")
+    parser.add_argument('--end', type=date.fromisoformat, default=date(2025, 5, 31), help="Кінець семестру")
+    parser.add_argument('--strategy', choices=ScheduleGenerator.STRATEGIES, default='greedy')
+    parser.add_argument('--optimize', action='store_true', help="Пост-оптимізація імітацією відпалу")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Нічого не писати в БД, вивести запропонований розклад як JSON Lines у stdout")
+    return parser.parse_args(argv)
+
+
+# Приклад використання
 if __name__ == "__main__":
-    study_plans = StudyPlan.objects.all()
-    Lesson.objects.all().delete()
-    for sp in study_plans:
-        #for i in range(32, 38):
-        study_plan = StudyPlan.objects.get(pk=sp.id)  # Отримуємо навчальний план
-        semester = 2
-        start_date = date(2025, 1, 20)  # Початок семестру
-        end_date = date(2025, 5, 31)  # Кінець семестру
-
-    generator = ScheduleGenerator(study_plan, semester, start_date, end_date)
-    schedule = generator.generate_schedule()
+    args = _parse_args()
+
+    if args.dry_run:
+        write_jsonl(
+            dry_run_plans(args.plan_ids, args.semester, args.start, args.end, args.strategy, args.optimize),
+            sys.stdout,
+        )
+    else:
+        generate_all_plans(
+            args.semester, args.start, args.end,
+            strategy=args.strategy, optimize=args.optimize, plan_ids=args.plan_ids,
+        )
@@ -1,7 +1,80 @@
 from django.contrib import admin
 from django.apps import apps
 
+from database.models import LessonAttendance, PatternAttendance
+from database.weeks import refresh_range, refresh_weeks
+
 app_config = apps.get_app_config('database')
 
+
+class LessonAttendanceInline(admin.TabularInline):
+    """Підгрупи події; версія, дата і пара підставляються з самого заняття"""
+    model = LessonAttendance
+    fields = ('subgroup',)
+    extra = 1
+
+
+class LessonAdmin(admin.ModelAdmin):
+    """Видалення в адмінці йде через QuerySet.delete без сигналів, тож індекс тижнів і кеш оновлюємо тут"""
+    inlines = [LessonAttendanceInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'date' in form.changed_data:
+            refresh_weeks([form.initial['date']])
+
+    def save_formset(self, request, form, formset, change):
+        lesson = form.instance
+        for attendance in formset.save(commit=False):
+            attendance.version, attendance.date, attendance.start_time = lesson.version, lesson.date, lesson.start_time
+            attendance.save()
+        for attendance in formset.deleted_objects:
+            attendance.delete()
+        if formset.deleted_objects:
+            refresh_weeks([lesson.date])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_weeks([obj.date])
+
+    def delete_queryset(self, request, queryset):
+        dates = set(queryset.values_list('date', flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_weeks(dates)
+
+
+class PatternAttendanceInline(admin.TabularInline):
+    model = PatternAttendance
+    fields = ('subgroup',)
+    extra = 1
+
+
+class LessonPatternAdmin(admin.ModelAdmin):
+    """Як LessonAdmin: видалення серій і відвідувань без сигналів, тож тижні серії перераховуємо тут"""
+    inlines = [PatternAttendanceInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {'start_date', 'end_date'} & set(form.changed_data):
+            refresh_range(form.initial['start_date'], form.initial['end_date'])
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.deleted_objects:
+            refresh_range(form.instance.start_date, form.instance.end_date)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_range(obj.start_date, obj.end_date)
+
+    def delete_queryset(self, request, queryset):
+        ranges = list(queryset.values_list('start_date', 'end_date'))
+        super().delete_queryset(request, queryset)
+        if ranges:
+            refresh_range(min(start for start, _ in ranges), max(end for _, end in ranges))
+
+
+MODEL_ADMINS = {'lesson': LessonAdmin, 'lessonpattern': LessonPatternAdmin}
+
 for model_name, model in app_config.models.items():
-    admin.site.register(model)
+    admin.site.register(model, MODEL_ADMINS.get(model_name))
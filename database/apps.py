@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save
 
 
 class DatabaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'database'
+
+    def ready(self):
+        from database.weeks import lesson_saved, pattern_saved
+        post_save.connect(lesson_saved, sender=self.get_model('Lesson'), dispatch_uid='schedule_weeks_lesson_saved')
+        post_save.connect(lesson_saved, sender=self.get_model('LessonAttendance'),
+                          dispatch_uid='schedule_weeks_attendance_saved')
+        post_save.connect(pattern_saved, sender=self.get_model('LessonPattern'),
+                          dispatch_uid='schedule_weeks_pattern_saved')
+        post_save.connect(pattern_saved, sender=self.get_model('PatternAttendance'),
+                          dispatch_uid='schedule_weeks_pattern_attendance_saved')
@@ -0,0 +1,152 @@
+"""
+Кеш тижневої сітки розкладу (HTML-контекст і JSON-представлення).
+
+Ключ сітки містить понеділок тижня, хеш параметрів фільтра і два токени версії:
+загальний (invalidate_all) і тижневий (invalidate_dates / invalidate_range).
+Інвалідація лише замінює токен, тож старі записи просто стають недосяжними
+і витісняються самим бекендом — працює з будь-яким бекендом Django, включно з locmem.
+
+bulk_create і QuerySet.delete не надсилають сигналів моделі, тому всі масові
+записи занять (генератор, команди, сидер) викликають інвалідацію явно —
+через database.weeks, який разом з кешем оновлює індекс тижнів.
+Приймач post_delete навмисно не підключено: він вимкнув би швидке видалення занять.
+
+Токен починається з часу створення, тому з пари токенів тижня виходять і ETag,
+і Last-Modified для умовних відповідей — без жодного запиту до БД.
+"""
+import datetime
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from database.grid import build_teacher_grid, build_week_grid, build_week_payload
+
+KEY_PREFIX = 'schedule'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+BOUNDS_KEY = f'{KEY_PREFIX}:bounds'
+
+
+def _cache():
+    return caches[getattr(settings, 'SCHEDULE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'SCHEDULE_CACHE_TIMEOUT', 24 * 3600)
+
+
+def _monday(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _week_key(monday):
+    return f'{KEY_PREFIX}:week:{monday.isoformat()}'
+
+
+def _params_digest(params):
+    """Стабільний короткий хеш параметрів фільтра (ключі memcached не можуть містити пробіли)"""
+    if not params:
+        return '-'
+    raw = '&'.join(f'{key}={value}' for key, value in sorted(dict(params).items()))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _new_token():
+    return f'{time.time_ns():x}-{uuid.uuid4().hex[:8]}'
+
+
+def _token_time(token):
+    return datetime.datetime.fromtimestamp(int(token.split('-', 1)[0], 16) / 1e9, tz=datetime.timezone.utc)
+
+
+def _tokens(*keys):
+    """Поточні токени версій; відсутні створюються (add не перезапише конкурентно створений)"""
+    cache = _cache()
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_token(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def cached_weeks(builder, params=None):
+    """Список тижнів від builder() з кешу; змінюється з будь-яким записом занять"""
+    generation, bounds = _tokens(GENERATION_KEY, BOUNDS_KEY)
+    key = f'{KEY_PREFIX}:weeks:{generation}:{bounds}:{_params_digest(params)}'
+    weeks = _cache().get(key)
+    if weeks is None:
+        weeks = builder()
+        _cache().set(key, weeks, _timeout())
+    return weeks
+
+
+def _cached_week(kind, builder, start_week, filters):
+    generation, week = _tokens(GENERATION_KEY, _week_key(start_week))
+    key = f'{KEY_PREFIX}:{kind}:{start_week.isoformat()}:{generation}:{week}:{_params_digest(filters)}'
+    value = _cache().get(key)
+    if value is None:
+        value = builder(start_week, filters)
+        _cache().set(key, value, _timeout())
+    return value
+
+
+def cached_week_grid(start_week, filters=None):
+    """build_week_grid з кешу; filters (group / subgroup / teacher) входять у ключ"""
+    return _cached_week('grid', build_week_grid, start_week, filters)
+
+
+def cached_teacher_grid(start_week, filters=None):
+    """build_teacher_grid з кешу"""
+    return _cached_week('teacher', build_teacher_grid, start_week, filters)
+
+
+def cached_week_payload(start_week, filters=None):
+    """build_week_payload з кешу"""
+    return _cached_week('payload', build_week_payload, start_week, filters)
+
+
+def week_version(start_week, params=None):
+    """(etag, last_modified) тижня з токенів кешу; змінюється з кожною інвалідацією тижня"""
+    generation, week = _tokens(GENERATION_KEY, _week_key(start_week))
+    etag = hashlib.md5(f'{start_week.isoformat()}:{generation}:{week}:{_params_digest(params)}'.encode()).hexdigest()
+    return etag, max(_token_time(generation), _token_time(week))
+
+
+def feed_version(params):
+    """(etag, last_modified) для стрічок на весь розклад — змінюється з будь-яким записом занять"""
+    generation, bounds = _tokens(GENERATION_KEY, BOUNDS_KEY)
+    etag = hashlib.md5(f'feed:{generation}:{bounds}:{_params_digest(params)}'.encode()).hexdigest()
+    return etag, max(_token_time(generation), _token_time(bounds))
+
+
+def invalidate_dates(dates):
+    """Скидає тижні, що містять дані дати; виконується після коміту поточної транзакції"""
+    weeks = {_monday(day) for day in dates}
+    if not weeks:
+        return
+
+    def bump():
+        updates = {_week_key(monday): _new_token() for monday in weeks}
+        updates[BOUNDS_KEY] = _new_token()
+        _cache().set_many(updates, None)
+
+    transaction.on_commit(bump)
+
+
+def invalidate_range(start_date, end_date):
+    """Скидає всі тижні діапазону дат"""
+    monday = _monday(start_date)
+    weeks = []
+    while monday <= end_date:
+        weeks.append(monday)
+        monday += datetime.timedelta(weeks=1)
+    invalidate_dates(weeks)
+
+
+def invalidate_all():
+    """Скидає весь кеш розкладу одним новим загальним токеном"""
+    transaction.on_commit(lambda: _cache().set(GENERATION_KEY, _new_token(), None))
@@ -0,0 +1,121 @@
+"""
+Запис перегенерованого розкладу різницею з уже збереженим.
+
+Більшість слотів після перегенерації лишаються тими самими, тож замість перезапису всіх
+занять плану вихід генератора порівнюється зі збереженими заняттями тих самих курсів у вікні
+генерації за ключем (subgroup_id, course_id, date, start_time, lesson_type) — різницею множин,
+за один прохід по кожній стороні. Застосовуються лише видалення і вставки, пакетно
+й однією транзакцією, тож читачі бачать або старий розклад, або новий.
+
+Заняття щотижневої серії прибирається з неї винятком (remove_occurrences); інші підгрупи
+того самого заняття серії, що лишаються, переписуються окремою подією. Нові заняття
+пишуться як у save_schedule — серіями і подіями; серія, що збіглася б ключем з уже збереженою
+(pattern_course_slot_uniq) чи зачепила б зайнятий слот підгрупи, пишеться подіями. Індекс тижнів
+і кеш скидаються лише для тижнів, що справді змінилися (ScheduleDiff.weeks).
+"""
+import datetime
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+
+from database.lessons import BATCH_SIZE, save_lessons
+from database.models import Lesson, LessonAttendance, LessonPattern, PatternAttendance, ScheduleVersion, active_version
+from database.planning import PlannedLesson
+from database.recurrence import expand_rows, remove_occurrences, save_patterns, series_slots, split_series
+from database.weeks import refresh_weeks
+
+KEY_FIELDS = ('subgroup_id', 'lesson__course_id', 'date', 'start_time', 'lesson__lesson_type')
+
+# Застосована різниця: кількість справді вставлених і видалених занять підгруп і понеділки змінених тижнів
+ScheduleDiff = namedtuple('ScheduleDiff', 'inserted deleted weeks')
+
+
+def planned_key(planned):
+    """Ключ PlannedLesson у порядку KEY_FIELDS"""
+    return planned.subgroup_id, planned.course_id, planned.date, planned.start_time, planned.lesson_type
+
+
+def stored_lessons(courses, version=None, start_date=None, end_date=None):
+    """
+    Збережені заняття підгруп курсів courses у вікні дат: ({ключ: (id відвідування, id події)},
+    {ключ: id серії}) — події одним запитом, серії розгорнутими у вікно
+    """
+    lessons = LessonAttendance.objects.in_version(version).filter(lesson__course__in=courses)
+    if start_date is not None:
+        lessons = lessons.filter(date__gte=start_date)
+    if end_date is not None:
+        lessons = lessons.filter(date__lte=end_date)
+    events = {
+        tuple(row[2:]): row[:2]
+        for row in lessons.values_list('id', 'lesson_id', *KEY_FIELDS).iterator(chunk_size=BATCH_SIZE * 5)
+    }
+    patterns = PatternAttendance.objects.in_version(version).filter(pattern__course__in=courses)
+    series = {
+        tuple(row[1:]): -row[0] for row in expand_rows(patterns, ('lesson_id', *KEY_FIELDS), start_date, end_date)
+    }
+    return events, series
+
+
+def _natural(pattern):
+    return pattern.course_id, pattern.weekday, pattern.start_time, pattern.start_date
+
+
+def save_inserts(planned, courses, version, batch_size=BATCH_SIZE):
+    """
+    Запис нових PlannedLesson серіями і подіями, як save_schedule, без конфліктів зі збереженими серіями.
+    Повертає кількість справді записаних занять підгруп.
+    """
+    taken = set(
+        LessonPattern.objects.in_version(version).filter(course__in=courses)
+        .values_list('course_id', 'weekday', 'start_time', 'start_date')
+    )
+    patterns = [(pattern, subgroup_ids) for pattern, subgroup_ids in split_series(planned)[0]
+                if _natural(pattern) not in taken]
+    patterned = series_slots(save_patterns(patterns, version, batch_size=batch_size))
+    saved = sum(1 for p in planned if (p.course_id, p.date, p.start_time) in patterned)
+    return saved + save_lessons([p for p in planned if (p.course_id, p.date, p.start_time) not in patterned],
+                                batch_size=batch_size, version=version)
+
+
+def apply_diff(planned, courses, version=None, batch_size=BATCH_SIZE, start_date=None, end_date=None):
+    """
+    Замінює заняття курсів courses у версії (None — активній) на planned, записуючи лише різницю.
+    Заняття поза вікном start_date–end_date (None — без межі) не зачіпаються.
+    Повертає ScheduleDiff; для активної версії оновлює індекс і кеш змінених тижнів.
+    """
+    version = version or active_version()
+    wanted = {planned_key(p) for p in planned}
+    with transaction.atomic():
+        events, series = stored_lessons(courses, version, start_date, end_date)
+        stale_keys = [key for key in events if key not in wanted]
+        stale_events = [events[key] for key in stale_keys]
+        stale_series = [key for key in series if key not in wanted]
+        inserts = wanted.difference(events, series)
+
+        # Заняття серії прибирається для всіх її підгруп, тож ті, що лишаються, переписуються подією
+        removed = defaultdict(set)  # id серії -> дати
+        for key in stale_series:
+            removed[series[key]].add(key[2])
+        inserts.update(
+            key for key, pattern_id in series.items()
+            if key[2] in removed.get(pattern_id, ()) and key in wanted
+        )
+
+        stale_ids = [attendance_id for attendance_id, _ in stale_events]
+        for start in range(0, len(stale_ids), batch_size):
+            LessonAttendance.objects.filter(id__in=stale_ids[start:start + batch_size]).delete()
+        emptied = sorted({lesson_id for _, lesson_id in stale_events})
+        for start in range(0, len(emptied), batch_size):
+            Lesson.objects.filter(id__in=emptied[start:start + batch_size], attendance__isnull=True).delete()
+        for pattern_id, dates in removed.items():
+            remove_occurrences(LessonPattern.objects.filter(pk=pattern_id), min(dates), max(dates), dates=dates)
+
+        inserted = save_inserts([PlannedLesson(course_id, subgroup_id, day, start_time, lesson_type)
+                                 for subgroup_id, course_id, day, start_time, lesson_type in inserts],
+                                courses, version, batch_size=batch_size)
+
+        changed = {key[2] for key in (*inserts, *stale_keys, *stale_series)}
+        if version.status == ScheduleVersion.STATUS_ACTIVE:
+            refresh_weeks(changed)
+    weeks = sorted({day - datetime.timedelta(days=day.weekday()) for day in changed})
+    return ScheduleDiff(inserted, len(stale_events) + len(stale_series), weeks)
@@ -0,0 +1,192 @@
+"""
+Потокове вивантаження занять разом з курсом, викладачем, підгрупою і групою.
+
+Рядки читаються вікнами по WINDOW_DAYS днів: події — через iterator(chunk_size=...)
+(на PostgreSQL це серверний курсор), щотижневі серії — розгорнутими лише у вікно,
+тож пам'ять не залежить від розміру таблиці. Два формати:
+
+- CSV — рядок за рядком;
+- колонковий (.lcol) — блоки по ROW_GROUP_SIZE рядків, кожна колонка окремим масивом,
+  рядкові колонки закодовані словником: у блоці пишуться лише нові значення словника
+  і коди int32. Блок стискається zlib. Це той самий підхід, що й row group у Parquet,
+  але без залежності від pyarrow; read_columnar читає файл назад.
+
+Формат .lcol: MAGIC, далі блоки [uint32 довжина][zlib(заголовок JSON + b'\\n' + буфери колонок)];
+цілі числа little-endian.
+"""
+import csv
+import datetime
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+from database.models import LessonAttendance, PatternAttendance
+from database.recurrence import WINDOW_DAYS, schedule_bounds, window_rows, windows
+
+ROW_GROUP_SIZE = 65536
+MAGIC = b'LCOL1\n'
+FORMATS = ('csv', 'columnar')
+
+# (назва колонки, поле ORM, тип у колонковому форматі)
+COLUMNS = (
+    ('lesson_id', 'lesson_id', 'int64'),
+    ('date', 'date', 'date'),
+    ('start_time', 'start_time', 'time'),
+    ('lesson_type', 'lesson__lesson_type', 'dict'),
+    ('course_id', 'lesson__course_id', 'int64'),
+    ('course_name', 'lesson__course__course_name', 'dict'),
+    ('semester', 'lesson__course__semester', 'int32'),
+    ('study_plan_id', 'lesson__course__study_plan_id', 'int64'),
+    ('teacher_id', 'lesson__course__teacher_id', 'int64'),
+    ('teacher_name', 'lesson__course__teacher__full_name', 'dict'),
+    ('subgroup_id', 'subgroup_id', 'int64'),
+    ('subgroup_number', 'subgroup__number', 'int32'),
+    ('group_id', 'subgroup__group_id', 'int64'),
+    ('group_name', 'subgroup__group__name', 'dict'),
+)
+COLUMN_NAMES = [name for name, _, _ in COLUMNS]
+TYPECODES = {'int64': 'q', 'int32': 'i', 'date': 'i', 'time': 'i', 'dict': 'i'}
+
+
+ORDER = ('date', 'start_time', 'lesson_id', 'subgroup_id')
+
+
+def lesson_rows(start_date=None, end_date=None, window_days=WINDOW_DAYS):
+    """
+    Плоскі кортежі в порядку COLUMNS — по рядку на підгрупу, відсортовані за
+    (date, start_time, lesson_id, subgroup_id); спільна лекція повторює свій lesson_id,
+    заняття щотижневої серії мають lesson_id = -id серії
+    """
+    first, last = schedule_bounds()
+    if first is None:
+        return
+    fields = tuple(field for _, field, _ in COLUMNS)
+    for window_start, window_end in windows(max(start_date or first, first), min(end_date or last, last), window_days):
+        yield from window_rows(
+            LessonAttendance.objects.in_version(), PatternAttendance.objects.in_version(), fields,
+            window_start, window_end, order=ORDER,
+        )
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: write повертає рядок замість запису"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Генератор рядків CSV із заголовком"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMN_NAMES)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _encode_value(kind, value):
+    if kind == 'date':
+        return value.toordinal()
+    if kind == 'time':
+        return value.hour * 3600 + value.minute * 60 + value.second
+    return value
+
+
+def _row_group(rows, dictionaries):
+    """Один стиснений блок; dictionaries — словники колонок, спільні для всього файлу"""
+    columns = [array(TYPECODES[kind]) for _, _, kind in COLUMNS]
+    additions = {}
+    for row in rows:
+        for index, ((name, _, kind), value) in enumerate(zip(COLUMNS, row)):
+            if kind == 'dict':
+                codes = dictionaries[name]
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(codes)
+                    additions.setdefault(name, []).append(value)
+                columns[index].append(code)
+            else:
+                columns[index].append(_encode_value(kind, value))
+
+    if sys.byteorder == 'big':  # буфери колонок завжди little-endian
+        for column in columns:
+            column.byteswap()
+    header = {
+        'rows': len(rows),
+        'columns': [{'name': name, 'type': kind, 'size': len(column) * column.itemsize}
+                    for (name, _, kind), column in zip(COLUMNS, columns)],
+        'dictionary': additions,
+    }
+    payload = json.dumps(header, ensure_ascii=False).encode() + b'\n' + b''.join(c.tobytes() for c in columns)
+    block = zlib.compress(payload, 6)
+    return struct.pack('<I', len(block)) + block
+
+
+def iter_columnar(rows, row_group_size=ROW_GROUP_SIZE):
+    """Генератор байтових блоків колонкового формату; у пам'яті не більше одного блоку"""
+    yield MAGIC
+    dictionaries = {name: {} for name, _, kind in COLUMNS if kind == 'dict'}
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_size:
+            yield _row_group(batch, dictionaries)
+            batch = []
+    if batch:
+        yield _row_group(batch, dictionaries)
+
+
+def read_columnar(stream):
+    """Читає .lcol назад; генерує по блоку словник {колонка: список значень}"""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a columnar lesson export")
+    dictionaries = {name: [] for name, _, kind in COLUMNS if kind == 'dict'}
+    while True:
+        prefix = stream.read(4)
+        if not prefix:
+            return
+        (length,) = struct.unpack('<I', prefix)
+        payload = zlib.decompress(stream.read(length))
+        header_end = payload.index(b'\n')
+        header = json.loads(payload[:header_end])
+        for name, values in header['dictionary'].items():
+            dictionaries[name].extend(values)
+
+        offset = header_end + 1
+        block = {}
+        for column in header['columns']:
+            kind = column['type']
+            values = array(TYPECODES[kind])
+            values.frombytes(payload[offset:offset + column['size']])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            offset += column['size']
+            if kind == 'dict':
+                lookup = dictionaries[column['name']]
+                block[column['name']] = [lookup[code] for code in values]
+            elif kind == 'date':
+                block[column['name']] = [datetime.date.fromordinal(v) for v in values]
+            elif kind == 'time':
+                block[column['name']] = [datetime.time(v // 3600, v % 3600 // 60, v % 60) for v in values]
+            else:
+                block[column['name']] = values.tolist()
+        yield block
+
+
+def write_export(fmt, output, start_date=None, end_date=None):
+    """Пише вивантаження у відкритий файл (текстовий для csv, бінарний для columnar); повертає кількість рядків"""
+    counted = 0
+
+    def counting(rows):
+        nonlocal counted
+        for row in rows:
+            counted += 1
+            yield row
+
+    rows = counting(lesson_rows(start_date, end_date))
+    chunks = iter_csv(rows) if fmt == 'csv' else iter_columnar(rows)
+    for chunk in chunks:
+        output.write(chunk)
+    return counted
+
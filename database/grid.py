@@ -0,0 +1,212 @@
+"""
+Тижнева сітка розкладу для schedule_view.
+
+Заняття тижня беруться одним запитом плоскими кортежами з LessonAttendance — по рядку на підгрупу,
+поля події через join з Lesson, — і злиті з розгорнутими в тиждень серіями LessonPattern
+(database.recurrence); усе — лише активної версії розкладу. Список тижнів — з індексу database.weeks.
+Рядки, групи, пари і кольори будуються за один прохід, без екземплярів моделей:
+клітинки — легкі namedtuple з тими ж атрибутами, що читає шаблон (cell.course.teacher.full_name).
+"""
+import datetime
+from collections import namedtuple
+from itertools import cycle
+
+from database.models import LessonAttendance, PatternAttendance
+from database.recurrence import pattern_field, window_rows
+
+PALETTE = ['#e57373', '#81c784', '#64b5f6', '#fff176', '#ba68c8', '#4db6ac', '#ffb74d', '#a1887f', '#90a4ae',
+           '#aed581']
+
+TeacherRef = namedtuple('TeacherRef', 'id full_name')
+CourseRef = namedtuple('CourseRef', 'id course_name teacher')
+GroupRef = namedtuple('GroupRef', 'id name')
+SubgroupRef = namedtuple('SubgroupRef', 'id number')
+Cell = namedtuple('Cell', 'id lesson_type course')
+TeacherCell = namedtuple('TeacherCell', 'lesson_type course subgroups')
+
+WEEK_FIELDS = (
+    'lesson_id', 'date', 'start_time', 'lesson__lesson_type',
+    'subgroup_id', 'subgroup__number', 'subgroup__group_id', 'subgroup__group__name',
+    'lesson__course_id', 'lesson__course__course_name', 'lesson__course__teacher_id',
+    'lesson__course__teacher__full_name',
+)
+
+FILTER_FIELDS = {
+    'group': 'subgroup__group_id',
+    'subgroup': 'subgroup_id',
+    'teacher': 'lesson__course__teacher_id',
+}
+
+
+def parse_filters(query):
+    """Фільтри group/subgroup/teacher з GET-параметрів; нечислове значення — ValueError"""
+    return {name: int(query[name]) for name in FILTER_FIELDS if query.get(name)}
+
+
+def filter_lessons(lessons=None, filters=None):
+    """
+    Заняття підгруп (LessonAttendance) з фільтрами в самому запиті, щоб не вантажити зайві;
+    без lessons — активної версії розкладу
+    """
+    lessons = LessonAttendance.objects.in_version() if lessons is None else lessons
+    return lessons.filter(**{FILTER_FIELDS[name]: value for name, value in (filters or {}).items()})
+
+
+def filter_patterns(patterns=None, filters=None):
+    """Відвідування серій (PatternAttendance) з тими самими фільтрами"""
+    patterns = PatternAttendance.objects.in_version() if patterns is None else patterns
+    return patterns.filter(**{pattern_field(FILTER_FIELDS[name]): value for name, value in (filters or {}).items()})
+
+
+def _week_rows(start_week, filters, order=('date', 'start_time')):
+    """Кортежі WEEK_FIELDS тижня: події одним запитом і серії, розгорнуті в тиждень"""
+    return window_rows(
+        filter_lessons(filters=filters), filter_patterns(filters=filters), WEEK_FIELDS,
+        start_week, start_week + datetime.timedelta(days=6), order=order,
+    )
+
+
+def build_week_grid(start_week, filters=None):
+    """
+    Сітка тижня, що починається з start_week: groups, rows, timeslots і course_colors.
+    Колір курсу — колір його викладача, викладачі отримують кольори в порядку появи.
+    """
+    days = [start_week + datetime.timedelta(days=i) for i in range(7)]
+
+    timeslots = set()
+    lesson_map = {}   # (дата, час, subgroup_id) -> Cell
+    groups = {}       # group_id -> (GroupRef, [SubgroupRef])
+    subgroups = set()
+    courses = {}
+    teachers = {}
+    teacher_colors = {}
+    colors = cycle(PALETTE)
+
+    for (lesson_id, day, start_time, lesson_type, subgroup_id, number, group_id, group_name,
+         course_id, course_name, teacher_id, teacher_name) in _week_rows(start_week, filters):
+        course = courses.get(course_id)
+        if course is None:
+            teacher = teachers.get(teacher_id)
+            if teacher is None:
+                teacher = teachers[teacher_id] = TeacherRef(teacher_id, teacher_name)
+                teacher_colors[teacher_id] = next(colors)
+            course = courses[course_id] = CourseRef(course_id, course_name, teacher)
+        if subgroup_id not in subgroups:
+            subgroups.add(subgroup_id)
+            groups.setdefault(group_id, (GroupRef(group_id, group_name), []))[1].append(
+                SubgroupRef(subgroup_id, number)
+            )
+        timeslots.add(start_time)
+        lesson_map[(day, start_time, subgroup_id)] = Cell(lesson_id, lesson_type, course)
+
+    group_list = [
+        {'group': group, 'subgroups': sorted(members, key=lambda sg: sg.number)}
+        for group, members in sorted(groups.values(), key=lambda item: item[0].name)
+    ]
+    columns = [sg.id for grp in group_list for sg in grp['subgroups']]
+    timeslots = sorted(timeslots)
+
+    rows = []
+    for day in days:
+        for idx, start_time in enumerate(timeslots):
+            rows.append({
+                'day': day,
+                'time': start_time,
+                'is_first': idx == 0,
+                'rowspan': len(timeslots),
+                'cells': [lesson_map.get((day, start_time, subgroup_id)) for subgroup_id in columns],
+            })
+
+    return {
+        'groups': group_list,
+        'rows': rows,
+        'timeslots': timeslots,
+        'course_colors': {course_id: teacher_colors[course.teacher.id] for course_id, course in courses.items()},
+    }
+
+
+def build_teacher_grid(start_week, filters=None):
+    """
+    Сітка тижня з погляду викладача: рядок — слот (день, пара), у клітинці — заняття
+    викладача в цьому слоті з усіма підгрупами (лекція на потік — одна клітинка).
+    filters мають містити викладача.
+    """
+    days = [start_week + datetime.timedelta(days=i) for i in range(7)]
+    week = _week_rows(start_week, filters, order=('date', 'start_time', 'subgroup__group__name', 'subgroup__number'))
+
+    timeslots = set()
+    slot_map = {}   # (дата, час) -> {(course_id, тип): TeacherCell}
+    courses = {}
+    for (lesson_id, day, start_time, lesson_type, subgroup_id, number, group_id, group_name,
+         course_id, course_name, teacher_id, teacher_name) in week:
+        course = courses.get(course_id)
+        if course is None:
+            course = courses[course_id] = CourseRef(course_id, course_name, TeacherRef(teacher_id, teacher_name))
+        timeslots.add(start_time)
+        cells = slot_map.setdefault((day, start_time), {})
+        cell = cells.get((course_id, lesson_type))
+        if cell is None:
+            cell = cells[(course_id, lesson_type)] = TeacherCell(lesson_type, course, [])
+        cell.subgroups.append(f"{group_name}/{number}")
+
+    timeslots = sorted(timeslots)
+    rows = []
+    for day in days:
+        for idx, start_time in enumerate(timeslots):
+            rows.append({
+                'day': day,
+                'time': start_time,
+                'is_first': idx == 0,
+                'rowspan': len(timeslots),
+                'lessons': list(slot_map.get((day, start_time), {}).values()),
+            })
+
+    return {
+        'rows': rows,
+        'timeslots': timeslots,
+        'course_colors': dict(zip(courses, cycle(PALETTE))),
+    }
+
+
+def build_week_payload(start_week, filters=None):
+    """
+    Компактна сітка тижня для JSON API: курси, викладачі, групи й підгрупи
+    віддаються один раз словниками за id, а кожне заняття — рядком з посилань:
+    [id, день тижня 0-6, індекс пари в timeslots, subgroup_id, course_id, індекс типу в types].
+    id заняття щотижневої серії — від'ємний id серії.
+    """
+
+    entries = []
+    timeslots = set()
+    types = {}
+    courses = {}
+    teachers = {}
+    subgroups = {}
+    groups = {}
+    for (lesson_id, day, start_time, lesson_type, subgroup_id, number, group_id, group_name,
+         course_id, course_name, teacher_id, teacher_name) in _week_rows(start_week, filters):
+        if course_id not in courses:
+            courses[course_id] = {'name': course_name, 'teacher': teacher_id}
+            teachers[teacher_id] = teacher_name
+        if subgroup_id not in subgroups:
+            subgroups[subgroup_id] = {'group': group_id, 'number': number}
+            groups[group_id] = group_name
+        timeslots.add(start_time)
+        entries.append((lesson_id, (day - start_week).days, start_time, subgroup_id, course_id,
+                        types.setdefault(lesson_type, len(types))))
+
+    ordered_slots = sorted(timeslots)
+    slot_index = {start_time: index for index, start_time in enumerate(ordered_slots)}
+    return {
+        'week': start_week.isoformat(),
+        'timeslots': [start_time.strftime('%H:%M') for start_time in ordered_slots],
+        'types': list(types),
+        'groups': groups,
+        'subgroups': subgroups,
+        'teachers': teachers,
+        'courses': courses,
+        'lessons': [
+            [lesson_id, weekday, slot_index[start_time], subgroup_id, course_id, type_index]
+            for lesson_id, weekday, start_time, subgroup_id, course_id, type_index in entries
+        ],
+    }
@@ -0,0 +1,242 @@
+"""
+iCalendar (RFC 5545) стрічки розкладу для підгрупи і викладача.
+
+Заняття підгруп (LessonAttendance) читаються плоскими кортежами через iterator() порціями, а календар
+віддається генератором рядків — пам'ять не залежить від кількості занять. Щотижнева серія
+(LessonPattern) не розгортається: вона стає однією подією з RRULE:FREQ=WEEKLY і EXDATE для винятків,
+а заняття розгортає вже календарний клієнт.
+Час закінчення береться з database.planning.LECTURE_TIMESLOTS за часом початку.
+
+Час занять пишеться місцевим часом settings.TIME_ZONE (DTSTART;TZID=...) з блоком VTIMEZONE,
+тож повтори серії лишаються на тій самій парі й після переходу на літній час; з TIME_ZONE = 'UTC'
+час пишеться в UTC без VTIMEZONE.
+"""
+import datetime
+from itertools import chain, groupby
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from database.models import LessonAttendance, PatternAttendance
+from database.planning import LECTURE_TIMESLOTS
+from database.recurrence import SERIES_FIELDS, occurrence_dates, pattern_field, schedule_bounds
+
+CHUNK_SIZE = 2000
+DEFAULT_DURATION = datetime.timedelta(minutes=80)
+PRODID = '-//Online Schedule//UK'
+
+EVENT_FIELDS = (
+    'lesson_id', 'date', 'start_time', 'lesson__lesson_type', 'lesson__course_id',
+    'lesson__course__course_name', 'lesson__course__teacher__full_name',
+    'subgroup__group__name', 'subgroup__number',
+)
+
+
+def _escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Рядки довші за 75 октетів переносяться з пробілом на початку продовження"""
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line + '\r\n'
+    parts = []
+    while raw:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(raw))
+        while cut < len(raw) and (raw[cut] & 0xC0) == 0x80:  # не розрізаємо символ UTF-8
+            cut -= 1
+        parts.append(raw[:cut].decode('utf-8'))
+        raw = raw[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(day, moment, zone):
+    value = datetime.datetime.combine(day, moment, tzinfo=zone).astimezone(datetime.timezone.utc)
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def _offset(delta):
+    seconds = int(delta.total_seconds())
+    sign = '-' if seconds < 0 else '+'
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{sign}{hours:02d}{minutes:02d}' + (f'{seconds:02d}' if seconds else '')
+
+
+def _transitions(zone, first_year, last_year):
+    """Миті зміни зсуву зони (UTC) з першого по останній рік: подобовий прохід і бінарний пошук до секунди"""
+    def offset(moment, seconds=0):
+        return (moment + datetime.timedelta(seconds=seconds)).astimezone(zone).utcoffset()
+
+    moment = datetime.datetime(first_year, 1, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(last_year + 1, 1, 1, tzinfo=datetime.timezone.utc)
+    day = 24 * 60 * 60
+    while moment < end:
+        if offset(moment) != offset(moment, day):
+            low, high = 0, day
+            while high - low > 1:
+                middle = (low + high) // 2
+                low, high = (middle, high) if offset(moment, middle) == offset(moment) else (low, middle)
+            yield moment + datetime.timedelta(seconds=high)
+        moment += datetime.timedelta(days=1)
+
+
+def _vtimezone(zone, first_year, last_year):
+    """
+    VTIMEZONE зони за роки розкладу: початковий період з 1 січня першого року і по
+    компоненту STANDARD/DAYLIGHT на кожен перехід (DTSTART — місцевий час до переходу)
+    """
+    start = datetime.datetime(first_year, 1, 1, tzinfo=zone)
+    periods = [(start.replace(tzinfo=None), start, start)]
+    for moment in _transitions(zone, first_year, last_year):
+        before = (moment - datetime.timedelta(seconds=1)).astimezone(zone)
+        after = moment.astimezone(zone)
+        periods.append(((moment + before.utcoffset()).replace(tzinfo=None), before, after))
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{zone.key}']
+    for local_start, before, after in periods:
+        kind = 'DAYLIGHT' if after.dst() else 'STANDARD'
+        lines += [
+            f'BEGIN:{kind}',
+            f"DTSTART:{local_start.strftime('%Y%m%dT%H%M%S')}",
+            f'TZOFFSETFROM:{_offset(before.utcoffset())}',
+            f'TZOFFSETTO:{_offset(after.utcoffset())}',
+            f'TZNAME:{after.tzname()}',
+            f'END:{kind}',
+        ]
+    return lines + ['END:VTIMEZONE']
+
+
+def _times(name, days, moment, zone):
+    """Властивість дати-часу (DTSTART, EXDATE...) для днів days: місцевий час з TZID, для зони UTC — в UTC"""
+    if zone.key == 'UTC':
+        return f"{name}:{','.join(_utc(day, moment, zone) for day in days)}"
+    local = (datetime.datetime.combine(day, moment).strftime('%Y%m%dT%H%M%S') for day in days)
+    return f"{name};TZID={zone.key}:{','.join(local)}"
+
+
+def _event_lines(uid, day, start_time, summary, description, stamp, ends, zone, series=None):
+    end_time = ends.get(start_time)
+    if end_time is None:
+        end_time = (datetime.datetime.combine(day, start_time) + DEFAULT_DURATION).time()
+    recurrence = ()
+    if series is not None:
+        last, exceptions = series
+        # UNTIL за RFC 5545 — завжди в UTC, навіть коли DTSTART має TZID
+        recurrence = (f'RRULE:FREQ=WEEKLY;UNTIL={_utc(last, start_time, zone)}',)
+        if exceptions:
+            recurrence += (_times('EXDATE', exceptions, start_time, zone),)
+    return (
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        _times('DTSTART', [day], start_time, zone),
+        _times('DTEND', [day], end_time, zone),
+        *recurrence,
+        f'SUMMARY:{_escape(summary)}',
+        f'DESCRIPTION:{_escape(description)}',
+        'END:VEVENT',
+    )
+
+
+def _pattern_rows(patterns, order):
+    """
+    Відвідування серій кортежами EVENT_FIELDS (lesson_id — id серії, date — перше заняття)
+    з хвостом (остання дата, [дати винятків]); серії без жодного заняття пропускаються
+    """
+    rows = (
+        patterns.order_by(*order)
+        .values_list(*(pattern_field(field) for field in EVENT_FIELDS), *SERIES_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for row in rows:
+        weekday, first, last, exceptions = row[len(EVENT_FIELDS):]
+        dates = list(occurrence_dates(weekday, first, last))
+        if not dates:
+            continue
+        exceptions = set(exceptions)
+        skipped = [day for day in dates if day.isoformat() in exceptions]
+        yield (row[0], dates[0], *row[2:len(EVENT_FIELDS)], (dates[-1], skipped))
+
+
+def _calendar(name, events, stamp, domain):
+    """
+    Генератор рядків календаря; events — ітерація (uid, дата, час, summary, description[, series]),
+    series — (остання дата, [винятки]) для щотижневої серії
+    """
+    ends = dict(LECTURE_TIMESLOTS)
+    zone = ZoneInfo(settings.TIME_ZONE)
+    stamp = stamp.astimezone(datetime.timezone.utc)
+    for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+                 f'X-WR-CALNAME:{_escape(name)}'):
+        yield _fold(line)
+    if zone.key != 'UTC':
+        first, last = schedule_bounds()
+        years = (first.year, last.year) if first is not None else (stamp.year, stamp.year)
+        yield ''.join(_fold(line) for line in _vtimezone(zone, *years))
+    stamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    for uid, day, start_time, summary, description, *series in events:
+        yield ''.join(_fold(line) for line in _event_lines(
+            f'{uid}@{domain}', day, start_time, summary, description, stamp, ends, zone, *series,
+        ))
+    yield _fold('END:VCALENDAR')
+
+
+def subgroup_calendar(subgroup, stamp, domain):
+    """Календар підгрупи: одна подія на заняття і одна повторювана подія на серію"""
+    rows = (
+        LessonAttendance.objects.in_version().filter(subgroup=subgroup)
+        .order_by('date', 'start_time')
+        .values_list(*EVENT_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    events = (
+        (f'lesson-{lesson_id}', day, start_time, f'{course_name} ({lesson_type})', teacher_name)
+        for (lesson_id, day, start_time, lesson_type, course_id, course_name, teacher_name,
+             group_name, number) in rows
+    )
+    series = (
+        (f'pattern-{pattern_id}', day, start_time, f'{course_name} ({lesson_type})', teacher_name, recurrence)
+        for (pattern_id, day, start_time, lesson_type, course_id, course_name, teacher_name,
+             group_name, number, recurrence) in _pattern_rows(
+            PatternAttendance.objects.in_version().filter(subgroup=subgroup),
+            ('pattern__start_date', 'pattern__start_time'),
+        )
+    )
+    return _calendar(f'{subgroup.group.name}/{subgroup.number}', chain(events, series), stamp, domain)
+
+
+def teacher_calendar(teacher, stamp, domain):
+    """
+    Календар викладача: лекція на кілька підгруп — одна подія Lesson (або серія) з кількома
+    відвідуваннями, тож сусідні рядки тієї самої події зливаються в одну подію календаря зі списком підгруп
+    """
+    rows = (
+        LessonAttendance.objects.in_version().filter(lesson__course__teacher=teacher)
+        .order_by('date', 'start_time', 'lesson_id', 'subgroup__group__name', 'subgroup__number')
+        .values_list(*EVENT_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    def events():
+        for lesson_id, slot in groupby(rows, key=lambda row: row[0]):
+            slot = list(slot)
+            _, day, start_time, lesson_type, _, course_name = slot[0][:6]
+            subgroups = ', '.join(f'{row[7]}/{row[8]}' for row in slot)
+            yield (f'lesson-{lesson_id}', day, start_time, f'{course_name} ({lesson_type})', subgroups)
+
+    patterns = _pattern_rows(
+        PatternAttendance.objects.in_version().filter(pattern__course__teacher=teacher),
+        ('pattern_id', 'subgroup__group__name', 'subgroup__number'),
+    )
+
+    def series():
+        for pattern_id, slot in groupby(patterns, key=lambda row: row[0]):
+            slot = list(slot)
+            _, day, start_time, lesson_type, _, course_name = slot[0][:6]
+            subgroups = ', '.join(f'{row[7]}/{row[8]}' for row in slot)
+            yield (f'pattern-{pattern_id}', day, start_time, f'{course_name} ({lesson_type})', subgroups, slot[0][9])
+
+    return _calendar(teacher.full_name, chain(events(), series()), stamp, domain)
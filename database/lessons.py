@@ -0,0 +1,106 @@
+"""
+Запис занять у модель «подія + відвідування».
+
+Lesson — одна подія курсу в слоті (дата, пара), LessonAttendance — підгрупа на ній.
+Генератор і надалі планує PlannedLesson по рядку на підгрупу; тут рядки однієї
+події (курс, дата, пара) зливаються в один Lesson, тож лекція на потік займає
+один рядок замість одного на кожну підгрупу. Щотижневі повтори save_schedule
+ще й згортає в серії LessonPattern — один рядок на весь семестр.
+Запис іде у версію розкладу version; без неї — в активну, тобто одразу видимий читачам.
+"""
+from django.db import transaction
+
+from database.models import Lesson, LessonAttendance, active_version
+from database.recurrence import save_patterns, series_slots, split_series
+from database.weeks import refresh_weeks
+
+BATCH_SIZE = 1000
+
+
+def save_schedule(planned, batch_size=BATCH_SIZE, version=None):
+    """
+    Запис результату генератора: щотижневі серії — шаблонами LessonPattern (database.recurrence),
+    решта — окремими подіями через save_lessons. Серія, що зачепила б уже зайнятий слот підгрупи,
+    теж пишеться подіями: конфліктні заняття відкидає attendance_subgroup_slot_uniq.
+    Повертає кількість справді записаних занять підгруп. Індекс тижнів і кеш оновлює викликач.
+    """
+    version = version or active_version()
+    patterns = save_patterns(split_series(planned)[0], version, batch_size=batch_size)
+    patterned = series_slots(patterns)
+    saved = sum(1 for p in planned if (p.course_id, p.date, p.start_time) in patterned)
+    return saved + save_lessons([p for p in planned if (p.course_id, p.date, p.start_time) not in patterned],
+                                batch_size=batch_size, version=version)
+
+
+def save_lessons(planned, batch_size=BATCH_SIZE, version=None):
+    """
+    Пакетний запис PlannedLesson (course_id, subgroup_id, date, start_time, lesson_type).
+    Наявна подія того самого курсу в тому самому слоті доповнюється підгрупами.
+    Слот підгрупи, вже зайнятий у БД, відкидає обмеження attendance_subgroup_slot_uniq
+    (ignore_conflicts); нова подія, що лишилася без жодної підгрупи, видаляється.
+    Повертає кількість справді вставлених занять підгруп (без відкинутих конфліктів).
+    Індекс тижнів і кеш оновлює викликач.
+    """
+    events = {}
+    for p in planned:
+        events.setdefault((p.course_id, p.date, p.start_time), (p.lesson_type, []))[1].append(p.subgroup_id)
+    if not events:
+        return 0
+
+    version = version or active_version()
+    course_ids = {course_id for course_id, _, _ in events}
+    window = (min(day for _, day, _ in events), max(day for _, day, _ in events))
+    # ignore_conflicts не повідомляє, скільки рядків пропущено, тож рахуються рядки до і після
+    attendance = LessonAttendance.objects.filter(version=version, lesson__course_id__in=course_ids,
+                                                 date__range=window)
+    before = attendance.count()
+
+    def existing_ids():
+        return {
+            (course_id, day, start_time): lesson_id
+            for lesson_id, course_id, day, start_time in Lesson.objects.filter(
+                version=version, course_id__in=course_ids, date__range=window,
+            ).values_list('id', 'course_id', 'date', 'start_time').iterator(chunk_size=batch_size * 5)
+        }
+
+    lesson_ids = existing_ids()
+    missing = [key for key in events if key not in lesson_ids]
+    created = Lesson.objects.bulk_create(
+        [Lesson(version=version, course_id=key[0], date=key[1], start_time=key[2], lesson_type=events[key][0])
+         for key in missing],
+        batch_size=batch_size,
+    )
+    if created and created[0].pk is None:  # БД без RETURNING для пакетної вставки
+        lesson_ids = existing_ids()
+    else:
+        lesson_ids.update((key, lesson.pk) for key, lesson in zip(missing, created))
+
+    LessonAttendance.objects.bulk_create(
+        (
+            LessonAttendance(lesson_id=lesson_ids[key], subgroup_id=subgroup_id, version=version, date=key[1],
+                             start_time=key[2])
+            for key, (_, subgroup_ids) in events.items()
+            for subgroup_id in subgroup_ids
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    if created:
+        Lesson.objects.filter(
+            version=version, course_id__in=course_ids, date__range=window, attendance__isnull=True,
+        ).delete()
+    return attendance.count() - before
+
+
+def create_lesson(course, subgroups, date, start_time, lesson_type):
+    """Одна подія активної версії з її підгрупами поза пакетним записом (shell, тести); оновлює індекс тижнів"""
+    with transaction.atomic():
+        version = active_version()
+        lesson = Lesson.objects.create(course=course, version=version, date=date, start_time=start_time,
+                                       lesson_type=lesson_type)
+        LessonAttendance.objects.bulk_create([
+            LessonAttendance(lesson=lesson, subgroup=subgroup, version=version, date=date, start_time=start_time)
+            for subgroup in subgroups
+        ])
+        refresh_weeks([date])
+    return lesson
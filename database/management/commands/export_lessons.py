@@ -0,0 +1,37 @@
+import sys
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from database.export import FORMATS, write_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Потокове вивантаження занять з курсом, викладачем, підгрупою і групою "
+        "у CSV або колонковий формат (.lcol) з обмеженим використанням пам'яті."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', required=True, help="Шлях до файлу або '-' для stdout")
+        parser.add_argument('--start', type=date.fromisoformat, help="Лише заняття від цієї дати, YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, help="Лише заняття до цієї дати, YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        fmt, path = options['format'], options['output']
+        started = time.monotonic()
+        if path == '-':
+            output = sys.stdout if fmt == 'csv' else sys.stdout.buffer
+            rows = write_export(fmt, output, options['start'], options['end'])
+            output.flush()
+        elif fmt == 'csv':
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                rows = write_export(fmt, output, options['start'], options['end'])
+        else:
+            with open(path, 'wb') as output:
+                rows = write_export(fmt, output, options['start'], options['end'])
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stderr.write(f"Exported {rows} lessons in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
@@ -0,0 +1,170 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from database.lessons import save_lessons
+from database.models import Lesson, LessonAttendance, LessonPattern, ScheduleRun, ScheduleVersion
+from database.recurrence import remove_occurrences
+from database.versions import create_draft, publish
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерує розклад для навчальних планів у нову версію (копію активної) і записує його потижнево "
+        "окремими транзакціями; після останнього тижня версія публікується. "
+        "Перерваний запуск продовжується з останнього записаного тижня через --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plan', type=int, action='append', dest='plan_ids',
+                            help="ID навчального плану (можна кілька разів; за замовчуванням — усі)")
+        parser.add_argument('--semester', type=int)
+        parser.add_argument('--start', type=date.fromisoformat, help="Початок семестру, YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, help="Кінець семестру, YYYY-MM-DD")
+        parser.add_argument('--strategy', default='greedy')
+        parser.add_argument('--optimize', action='store_true')
+        parser.add_argument('--workers', type=int, help="Кількість процесів для незалежних кластерів планів")
+        parser.add_argument('--replace', action='store_true',
+                            help="Не переносити в нову версію наявні заняття цих планів у діапазоні дат")
+        parser.add_argument('--resume', type=int, metavar='RUN_ID',
+                            help="Продовжити перерваний запуск з останнього записаного тижня з його налаштуваннями")
+        parser.add_argument('--no-publish', action='store_true',
+                            help="Лишити згенеровану версію чернеткою (опублікувати: schedule_versions --publish)")
+
+    def handle(self, *args, **options):
+        from create_schedule import ScheduleGenerator, plan_all_plans
+
+        if options['strategy'] not in ScheduleGenerator.STRATEGIES:
+            raise CommandError(f"Unknown strategy {options['strategy']!r}")
+        if options['resume']:
+            run = self._resumable_run(options['resume'])
+            start_from = run.committed_through + timedelta(days=1) if run.committed_through else run.start_date
+        else:
+            run = self._new_run(options)
+            # І новий запуск планує з start_from: заняття, скопійовані в чернетку з активної версії,
+            # зараховуються як виконані (ScheduleGenerator._remaining_counts), тож без --replace
+            # повторний запуск не дублює розклад, а лише доставляє бракуючі години
+            start_from = run.start_date
+
+        if start_from > run.end_date:
+            self._finish(run, options)
+            self.stdout.write(f"Run #{run.pk} is already complete")
+            return
+
+        self.stdout.write(f"Run #{run.pk}: planning {start_from} – {run.end_date}")
+        try:
+            planned, unmet = plan_all_plans(
+                run.semester, run.start_date, run.end_date,
+                strategy=run.strategy,
+                optimize=run.optimize, workers=run.workers,
+                plan_ids=run.plan_ids or None, start_from=start_from, version=run.version,
+            )
+            self._write_weekly(run, planned, start_from, ScheduleGenerator.BULK_BATCH_SIZE)
+        except BaseException:
+            run.status = ScheduleRun.STATUS_FAILED
+            run.save(update_fields=['status', 'updated_at'])
+            self.stderr.write(f"Run #{run.pk} stopped; continue with --resume {run.pk}")
+            raise
+
+        self._finish(run, options)
+        if unmet:
+            self.stdout.write(self.style.WARNING(f"Unscheduled hours left for {len(unmet)} courses"))
+        self.stdout.write(self.style.SUCCESS(f"Run #{run.pk} done: {run.lessons_written} lessons written"))
+
+    def _finish(self, run, options):
+        """
+        Публікація чернетки запуску — атомарна заміна активного розкладу. Якщо активний розклад
+        змінився після копіювання, запуск завершується, а чернетка лишається неопублікованою
+        """
+        refused = None
+        if not options['no_publish']:
+            try:
+                publish(run.version)
+                self.stdout.write(f"Published version #{run.version_id}")
+            except ValueError as error:
+                refused = error
+        run.status = ScheduleRun.STATUS_DONE
+        run.save(update_fields=['status', 'updated_at'])
+        if refused:
+            raise CommandError(f"{refused} (schedule_versions --publish {run.version_id} --force)")
+
+    def _new_run(self, options):
+        missing = [name for name in ('semester', 'start', 'end') if options[name] is None]
+        if missing:
+            raise CommandError(f"Required for a new run: {', '.join('--' + name for name in missing)}")
+        if options['start'] > options['end']:
+            raise CommandError("Start date must be before end date")
+
+        run = ScheduleRun.objects.create(
+            plan_ids=options['plan_ids'] or [],
+            semester=options['semester'],
+            start_date=options['start'],
+            end_date=options['end'],
+            strategy=options['strategy'],
+            optimize=options['optimize'],
+            workers=options['workers'],
+        )
+        run.version = create_draft(f"Run #{run.pk}")
+        run.save(update_fields=['version', 'updated_at'])
+        if options['replace']:
+            lessons = Lesson.objects.filter(
+                version=run.version,
+                date__range=(run.start_date, run.end_date),
+                course__semester=run.semester,
+            )
+            patterns = LessonPattern.objects.filter(version=run.version, course__semester=run.semester)
+            if run.plan_ids:
+                lessons = lessons.filter(course__study_plan_id__in=run.plan_ids)
+                patterns = patterns.filter(course__study_plan_id__in=run.plan_ids)
+            _, deleted = lessons.delete()
+            deleted = deleted.get(LessonAttendance._meta.label, 0)
+            deleted += remove_occurrences(patterns, run.start_date, run.end_date).count
+            self.stdout.write(f"Left out {deleted} existing lessons")
+        return run
+
+    def _resumable_run(self, run_id):
+        try:
+            run = ScheduleRun.objects.get(pk=run_id)
+        except ScheduleRun.DoesNotExist:
+            raise CommandError(f"Run #{run_id} does not exist")
+        if run.status == ScheduleRun.STATUS_DONE:
+            raise CommandError(f"Run #{run_id} is already complete")
+        if run.version is None or run.version.status != ScheduleVersion.STATUS_BUILDING:
+            raise CommandError(f"Run #{run_id} has no draft version to resume, start a new run")
+        return run
+
+    def _write_weekly(self, run, planned, start_from, batch_size):
+        """
+        Кожен тиждень — окрема коротка транзакція разом з позначкою committed_through.
+        Пишеться в чернетку запуску, тож читачі не бачать тижнів до публікації
+        """
+        weeks = defaultdict(list)
+        for p in planned:
+            weeks[p.date - timedelta(days=p.date.weekday())].append(p)
+
+        first_monday = start_from - timedelta(days=start_from.weekday())
+        week_starts = []
+        monday = first_monday
+        while monday <= run.end_date:
+            week_starts.append(monday)
+            monday += timedelta(weeks=1)
+
+        started = time.monotonic()
+        written = 0
+        for number, week_start in enumerate(week_starts, start=1):
+            chunk = weeks.get(week_start, [])
+            with transaction.atomic():
+                inserted = save_lessons(chunk, batch_size=batch_size, version=run.version)
+                run.committed_through = min(week_start + timedelta(days=6), run.end_date)
+                run.lessons_written += inserted
+                run.save(update_fields=['committed_through', 'lessons_written', 'updated_at'])
+            written += inserted
+            elapsed = max(time.monotonic() - started, 1e-9)
+            dropped = f", {len(chunk) - inserted} conflicting dropped" if inserted < len(chunk) else ''
+            self.stdout.write(
+                f"[{number}/{len(week_starts)}] week of {week_start}: {inserted} lessons{dropped} "
+                f"({written / elapsed:.0f} lessons/s)"
+            )
@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from database.partitions import (
+    AHEAD_MONTHS, ARCHIVE_SCHEMA, TABLES, archive_partitions, ensure_partitions, is_partitioned, partitions,
+)
+
+
+def _months(found):
+    return ', '.join(f"{year}-{month:02d}" for year, month in found) or '-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Обслуговування секцій Lesson і LessonAttendance на PostgreSQL: створює секції на наступні місяці "
+        "(рядки з _default переносяться в них), відокремлює старі місяці в архівну схему або видаляє — "
+        "для запуску з cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=AHEAD_MONTHS,
+                            help="На скільки місяців від сьогодні мають існувати секції")
+        parser.add_argument('--archive-before', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help=f"Відокремити в схему {ARCHIVE_SCHEMA} секції, що закінчилися до цієї дати")
+        parser.add_argument('--drop', action='store_true', help="Разом з --archive-before видалити секції")
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("Lesson tables are not partitioned (PostgreSQL with migration 0013 is required)")
+        if options['drop'] and not options['archive_before']:
+            raise CommandError("--drop requires --archive-before")
+
+        created = ensure_partitions(options['ahead'])
+        self.stdout.write(f"Created {len(created)} partitions: {_months(created)}")
+        if options['archive_before']:
+            stale = archive_partitions(options['archive_before'], drop=options['drop'])
+            action = 'Dropped' if options['drop'] else f"Archived to {ARCHIVE_SCHEMA}"
+            self.stdout.write(f"{action} {len(stale)} partitions: {_months(stale)}")
+
+        with connection.cursor() as cursor:
+            self.stdout.write(f"Partitions: {_months(partitions(cursor, TABLES[0]))}")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from database.models import ScheduleVersion
+from database.versions import KEEP_RETIRED, prune_versions, publish
+
+
+class Command(BaseCommand):
+    help = (
+        "Версії розкладу: список, публікація чернетки (атомарна заміна активного розкладу) "
+        "і видалення старих архівних версій порціями — для запуску з cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publish', type=int, metavar='VERSION_ID', help="Зробити чернетку активною")
+        parser.add_argument('--force', action='store_true',
+                            help="Разом з --publish: навіть якщо активний розклад змінився після копіювання")
+        parser.add_argument('--prune', action='store_true', help="Видалити архівні версії, крім --keep останніх")
+        parser.add_argument('--keep', type=int, default=KEEP_RETIRED, help="Скільки архівних версій лишити")
+        parser.add_argument('--drafts', action='store_true',
+                            help="Разом з --prune видалити й чернетки, що не належать запуску generate_schedule")
+
+    def handle(self, *args, **options):
+        if options['publish']:
+            try:
+                version = publish(ScheduleVersion(pk=options['publish']), force=options['force'])
+            except ScheduleVersion.DoesNotExist:
+                raise CommandError(f"Version #{options['publish']} does not exist")
+            except ValueError as error:
+                raise CommandError(str(error))
+            self.stdout.write(self.style.SUCCESS(f"Published version #{version.pk}"))
+        if options['prune']:
+            pruned = prune_versions(keep=options['keep'], drafts=options['drafts'])
+            self.stdout.write(f"Pruned {len(pruned)} versions: {', '.join(f'#{pk}' for pk in pruned) or '-'}")
+
+        versions = ScheduleVersion.objects.annotate(lesson_count=Count('lessons')).order_by('-id')
+        for version in versions:
+            published = version.published_at.strftime('%Y-%m-%d %H:%M') if version.published_at else '-'
+            self.stdout.write(
+                f"#{version.pk} {version.status:8} lessons={version.lesson_count} published={published} {version.label}"
+            )
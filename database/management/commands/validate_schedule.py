@@ -0,0 +1,48 @@
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from database.validation import KINDS, check_lessons, load_lessons
+
+
+class Command(BaseCommand):
+    help = (
+        "Перевіряє збережений розклад на подвійні бронювання викладачів і підгруп, "
+        "перевищення пар на день і allowed_hours. Завершується з помилкою, якщо є порушення."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', type=int)
+        parser.add_argument('--plan', type=int, action='append', dest='plan_ids',
+                            help="ID навчального плану (можна кілька разів; за замовчуванням — усі)")
+        parser.add_argument('--start', type=date.fromisoformat, help="Лише заняття від цієї дати, YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, help="Лише заняття до цієї дати, YYYY-MM-DD")
+        parser.add_argument('--limit', type=int, default=20, help="Скільки порушень кожного виду вивести")
+        parser.add_argument('--schedule-version', type=int, dest='version_id',
+                            help="Перевірити цю версію розкладу, напр. чернетку до публікації (за замовчуванням — активну)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        lessons = load_lessons(options['semester'], options['start'], options['end'], options['plan_ids'],
+                               version=options['version_id'])
+        loaded = time.monotonic()
+        violations = check_lessons(lessons)
+        checked = time.monotonic()
+        self.stdout.write(
+            f"{len(lessons.id)} lessons: loaded in {loaded - started:.2f}s, checked in {checked - loaded:.2f}s"
+        )
+
+        shown = Counter()
+        for violation in violations:
+            shown[violation.kind] += 1
+            if shown[violation.kind] <= options['limit']:
+                details = ', '.join(f'{field}={value}' for field, value in violation._asdict().items()
+                                    if field != 'kind' and value is not None)
+                self.stdout.write(f"{violation.kind}: {details}")
+
+        if violations:
+            summary = ', '.join(f"{kind}={shown[kind]}" for kind in KINDS if shown[kind])
+            raise CommandError(f"Schedule has {len(violations)} violations ({summary})")
+        self.stdout.write(self.style.SUCCESS("No violations found"))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_double_bookings(apps, schema_editor):
+    """Перед унікальним обмеженням лишає по одному заняттю на (subgroup, date, start_time)"""
+    Lesson = apps.get_model('database', 'Lesson')
+    duplicates = (
+        Lesson.objects.values('subgroup_id', 'date', 'start_time')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        Lesson.objects.filter(
+            subgroup_id=row['subgroup_id'], date=row['date'], start_time=row['start_time'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0002_schedulerun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'date', 'start_time'], name='lesson_course_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['date', 'start_time'], name='lesson_date_slot_idx'),
+        ),
+        migrations.RunPython(drop_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('subgroup', 'date', 'start_time'), name='lesson_subgroup_slot_uniq'),
+        ),
+    ]
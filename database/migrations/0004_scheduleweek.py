@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:26
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+
+def build_index(apps, schema_editor):
+    """Початкове заповнення індексу з наявних занять (те саме, що database.weeks.rebuild_weeks)"""
+    Lesson = apps.get_model('database', 'Lesson')
+    ScheduleWeek = apps.get_model('database', 'ScheduleWeek')
+    summaries = {}
+    rows = (
+        Lesson.objects.annotate(week=TruncWeek('date'))
+        .values_list('week', 'subgroup__group_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for week, group_id, total in rows:
+        summary = summaries.setdefault(week, [0, set()])
+        summary[0] += total
+        summary[1].add(group_id)
+    ScheduleWeek.objects.bulk_create([
+        ScheduleWeek(week_start=week, lesson_count=count, group_ids=sorted(groups))
+        for week, (count, groups) in sorted(summaries.items())
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0003_lesson_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleWeek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(unique=True)),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('group_ids', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0004_scheduleweek'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubgroupWorkload',
+            fields=[
+                ('subgroup', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to='database.subgroup')),
+                ('lectures', models.PositiveIntegerField(default=0)),
+                ('practices', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TeacherWorkload',
+            fields=[
+                ('teacher', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to='database.teacher')),
+                ('lessons', models.PositiveIntegerField(default=0)),
+                ('scheduled_hours', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0005_workload_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='database.lesson')),
+                ('subgroup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='database.subgroup')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'start_time'], name='attendance_date_slot_idx')],
+                'constraints': [models.UniqueConstraint(fields=('subgroup', 'date', 'start_time'), name='attendance_subgroup_slot_uniq')],
+            },
+        ),
+    ]
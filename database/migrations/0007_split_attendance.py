@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:52
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def split_attendance(apps, schema_editor):
+    """
+    Рядки однієї лекції (курс, дата, пара) для різних підгруп зливаються в одну подію:
+    лишається заняття з найменшим id, кожна підгрупа стає рядком LessonAttendance
+    """
+    Lesson = apps.get_model('database', 'Lesson')
+    LessonAttendance = apps.get_model('database', 'LessonAttendance')
+    rows = (
+        Lesson.objects.order_by('course_id', 'date', 'start_time', 'id')
+        .values_list('id', 'course_id', 'date', 'start_time', 'subgroup_id')
+        .iterator(chunk_size=BATCH_SIZE * 5)
+    )
+    attendance, duplicates = [], []
+    key = keep = None
+    for lesson_id, course_id, day, start_time, subgroup_id in rows:
+        if (course_id, day, start_time) != key:
+            key, keep = (course_id, day, start_time), lesson_id
+        else:
+            duplicates.append(lesson_id)
+        attendance.append(LessonAttendance(lesson_id=keep, subgroup_id=subgroup_id, date=day, start_time=start_time))
+        if len(attendance) >= BATCH_SIZE:
+            LessonAttendance.objects.bulk_create(attendance)
+            attendance = []
+    LessonAttendance.objects.bulk_create(attendance)
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        Lesson.objects.filter(id__in=duplicates[start:start + BATCH_SIZE]).delete()
+
+
+class Migration(migrations.Migration):
+    # Окремо від змін схеми Lesson: на PostgreSQL відкладені перевірки зовнішніх ключів після
+    # вставок і видалень не дозволяють ALTER TABLE тих самих таблиць у цій транзакції
+
+    dependencies = [
+        ('database', '0006_shared_lessons'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_attendance, migrations.RunPython.noop),
+    ]
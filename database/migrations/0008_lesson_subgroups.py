@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0007_split_attendance'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='lesson',
+            name='lesson_subgroup_slot_uniq',
+        ),
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='lesson_course_slot_idx',
+        ),
+        migrations.RemoveField(
+            model_name='lesson',
+            name='subgroup',
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='subgroups',
+            field=models.ManyToManyField(related_name='lessons', through='database.LessonAttendance', to='database.subgroup'),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('course', 'date', 'start_time'), name='lesson_course_slot_uniq'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0008_lesson_subgroups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonPattern',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('start_time', models.TimeField()),
+                ('lesson_type', models.CharField(max_length=50)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('exceptions', models.JSONField(blank=True, default=list)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patterns', to='database.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PatternAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='database.lessonpattern')),
+                ('subgroup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pattern_attendance', to='database.subgroup')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lessonpattern',
+            name='subgroups',
+            field=models.ManyToManyField(related_name='patterns', through='database.PatternAttendance', to='database.subgroup'),
+        ),
+        migrations.AddConstraint(
+            model_name='patternattendance',
+            constraint=models.UniqueConstraint(fields=('subgroup', 'pattern'), name='pattern_attendance_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonpattern',
+            index=models.Index(fields=['end_date', 'start_date'], name='pattern_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessonpattern',
+            constraint=models.UniqueConstraint(fields=('course', 'weekday', 'start_time', 'start_date'), name='pattern_course_slot_uniq'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0009_lesson_patterns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('building', 'Building'), ('active', 'Active'), ('retired', 'Retired')], default='building', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='lesson',
+            name='lesson_course_slot_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='lessonattendance',
+            name='attendance_subgroup_slot_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='lessonpattern',
+            name='pattern_course_slot_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='scheduleversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('status',), name='schedule_version_single_active'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='database.scheduleversion'),
+        ),
+        migrations.AddField(
+            model_name='lessonattendance',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='database.scheduleversion'),
+        ),
+        migrations.AddField(
+            model_name='lessonpattern',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='patterns', to='database.scheduleversion'),
+        ),
+        migrations.AddField(
+            model_name='schedulerun',
+            name='version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='runs', to='database.scheduleversion'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:50
+
+from django.db import migrations
+
+VERSIONED = ('Lesson', 'LessonAttendance', 'LessonPattern')
+
+
+def assign_initial_version(apps, schema_editor):
+    """Наявний розклад стає першою, одразу активною версією"""
+    ScheduleVersion = apps.get_model('database', 'ScheduleVersion')
+    version = ScheduleVersion.objects.create(label='initial', status='active')
+    for name in VERSIONED:
+        apps.get_model('database', name).objects.update(version=version)
+
+
+class Migration(migrations.Migration):
+    # Окремо від змін схеми: на PostgreSQL після оновлення рядків у транзакції лишаються
+    # відкладені перевірки зовнішніх ключів, і ALTER TABLE тих самих таблиць не виконується
+
+    dependencies = [
+        ('database', '0010_schedule_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_initial_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0011_assign_initial_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lesson',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='database.scheduleversion'),
+        ),
+        migrations.AlterField(
+            model_name='lessonattendance',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='database.scheduleversion'),
+        ),
+        migrations.AlterField(
+            model_name='lessonpattern',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patterns', to='database.scheduleversion'),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('course', 'date', 'start_time', 'version'), name='lesson_course_slot_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessonattendance',
+            constraint=models.UniqueConstraint(fields=('subgroup', 'date', 'start_time', 'version'), name='attendance_subgroup_slot_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessonpattern',
+            constraint=models.UniqueConstraint(fields=('course', 'weekday', 'start_time', 'start_date', 'version'), name='pattern_course_slot_uniq'),
+        ),
+    ]
@@ -0,0 +1,187 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import datetime
+
+from django.db import migrations
+
+# Імена таблиць зафіксовані тут, а не взяті з моделей: міграція не залежить від коду застосунку
+LESSON = 'database_lesson'
+ATTENDANCE = 'database_lessonattendance'
+TABLES = (LESSON, ATTENDANCE)  # події раніше за відвідування, що на них посилаються
+LESSON_FK = 'attendance_lesson_date_fk'
+PLAIN_LESSON_FK = 'database_lessonattendance_lesson_id_fk_database_lesson_id'
+MAX_NAME_LENGTH = 63  # NAMEDATALEN - 1 у PostgreSQL
+
+
+def _month_range(year, month):
+    """Межі секції місяця [початок, кінець): понеділки тижнів з 1-м числом цього і наступного місяця"""
+    first = datetime.date(year, month, 1)
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return (first - datetime.timedelta(days=first.weekday()),
+            following - datetime.timedelta(days=following.weekday()))
+
+
+def _month_of(day):
+    following = (day.year + day.month // 12, day.month % 12 + 1)
+    return following if day >= _month_range(*following)[0] else (day.year, day.month)
+
+
+def _months(first, last):
+    year, month = _month_of(first)
+    end = _month_of(last)
+    while (year, month) <= end:
+        yield year, month
+        year, month = year + month // 12, month % 12 + 1
+
+
+def _definitions(cursor, table):
+    """Обмеження (крім первинного ключа) та індекси таблиці, не пов'язані з обмеженнями, — щоб відтворити їх"""
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('u', 'f', 'c')",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+        [table, table],
+    )
+    # Індекс секціонованої таблиці описується як ON ONLY — для звичайної таблиці він не потрібен
+    indexes = [indexdef.replace(' ON ONLY ', ' ON ') for indexdef, in cursor.fetchall()]
+    return constraints, indexes
+
+
+def _restore(cursor, table, constraints, indexes, quote):
+    for name, definition in constraints:
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+    for indexdef in indexes:
+        cursor.execute(indexdef)
+
+
+def _name_indexes(cursor, partition, suffix, quote):
+    """Індекси секції називаються <індекс батьківської>_<суфікс>, як у database.partitions"""
+    cursor.execute("""
+        SELECT child.relname, parent.relname FROM pg_index x
+        JOIN pg_class child ON child.oid = x.indexrelid
+        JOIN pg_inherits i ON i.inhrelid = x.indexrelid
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE x.indrelid = %s::regclass
+    """, [partition])
+    for child, parent in cursor.fetchall():
+        name = f"{parent[:MAX_NAME_LENGTH - len(suffix) - 1]}_{suffix}"
+        if child != name:
+            cursor.execute(f"ALTER INDEX {quote(child)} RENAME TO {quote(name)}")
+
+
+def _partition(cursor, table, quote):
+    """
+    Звичайна таблиця -> секціонована за date з тими самими даними, обмеженнями й індексами:
+    секції місяців наявних даних і _default, первинний ключ (id, date), id — з послідовності
+    """
+    constraints, indexes = _definitions(cursor, table)
+    cursor.execute(f"SELECT min(date), max(date) FROM {quote(table)}")
+    first, last = cursor.fetchone()
+
+    old = f"{table}_unpartitioned"
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    cursor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+    cursor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+    for year, month in _months(first, last) if first is not None else ():
+        cursor.execute(
+            f"CREATE TABLE {quote(f'{table}_p{year}_{month:02d}')} PARTITION OF {quote(table)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            _month_range(year, month),
+        )
+    cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+    cursor.execute(f"DROP TABLE {quote(old)}")  # разом з його іменами індексів, обмежень і послідовності
+
+    sequence = f"{table}_id_seq"
+    cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence])
+    cursor.execute(f"SELECT setval(%s, coalesce(max(id), 1), max(id) IS NOT NULL) FROM {quote(table)}", [sequence])
+
+    cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id, date)")
+    _restore(cursor, table, constraints, indexes, quote)
+
+
+def _unpartition(cursor, table, quote):
+    """
+    Секціонована таблиця -> звичайна з тими самими даними: рядки всіх секцій (зокрема _default)
+    копіюються назад, первинний ключ знову id, id — identity-стовпець, як його створює Django
+    """
+    constraints, indexes = _definitions(cursor, table)
+    old = f"{table}_partitioned"
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    cursor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(old)})")
+    cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+    cursor.execute(f"DROP TABLE {quote(old)}")  # разом із секціями та послідовністю id
+
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 1), max(id) IS NOT NULL) "
+        f"FROM {quote(table)}",
+        [table],
+    )
+    cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id)")
+    _restore(cursor, table, constraints, indexes, quote)
+
+
+def partition_lessons(apps, schema_editor):
+    """Lesson і LessonAttendance стають секціонованими за датою (див. database.partitions); на інших БД — нічого"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        # Зовнішній ключ на події не може посилатися лише на id — первинний ключ секціонованої таблиці (id, date)
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND confrelid = %s::regclass",
+            [ATTENDANCE, LESSON],
+        )
+        for name, in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {quote(ATTENDANCE)} DROP CONSTRAINT {quote(name)}")
+        for table in TABLES:
+            _partition(cursor, table, quote)
+        cursor.execute(
+            f"ALTER TABLE {quote(ATTENDANCE)} ADD CONSTRAINT {quote(LESSON_FK)} FOREIGN KEY (lesson_id, date) "
+            f"REFERENCES {quote(LESSON)} (id, date) ON UPDATE CASCADE DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            "SELECT p.relname, c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = ANY(%s)",
+            [list(TABLES)],
+        )
+        for table, partition in cursor.fetchall():
+            _name_indexes(cursor, partition, partition[len(table) + 1:], quote)
+
+
+def unpartition_lessons(apps, schema_editor):
+    """
+    Зворотно: звичайні таблиці з усіма рядками наявних секцій і звичайним ключем відвідування -> подія.
+    Секції, уже перенесені в архівну схему (lesson_partitions --archive-before), не повертаються.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(ATTENDANCE)} DROP CONSTRAINT IF EXISTS {quote(LESSON_FK)}")
+        for table in TABLES:
+            _unpartition(cursor, table, quote)
+        cursor.execute(
+            f"ALTER TABLE {quote(ATTENDANCE)} ADD CONSTRAINT {quote(PLAIN_LESSON_FK)} FOREIGN KEY (lesson_id) "
+            f"REFERENCES {quote(LESSON)} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0012_version_not_null'),
+    ]
+
+    operations = [
+        # Схема для ORM не змінюється: лише фізичне розміщення таблиць на PostgreSQL
+        migrations.RunPython(partition_lessons, unpartition_lessons),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0013_partition_lessons'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleversion',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scheduleversion',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='drafts', to='database.scheduleversion'),
+        ),
+        migrations.AddField(
+            model_name='scheduleversion',
+            name='source_revision',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
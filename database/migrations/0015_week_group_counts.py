@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:40
+
+import datetime
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+
+def build_index(apps, schema_editor):
+    """Заповнення індексу з кількостями по групах для активної версії (те саме, що database.weeks.rebuild_weeks)"""
+    from database.recurrence import occurrence_dates
+
+    LessonAttendance = apps.get_model('database', 'LessonAttendance')
+    PatternAttendance = apps.get_model('database', 'PatternAttendance')
+    ScheduleWeek = apps.get_model('database', 'ScheduleWeek')
+    summaries = defaultdict(Counter)
+    rows = (
+        LessonAttendance.objects.filter(version__status='active').annotate(week=TruncWeek('date'))
+        .values_list('week', 'subgroup__group_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for week, group_id, total in rows:
+        summaries[week][group_id] += total
+    patterns = PatternAttendance.objects.filter(pattern__version__status='active').values_list(
+        'subgroup__group_id', 'pattern__weekday', 'pattern__start_date', 'pattern__end_date', 'pattern__exceptions',
+    )
+    for group_id, weekday, start_date, end_date, exceptions in patterns.iterator(chunk_size=5000):
+        for day in occurrence_dates(weekday, start_date, end_date, exceptions):
+            summaries[day - datetime.timedelta(days=day.weekday())][group_id] += 1
+    ScheduleWeek.objects.all().delete()
+    ScheduleWeek.objects.bulk_create([
+        ScheduleWeek(week_start=week, lesson_count=sum(groups.values()),
+                     group_counts={str(group_id): groups[group_id] for group_id in sorted(groups)})
+        for week, groups in sorted(summaries.items())
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0014_version_source'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='scheduleweek',
+            name='group_ids',
+        ),
+        migrations.AddField(
+            model_name='scheduleweek',
+            name='group_counts',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0015_week_group_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulerun',
+            name='optimize',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='schedulerun',
+            name='workers',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -63,14 +63,80 @@ class Subgroup(models.Model):
     def __str__(self):
         return f"{self.group.name} / {self.number} "
 
+class ScheduleVersion(models.Model):
+    """
+    Версія розкладу. Генерація пише заняття в нову версію (building), database.versions.publish
+    однією транзакцією робить її активною, а попередню — архівною (retired). Читачі бачать лише
+    активну версію, тож ніколи не бачать напівзгенерований розклад; архівні видаляє prune_versions.
+    """
+    STATUS_BUILDING = 'building'
+    STATUS_ACTIVE = 'active'
+    STATUS_RETIRED = 'retired'
+    STATUS_CHOICES = [
+        (STATUS_BUILDING, 'Building'),
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_RETIRED, 'Retired'),
+    ]
+
+    label = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_BUILDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    # Лічильник змін версії на місці, поки вона активна (database.weeks.refresh_weeks після кожного запису)
+    revision = models.PositiveIntegerField(default=0)
+    source = models.ForeignKey(  # активна версія, з якої скопійовано чернетку
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='drafts'
+    )
+    source_revision = models.PositiveIntegerField(null=True, blank=True)  # revision джерела на момент копіювання
+
+    class Meta:
+        constraints = [
+            # Активна версія завжди одна: publish спершу архівує попередню
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='active'),
+                                    name='schedule_version_single_active'),
+        ]
+
+    def __str__(self):
+        return f"Version #{self.pk} ({self.status})"
+
+def active_version():
+    """Активна версія розкладу; у порожній БД створюється"""
+    return ScheduleVersion.objects.get_or_create(status=ScheduleVersion.STATUS_ACTIVE)[0]
+
+class VersionedQuerySet(models.QuerySet):
+    """Вибірка занять у межах версії розкладу"""
+    version_field = 'version'
+
+    def in_version(self, version=None):
+        """Рядки версії version; None — активної (join з ScheduleVersion, без окремого запиту)"""
+        if version is None:
+            return self.filter(**{f'{self.version_field}__status': ScheduleVersion.STATUS_ACTIVE})
+        return self.filter(**{self.version_field: version})
+
+class PatternAttendanceQuerySet(VersionedQuerySet):
+    version_field = 'pattern__version'
+
 class Lesson(models.Model):
+    """
+    Одна подія розкладу: курс у слоті (дата, пара). Лекція на кілька підгруп
+    зберігається одним рядком, підгрупи — через LessonAttendance.
+    """
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
         related_name='lessons'
     )
-    subgroup = models.ForeignKey(
+    subgroups = models.ManyToManyField(
         Subgroup,
+        through='LessonAttendance',
+        related_name='lessons'
+    )
+    version = models.ForeignKey(
+        ScheduleVersion,
         on_delete=models.CASCADE,
         related_name='lessons'
     )
@@ -78,5 +144,196 @@ class Lesson(models.Model):
     start_time = models.TimeField()
     lesson_type = models.CharField(max_length=50)  # Lecture, Practice, Lab, etc.
 
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Курс не може мати дві події в одному слоті версії; індекс обмеження обслуговує
+            # і зайнятість викладача (course__teacher -> course_id, далі дата і пара)
+            models.UniqueConstraint(fields=['course', 'date', 'start_time', 'version'],
+                                    name='lesson_course_slot_uniq'),
+        ]
+        indexes = [
+            # Діапазон дат з сортуванням за (date, start_time): індекс тижнів, вивантаження викладача
+            models.Index(fields=['date', 'start_time'], name='lesson_date_slot_idx'),
+        ]
+
     def __str__(self):
         return f"{self.course.course_name} ({self.lesson_type})"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Дата, пара і версія продубльовані в LessonAttendance заради обмеження слоту підгрупи
+        self.attendance.update(date=self.date, start_time=self.start_time, version=self.version_id)
+
+class LessonAttendance(models.Model):
+    """
+    Підгрупа на події Lesson. date, start_time і version — копія полів заняття: так обмеження
+    «одне заняття підгрупи в слоті» перевіряє сама БД, а сітки підгруп читають діапазон дат
+    з цієї вузької таблиці без звернення до Lesson за фільтром.
+    """
+    lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.CASCADE,
+        related_name='attendance'
+    )
+    subgroup = models.ForeignKey(
+        Subgroup,
+        on_delete=models.CASCADE,
+        related_name='attendance'
+    )
+    version = models.ForeignKey(
+        ScheduleVersion,
+        on_delete=models.CASCADE,
+        related_name='attendance'
+    )
+    date = models.DateField()
+    start_time = models.TimeField()
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Підгрупа не може мати два заняття в одному слоті версії; індекс обмеження
+            # обслуговує і перевірки генератора, і вибірку дашборду (subgroup, date)
+            models.UniqueConstraint(fields=['subgroup', 'date', 'start_time', 'version'],
+                                    name='attendance_subgroup_slot_uniq'),
+        ]
+        indexes = [
+            # schedule_view: діапазон тижня з сортуванням за (date, start_time)
+            models.Index(fields=['date', 'start_time'], name='attendance_date_slot_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subgroup_id} @ {self.lesson_id}"
+
+class LessonPattern(models.Model):
+    """
+    Щотижнева серія занять курсу: той самий день тижня і пара від start_date до end_date,
+    крім дат у exceptions. Замінює окремий Lesson на кожен тиждень; підгрупи — через PatternAttendance.
+    Заняття серії розгортаються лише у запитаному вікні (database.recurrence).
+    """
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='patterns'
+    )
+    subgroups = models.ManyToManyField(
+        Subgroup,
+        through='PatternAttendance',
+        related_name='patterns'
+    )
+    version = models.ForeignKey(
+        ScheduleVersion,
+        on_delete=models.CASCADE,
+        related_name='patterns'
+    )
+    weekday = models.PositiveSmallIntegerField()  # 0 — понеділок, як date.weekday()
+    start_time = models.TimeField()
+    lesson_type = models.CharField(max_length=50)
+    start_date = models.DateField()  # перше заняття серії
+    end_date = models.DateField()    # останнє заняття серії
+    exceptions = models.JSONField(default=list, blank=True)  # пропущені дати серії, YYYY-MM-DD
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Як lesson_course_slot_uniq: серії курсу в одному слоті версії не можуть починатися разом
+            models.UniqueConstraint(fields=['course', 'weekday', 'start_time', 'start_date', 'version'],
+                                    name='pattern_course_slot_uniq'),
+        ]
+        indexes = [
+            # Серії, що перетинають вікно: end_date >= початок і start_date <= кінець
+            models.Index(fields=['end_date', 'start_date'], name='pattern_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course.course_name} ({self.lesson_type}), {self.start_date} – {self.end_date}"
+
+class PatternAttendance(models.Model):
+    """Підгрупа на серії LessonPattern"""
+    pattern = models.ForeignKey(
+        LessonPattern,
+        on_delete=models.CASCADE,
+        related_name='attendance'
+    )
+    subgroup = models.ForeignKey(
+        Subgroup,
+        on_delete=models.CASCADE,
+        related_name='pattern_attendance'
+    )
+
+    objects = PatternAttendanceQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Індекс обмеження обслуговує і фільтр сіток за підгрупою
+            models.UniqueConstraint(fields=['subgroup', 'pattern'], name='pattern_attendance_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.subgroup_id} @ pattern {self.pattern_id}"
+
+class ScheduleRun(models.Model):
+    """Запуск команди generate_schedule; committed_through дозволяє продовжити перерваний запуск"""
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    plan_ids = models.JSONField(default=list)  # порожній список — усі навчальні плани
+    semester = models.PositiveSmallIntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    strategy = models.CharField(max_length=20, default='greedy')
+    optimize = models.BooleanField(default=False)
+    workers = models.PositiveSmallIntegerField(null=True, blank=True)  # None — за кількістю процесорів
+    version = models.ForeignKey(  # чернетка, у яку пишеться запуск; публікується після останнього тижня
+        ScheduleVersion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='runs'
+    )
+    committed_through = models.DateField(null=True, blank=True)
+    lessons_written = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Run #{self.pk} ({self.start_date} – {self.end_date}, {self.status})"
+
+class ScheduleWeek(models.Model):
+    """Індекс непорожніх тижнів розкладу; підтримується database.weeks після кожного запису занять"""
+    week_start = models.DateField(unique=True)  # понеділок
+    lesson_count = models.PositiveIntegerField(default=0)
+    group_counts = models.JSONField(default=dict)  # {str(group_id): кількість занять} груп, що мають заняття тижня
+
+    def __str__(self):
+        return f"{self.week_start}: {self.lesson_count} lessons"
+
+class SubgroupWorkload(models.Model):
+    """Матеріалізована кількість занять підгрупи; оновлюється database.workload після генерації"""
+    subgroup = models.OneToOneField(Subgroup, on_delete=models.CASCADE, primary_key=True, related_name='workload')
+    lectures = models.PositiveIntegerField(default=0)
+    practices = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.subgroup_id}: {self.lectures} lectures, {self.practices} practices"
+
+class TeacherWorkload(models.Model):
+    """Матеріалізоване навантаження викладача в годинах для порівняння з allowed_hours"""
+    teacher = models.OneToOneField(Teacher, on_delete=models.CASCADE, primary_key=True, related_name='workload')
+    lessons = models.PositiveIntegerField(default=0)          # рядків Lesson (лекція на потік — по одному на підгрупу)
+    scheduled_hours = models.PositiveIntegerField(default=0)  # різні слоти викладача * години на пару
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.teacher_id}: {self.scheduled_hours} hours"
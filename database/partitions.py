@@ -0,0 +1,177 @@
+"""
+Секціонування подій (Lesson) і відвідувань (LessonAttendance) за датою на PostgreSQL.
+
+Обидві таблиці — PARTITION BY RANGE (date) з однаковими секціями по місяцю. Межі секцій
+вирівняні на понеділок (секція місяця починається з понеділка тижня, в якому 1-ше число),
+тож тиждень сітки завжди лежить в одній секції, і запит тижня (фільтр за date) планувальник
+звужує до неї. Первинні ключі — (id, date), відвідування посилаються на події складеним
+ключем (lesson_id, date); унікальні обмеження слотів дату вже містять. Рядки поза створеними
+секціями потрапляють у секцію _default; create_partitions переносить їх у нові секції.
+Перетворення наявних таблиць (і зворотне) виконує сама міграція 0013.
+
+Старі місяці відокремлює archive_partitions: секції переносяться в схему ARCHIVE_SCHEMA
+окремими таблицями (без зовнішніх ключів) або видаляються. Серії (LessonPattern) невеликі
+й не секціонуються. Обслуговування — команда lesson_partitions (напр. з cron).
+На інших БД таблиці лишаються звичайними.
+"""
+import datetime
+import re
+
+from django.db import connection, transaction
+
+from database.models import Lesson, LessonAttendance
+from database.weeks import rebuild_weeks
+from database.workload import refresh_workload
+
+AHEAD_MONTHS = 6           # на скільки місяців наперед створювати секції
+ARCHIVE_SCHEMA = 'archive'
+MAX_NAME_LENGTH = 63       # NAMEDATALEN - 1 у PostgreSQL
+
+# Події раніше за відвідування, що на них посилаються
+TABLES = (Lesson._meta.db_table, LessonAttendance._meta.db_table)
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def month_range(year, month):
+    """Межі секції місяця [початок, кінець): понеділки тижнів з 1-м числом цього і наступного місяця"""
+    first = datetime.date(year, month, 1)
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return (first - datetime.timedelta(days=first.weekday()),
+            following - datetime.timedelta(days=following.weekday()))
+
+
+def month_of(day):
+    """(рік, місяць) секції, до якої належить дата"""
+    following = (day.year + day.month // 12, day.month % 12 + 1)
+    return following if day >= month_range(*following)[0] else (day.year, day.month)
+
+
+def months(first, last):
+    """(рік, місяць) секцій від тієї, що містить first, до тієї, що містить last"""
+    year, month = month_of(first)
+    end = month_of(last)
+    while (year, month) <= end:
+        yield year, month
+        year, month = year + month // 12, month % 12 + 1
+
+
+def partition_name(table, year, month):
+    return f"{table}_p{year}_{month:02d}"
+
+
+def is_partitioned():
+    """Чи секціоновані таблиці (міграція 0013 на PostgreSQL)"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLES[0]])
+        return cursor.fetchone() is not None
+
+
+def partitions(cursor, table):
+    """Місячні секції таблиці: [(рік, місяць)] за зростанням (без _default)"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        [table],
+    )
+    found = (PARTITION_NAME.search(name) for name, in cursor.fetchall())
+    return sorted((int(match[1]), int(match[2])) for match in found if match)
+
+
+def _name_indexes(cursor, partition, suffix):
+    """
+    Індекси секції, створені PostgreSQL за індексами батьківської таблиці, отримують імена
+    <індекс батьківської>_<суфікс> — так їх видно в EXPLAIN (напр. lesson_course_slot_uniq_p2025_01)
+    """
+    cursor.execute("""
+        SELECT child.relname, parent.relname FROM pg_index x
+        JOIN pg_class child ON child.oid = x.indexrelid
+        JOIN pg_inherits i ON i.inhrelid = x.indexrelid
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE x.indrelid = %s::regclass
+    """, [partition])
+    for child, parent in cursor.fetchall():
+        name = f"{parent[:MAX_NAME_LENGTH - len(suffix) - 1]}_{suffix}"
+        if child != name:
+            cursor.execute(f"ALTER INDEX {quote(child)} RENAME TO {quote(name)}")
+
+
+def default_bounds():
+    """Найперша і найпізніша дата подій у секції _default (None, None — порожня)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(date), max(date) FROM {quote(TABLES[0] + '_default')}")
+        return cursor.fetchone()
+
+
+def create_partitions(first, last):
+    """
+    Секції місяців від first до last для обох таблиць, яких ще немає; рядки цих місяців
+    із _default переносяться в нові секції в тій самій транзакції. Повертає [(рік, місяць)] створених.
+    """
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = set(partitions(cursor, TABLES[0]))
+        for year, month in months(first, last):
+            if (year, month) in existing:
+                continue
+            bounds = month_range(year, month)
+            for table in TABLES:
+                name = partition_name(table, year, month)
+                cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS)")
+                # Перевірка ключа відвідувань відкладена до коміту, тож події переносяться до них
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {quote(table + '_default')} WHERE date >= %s AND date < %s "
+                    f"RETURNING *) INSERT INTO {quote(name)} SELECT * FROM moved",
+                    bounds,
+                )
+                cursor.execute(f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+                               f"FOR VALUES FROM (%s) TO (%s)", bounds)
+                _name_indexes(cursor, name, f"p{year}_{month:02d}")
+            created.append((year, month))
+    return created
+
+
+def ensure_partitions(ahead=AHEAD_MONTHS, today=None):
+    """
+    create_partitions від найранішого з сьогодні і рядків у _default до місяця через ahead
+    місяців від сьогодні (або найпізнішого рядка в _default)
+    """
+    today = today or datetime.date.today()
+    year, month = month_of(today)
+    month += ahead
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    first, last = default_bounds()
+    return create_partitions(min(first or today, today), max(last or today, month_range(year, month)[0]))
+
+
+def archive_partitions(before, drop=False):
+    """
+    Відокремлює секції місяців, що повністю закінчилися до before: переносить їх у схему
+    ARCHIVE_SCHEMA окремими таблицями без зовнішніх ключів або (drop) видаляє. Індекс тижнів
+    і зведення навантаження перебудовуються. Повертає [(рік, місяць)] відокремлених.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        stale = [(year, month) for year, month in partitions(cursor, TABLES[0])
+                 if month_range(year, month)[1] <= before]
+        if stale and not drop:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(ARCHIVE_SCHEMA)}")
+        for year, month in stale:
+            for table in reversed(TABLES):  # відвідування — раніше за події, на які посилаються
+                name = partition_name(table, year, month)
+                cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+                if drop:
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+                    continue
+                cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                               [name])
+                for constraint, in cursor.fetchall():
+                    cursor.execute(f"ALTER TABLE {quote(name)} DROP CONSTRAINT {quote(constraint)}")
+                cursor.execute(f"ALTER TABLE {quote(name)} SET SCHEMA {quote(ARCHIVE_SCHEMA)}")
+        if stale:
+            rebuild_weeks()
+            refresh_workload()
+    return stale
@@ -0,0 +1,25 @@
+"""
+Спільні для генератора і модулів застосунку визначення розкладу: запланований запис заняття
+і сітка пар. Скрипт create_schedule імпортує їх звідси (ScheduleGenerator бере ліміти як атрибути класу),
+тож модулям database не треба імпортувати сам скрипт.
+"""
+from collections import namedtuple
+from datetime import time
+
+# Легкий запис запланованого заняття (ще не збереженого в БД)
+PlannedLesson = namedtuple('PlannedLesson', 'course_id subgroup_id date start_time lesson_type')
+
+LECTURE_TIMESLOTS = [
+    (time(9, 0), time(10, 20)),
+    (time(10, 30), time(11, 50)),
+    (time(12, 10), time(13, 30)),
+    (time(13, 40), time(15, 0)),
+    (time(15, 10), time(16, 30)),
+    (time(16, 40), time(18, 0)),
+    (time(18, 10), time(19, 30)),
+]
+
+WORK_DAYS = [0, 1, 2, 3, 4]  # Пн-Пт
+
+MAX_LESSONS_FOR_SUBGROUP = 4
+HOURS_PER_LESSON = 2  # одна пара — дві академічні години
@@ -0,0 +1,295 @@
+"""
+Щотижневі серії занять (LessonPattern) і їх розгортання у вікно дат.
+
+Більшість занять повторюється щотижня в тому самому слоті, тож генератор зберігає таку
+серію одним LessonPattern (день тижня, пара, start_date – end_date, винятки) з підгрупами
+в PatternAttendance, а в Lesson лишає тільки поодинокі заняття. Читачі беруть конкретні
+заняття запитом за датами і розгортають лише серії, що перетинають запитане вікно, —
+у кортежі тієї самої форми, що й values_list по LessonAttendance (назви полів ті самі).
+
+Розгорнуте заняття не має власного Lesson: на місці lesson_id стоїть від'ємний id серії
+(-pattern_id), тож id події лишається цілим і не збігається з жодним id Lesson.
+"""
+import datetime
+import heapq
+from collections import defaultdict, namedtuple
+from itertools import chain, islice
+
+from django.db.models import Count, Max, Min, Q
+
+from database.models import Lesson, LessonAttendance, LessonPattern, PatternAttendance
+
+CHUNK_SIZE = 5000
+MIN_OCCURRENCES = 3  # коротші повтори лишаються окремими Lesson
+WINDOW_DAYS = 28     # вікно потокових читачів (вивантаження)
+WEEK = datetime.timedelta(weeks=1)
+
+SERIES_FIELDS = ('pattern__weekday', 'pattern__start_date', 'pattern__end_date', 'pattern__exceptions')
+
+# Прибрані заняття серій: кількість занять підгруп, їх дати і курси
+Removal = namedtuple('Removal', 'count dates course_ids')
+
+
+def occurrence_dates(weekday, start_date, end_date, exceptions=(), window_start=None, window_end=None):
+    """Дати серії за зростанням, лише в межах вікна (None — без межі)"""
+    first = start_date if window_start is None else max(start_date, window_start)
+    last = end_date if window_end is None else min(end_date, window_end)
+    first += datetime.timedelta(days=(weekday - first.weekday()) % 7)
+    skipped = set(exceptions)
+    while first <= last:
+        if first.isoformat() not in skipped:
+            yield first
+        first += WEEK
+
+
+def pattern_field(field):
+    """Поле LessonAttendance (values_list, filter) -> відповідне поле PatternAttendance"""
+    if field == 'lesson_id':
+        return 'pattern_id'
+    if field == 'date':
+        return 'pattern__start_date'  # місце під дату заняття, підставляється при розгортанні
+    if field == 'start_time':
+        return 'pattern__start_time'
+    if field.startswith('lesson__'):
+        return 'pattern__' + field[len('lesson__'):]
+    return field
+
+
+def overlapping(patterns, start_date=None, end_date=None, prefix='pattern__'):
+    """Серії (prefix='') або їх відвідування, що мають дати у вікні"""
+    if start_date is not None:
+        patterns = patterns.filter(**{f'{prefix}end_date__gte': start_date})
+    if end_date is not None:
+        patterns = patterns.filter(**{f'{prefix}start_date__lte': end_date})
+    return patterns
+
+
+def expand_rows(patterns, fields, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
+    """
+    Відвідування серій (PatternAttendance) кортежами fields — по рядку на кожне заняття
+    у вікні, у порядку серій; lesson_id — -pattern_id.
+    """
+    date_at = fields.index('date') if 'date' in fields else None
+    id_at = fields.index('lesson_id') if 'lesson_id' in fields else None
+    rows = (
+        overlapping(patterns, start_date, end_date).order_by()
+        .values_list(*(pattern_field(field) for field in fields), *SERIES_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        values = list(row[:len(fields)])
+        weekday, first, last, exceptions = row[len(fields):]
+        if id_at is not None:
+            values[id_at] = -values[id_at]
+        for day in occurrence_dates(weekday, first, last, exceptions, start_date, end_date):
+            if date_at is not None:
+                values[date_at] = day
+            yield tuple(values)
+
+
+def occurrence_rows(lessons, patterns, fields, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
+    """Усі заняття підгруп вікна з обох джерел без упорядкування (агрегати, перевірки)"""
+    if start_date is not None:
+        lessons = lessons.filter(date__gte=start_date)
+    if end_date is not None:
+        lessons = lessons.filter(date__lte=end_date)
+    return chain(
+        lessons.order_by().values_list(*fields).iterator(chunk_size=chunk_size),
+        expand_rows(patterns, fields, start_date, end_date, chunk_size),
+    )
+
+
+def _after(order, values):
+    """Q keyset-пагінації: рядки строго після values за порядком order"""
+    condition, equal = Q(), {}
+    for field, value in zip(order, values):
+        condition |= Q(**equal, **{f'{field}__gt': value})
+        equal[field] = value
+    return condition
+
+
+def window_rows(lessons, patterns, fields, start_date, end_date, order=('date', 'start_time'), after=None,
+                limit=None):
+    """
+    Заняття підгруп вікна, злиті за order (поля order мають бути серед fields):
+    lessons (LessonAttendance) — одним запитом, patterns (PatternAttendance) — розгорнуті у вікно.
+    after — значення полів order, після яких почати (keyset), limit — не більше рядків.
+    """
+    positions = [fields.index(field) for field in order]
+
+    def key(row):
+        return tuple(row[position] for position in positions)
+
+    lessons = lessons.filter(date__range=(start_date, end_date)).order_by(*order)
+    expanded = expand_rows(patterns, fields, start_date, end_date)
+    if after is not None:
+        lessons = lessons.filter(_after(order, after))
+        expanded = (row for row in expanded if key(row) > tuple(after))
+    if limit is not None:
+        lessons = lessons[:limit]
+    rows = heapq.merge(
+        lessons.values_list(*fields).iterator(chunk_size=CHUNK_SIZE), sorted(expanded, key=key), key=key,
+    )
+    return rows if limit is None else islice(rows, limit)
+
+
+def schedule_bounds(version=None):
+    """
+    (перша, остання) дата розкладу версії (None — активної) серед занять і серій;
+    (None, None) — розклад порожній
+    """
+    lessons = Lesson.objects.in_version(version).aggregate(first=Min('date'), last=Max('date'))
+    patterns = LessonPattern.objects.in_version(version).aggregate(first=Min('start_date'), last=Max('end_date'))
+    firsts = [day for day in (lessons['first'], patterns['first']) if day]
+    lasts = [day for day in (lessons['last'], patterns['last']) if day]
+    return (min(firsts), max(lasts)) if firsts else (None, None)
+
+
+def windows(start_date, end_date, days=WINDOW_DAYS):
+    """Послідовні вікна (початок, кінець) по days днів, що покривають діапазон"""
+    while start_date <= end_date:
+        yield start_date, min(start_date + datetime.timedelta(days=days - 1), end_date)
+        start_date += datetime.timedelta(days=days)
+
+
+def split_series(planned, min_occurrences=MIN_OCCURRENCES):
+    """
+    PlannedLesson -> ([(LessonPattern, subgroup_ids)], решта PlannedLesson).
+    Події (курс, дата, пара) з тим самим типом, днем тижня, парою і набором підгруп
+    складають серію; серія щонайменше з min_occurrences занять, у якій пропущених тижнів
+    не більше, ніж занять, стає шаблоном, пропуски — його винятками.
+    """
+    events = {}
+    for p in planned:
+        events.setdefault((p.course_id, p.date, p.start_time), (p.lesson_type, []))[1].append(p.subgroup_id)
+
+    series = defaultdict(list)
+    for (course_id, day, start_time), (lesson_type, subgroup_ids) in events.items():
+        series[(course_id, lesson_type, day.weekday(), start_time, tuple(sorted(subgroup_ids)))].append(day)
+
+    patterns, patterned = [], set()
+    for (course_id, lesson_type, weekday, start_time, subgroup_ids), dates in series.items():
+        dates.sort()
+        weeks = (dates[-1] - dates[0]).days // 7 + 1
+        if len(dates) < min_occurrences or weeks - len(dates) > len(dates):
+            continue
+        present = set(dates)
+        pattern = LessonPattern(
+            course_id=course_id, weekday=weekday, start_time=start_time, lesson_type=lesson_type,
+            start_date=dates[0], end_date=dates[-1],
+            exceptions=[day.isoformat() for day in occurrence_dates(weekday, dates[0], dates[-1])
+                        if day not in present],
+        )
+        patterns.append((pattern, subgroup_ids))
+        patterned.update((course_id, day, start_time) for day in dates)
+
+    rest = [p for p in planned if (p.course_id, p.date, p.start_time) not in patterned]
+    return patterns, rest
+
+
+def series_slots(patterns):
+    """Слоти (course_id, дата, пара) усіх занять серій [(LessonPattern, subgroup_ids)]"""
+    return {
+        (pattern.course_id, day, pattern.start_time)
+        for pattern, _ in patterns
+        for day in occurrence_dates(pattern.weekday, pattern.start_date, pattern.end_date, pattern.exceptions)
+    }
+
+
+def free_series(patterns, version):
+    """
+    Серії, жодне заняття яких не потрапляє в слот підгрупи, уже зайнятий у версії подією
+    чи іншою серією (або попередньою серією з patterns). Для подій це гарантує
+    attendance_subgroup_slot_uniq, для серій обмеження в БД немає — тож перевірка тут.
+    """
+    if not patterns:
+        return []
+    first = min(pattern.start_date for pattern, _ in patterns)
+    last = max(pattern.end_date for pattern, _ in patterns)
+    taken = set(occurrence_rows(
+        LessonAttendance.objects.in_version(version), PatternAttendance.objects.in_version(version),
+        ('subgroup_id', 'date', 'start_time'), first, last,
+    ))
+    free = []
+    for pattern, subgroup_ids in patterns:
+        slots = [
+            (subgroup_id, day, pattern.start_time)
+            for day in occurrence_dates(pattern.weekday, pattern.start_date, pattern.end_date, pattern.exceptions)
+            for subgroup_id in subgroup_ids
+        ]
+        if taken.isdisjoint(slots):
+            taken.update(slots)
+            free.append((pattern, subgroup_ids))
+    return free
+
+
+def save_patterns(patterns, version, batch_size=CHUNK_SIZE, check=True):
+    """
+    Пакетний запис [(LessonPattern, subgroup_ids)] від split_series разом з відвідуваннями у версію version.
+    З check пишуться лише free_series; повертає записані серії — заняття решти викликач пише подіями.
+    """
+    if check:
+        patterns = free_series(patterns, version)
+    if not patterns:
+        return patterns
+    for pattern, _ in patterns:
+        pattern.version = version
+    created = LessonPattern.objects.bulk_create([pattern for pattern, _ in patterns], batch_size=batch_size)
+    if created[0].pk is None:  # БД без RETURNING для пакетної вставки
+        def natural(pattern):
+            return pattern.course_id, pattern.weekday, pattern.start_time, pattern.start_date
+
+        ids = {
+            natural(pattern): pattern.pk for pattern in LessonPattern.objects.filter(
+                version=version, course_id__in={pattern.course_id for pattern in created},
+                start_date__in={pattern.start_date for pattern in created},
+            )
+        }
+        for pattern in created:
+            pattern.pk = ids[natural(pattern)]
+    PatternAttendance.objects.bulk_create(
+        (
+            PatternAttendance(pattern_id=pattern.pk, subgroup_id=subgroup_id)
+            for pattern, (_, subgroup_ids) in zip(created, patterns)
+            for subgroup_id in subgroup_ids
+        ),
+        batch_size=batch_size,
+    )
+    return patterns
+
+
+def remove_occurrences(patterns, start_date, end_date, dates=None):
+    """
+    Прибирає заняття серій (LessonPattern) у вікні — або лише в дати dates з вікна.
+    Серія звужується до решти занять або отримує винятки; серія без занять видаляється.
+    Повертає Removal; індекс тижнів і кеш оновлює викликач.
+    """
+    dates = None if dates is None else set(dates)
+    count, removed_dates, course_ids = 0, set(), set()
+    changed, emptied = [], []
+    for pattern in overlapping(patterns, start_date, end_date, prefix='').annotate(subgroup_count=Count('attendance')):
+        hit = [
+            day for day in occurrence_dates(pattern.weekday, pattern.start_date, pattern.end_date,
+                                            pattern.exceptions, start_date, end_date)
+            if dates is None or day in dates
+        ]
+        if not hit:
+            continue
+        count += len(hit) * pattern.subgroup_count
+        removed_dates.update(hit)
+        course_ids.add(pattern.course_id)
+
+        exceptions = set(pattern.exceptions) | {day.isoformat() for day in hit}
+        remaining = list(occurrence_dates(pattern.weekday, pattern.start_date, pattern.end_date, exceptions))
+        if not remaining:
+            emptied.append(pattern.pk)
+            continue
+        pattern.start_date, pattern.end_date = remaining[0], remaining[-1]
+        pattern.exceptions = sorted(
+            day for day in exceptions if remaining[0].isoformat() < day < remaining[-1].isoformat()
+        )
+        changed.append(pattern)
+
+    LessonPattern.objects.bulk_update(changed, ['start_date', 'end_date', 'exceptions'], batch_size=CHUNK_SIZE)
+    LessonPattern.objects.filter(pk__in=emptied).delete()
+    return Removal(count, removed_dates, course_ids)
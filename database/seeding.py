@@ -0,0 +1,235 @@
+"""
+Синтетичні набори даних заданого розміру для бенчмарків і навантажувальних тестів.
+
+Довідкові таблиці заповнюються через bulk_create пакетами, заняття (події Lesson
+і відвідування LessonAttendance активної версії розкладу) — напряму з явними id подій:
+на PostgreSQL через COPY, на інших БД через bulk_create.
+"""
+import io
+import random
+from datetime import date, timedelta
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from database.cache import invalidate_all
+from database.models import (
+    StudyPlan, Teacher, Course, Group, Subgroup, Lesson, LessonAttendance, LessonPattern, PatternAttendance,
+    ScheduleVersion, ScheduleWeek, SubgroupWorkload, TeacherWorkload, active_version,
+)
+from database.planning import LECTURE_TIMESLOTS, WORK_DAYS
+from database.weeks import rebuild_weeks
+from database.workload import refresh_workload
+
+POSITIONS = ["Assistant", "Associate Professor", "Professor", "Senior Lecturer"]
+COURSE_NAMES = [
+    "Математика", "Програмування", "Фізика", "Хімія", "Лінійна алгебра",
+    "Дискретна математика", "Бази даних", "Операційні системи",
+    "Комп'ютерні мережі", "Теорія ймовірностей", "Чисельні методи",
+    "Англійська мова", "Економіка", "Педагогіка", "Філософія"
+]
+
+BATCH_SIZE = 1000
+COPY_CHUNK_SIZE = 100000
+LESSON_TYPES = ["Lecture", "Practice"]
+
+SCHEDULE_MODELS = (
+    ScheduleWeek, SubgroupWorkload, TeacherWorkload, LessonAttendance, Lesson, PatternAttendance, LessonPattern,
+    ScheduleVersion, Subgroup, Group, Course, Teacher, StudyPlan,
+)
+LESSON_COLUMNS = ('id', 'course_id', 'version_id', 'date', 'start_time', 'lesson_type')
+ATTENDANCE_COLUMNS = ('lesson_id', 'subgroup_id', 'version_id', 'date', 'start_time')
+
+
+def reset_dataset(truncate=True):
+    """
+    Видаляє всі дані розкладу. На PostgreSQL — одним TRUNCATE без каскадного
+    збору об'єктів в ORM, на інших БД — видаленням від залежних таблиць до головних.
+    """
+    if truncate and connection.vendor == 'postgresql':
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in SCHEDULE_MODELS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+    else:
+        for model in SCHEDULE_MODELS:
+            model.objects.all().delete()
+    invalidate_all()
+
+
+def build_dataset(plans=1, groups_per_plan=5, subgroups_per_group=2, courses_per_plan=6,
+                  courses_per_teacher=2, semester=2, lecture_hours=40, practice_hours=34,
+                  number_of_semesters=2, seed=0, batch_size=BATCH_SIZE):
+    """
+    Створює plans навчальних планів з групами, підгрупами, курсами і викладачами.
+    Курси роздаються викладачам по черзі (по courses_per_teacher на кожного),
+    тож один викладач може вести курси в сусідніх планах — як у реальному факультеті.
+    """
+    rng = random.Random(seed)
+
+    study_plans = StudyPlan.objects.bulk_create([
+        StudyPlan(
+            name=f"Навчальний план {2021 + i}",
+            year_of_effect=2021 + i,
+            number_of_semesters=number_of_semesters,
+            approval_date=date(2021 + i, 1, 1),
+            plan_author=f"Автор {i}",
+        ) for i in range(plans)
+    ], batch_size=batch_size)
+
+    teacher_count = -(-plans * courses_per_plan // courses_per_teacher)
+    teachers = Teacher.objects.bulk_create([
+        Teacher(
+            full_name=f"Викладач {i + 1}",
+            position=rng.choice(POSITIONS),
+            allowed_hours=1000,
+            rate=round(rng.uniform(0.5, 1.0), 2),
+        ) for i in range(teacher_count)
+    ], batch_size=batch_size)
+
+    courses = Course.objects.bulk_create([
+        Course(
+            study_plan=study_plan,
+            course_name=rng.choice(COURSE_NAMES),
+            lecture_hours=lecture_hours,
+            practice_hours=practice_hours,
+            semester=semester,
+            credits=rng.randint(3, 6),
+            teacher=teachers[(p * courses_per_plan + i) // courses_per_teacher],
+        )
+        for p, study_plan in enumerate(study_plans)
+        for i in range(courses_per_plan)
+    ], batch_size=batch_size)
+
+    groups = Group.objects.bulk_create([
+        Group(
+            name=f"{study_plan.year_of_effect}-Група-{i}",
+            major="Синтетична",
+            year=1,
+            start_year=study_plan.year_of_effect,
+            study_plan=study_plan,
+        )
+        for study_plan in study_plans
+        for i in range(1, groups_per_plan + 1)
+    ], batch_size=batch_size)
+
+    subgroups = Subgroup.objects.bulk_create([
+        Subgroup(group=group, number=number)
+        for group in groups
+        for number in range(1, subgroups_per_group + 1)
+    ], batch_size=batch_size)
+
+    return {
+        'plans': len(study_plans),
+        'teachers': len(teachers),
+        'courses': len(courses),
+        'groups': len(groups),
+        'subgroups': len(subgroups),
+    }
+
+
+def build_lessons(lessons_per_subgroup, start_date, end_date, seed=0, use_copy=None, batch_size=BATCH_SIZE):
+    """
+    Генерує заняття напряму, без ScheduleGenerator: для кожної підгрупи —
+    lessons_per_subgroup різних слотів (робочий день, пара) з курсами її плану.
+    Збіг (курс, дата, пара) у кількох підгруп дає одну спільну подію.
+    Діапазон має бути без наявних занять цих курсів і підгруп: рядки пишуться без ignore_conflicts
+    (COPY їх не підтримує), тож збіг зі слотом дає IntegrityError і відкат усього набору.
+    use_copy=None означає COPY, якщо БД — PostgreSQL. Повертає кількість записаних занять підгруп.
+    """
+    rng = random.Random(seed)
+    days = [
+        start_date + timedelta(days=i)
+        for i in range((end_date - start_date).days + 1)
+        if (start_date + timedelta(days=i)).weekday() in WORK_DAYS
+    ]
+    grid = [(day, start_time) for day in days for start_time, _ in LECTURE_TIMESLOTS]
+    per_subgroup = min(lessons_per_subgroup, len(grid))
+
+    courses_by_plan = {}
+    for course_id, plan_id in Course.objects.values_list('id', 'study_plan_id'):
+        courses_by_plan.setdefault(plan_id, []).append(course_id)
+
+    def rows():
+        for subgroup_id, plan_id in Subgroup.objects.order_by('id').values_list('id', 'group__study_plan_id'):
+            courses = courses_by_plan.get(plan_id)
+            if not courses:
+                continue
+            for index in rng.sample(range(len(grid)), per_subgroup):
+                day, start_time = grid[index]
+                yield rng.choice(courses), subgroup_id, day, start_time, rng.choice(LESSON_TYPES)
+
+    first_id = (Lesson.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    version_id = active_version().pk
+
+    def split(rows):
+        """(подія або None, відвідування): однакові (курс, дата, пара) — одна подія з явним id"""
+        events = {}
+        for course_id, subgroup_id, day, start_time, lesson_type in rows:
+            lesson_id = events.get((course_id, day, start_time))
+            lesson = None
+            if lesson_id is None:
+                lesson_id = events[(course_id, day, start_time)] = first_id + len(events)
+                lesson = (lesson_id, course_id, version_id, day, start_time, lesson_type)
+            yield lesson, (lesson_id, subgroup_id, version_id, day, start_time)
+
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    chunk_size = COPY_CHUNK_SIZE if use_copy else batch_size
+    lessons, attendance = [], []
+    created = 0
+
+    def flush():
+        # Події пишуться раніше за відвідування, що на них посилаються
+        _write_rows(Lesson, LESSON_COLUMNS, lessons, use_copy, batch_size)
+        _write_rows(LessonAttendance, ATTENDANCE_COLUMNS, attendance, use_copy, batch_size)
+        lessons.clear()
+        attendance.clear()
+
+    with transaction.atomic():
+        for lesson, entry in split(rows()):
+            if lesson is not None:
+                lessons.append(lesson)
+            attendance.append(entry)
+            created += 1
+            if len(attendance) >= chunk_size:
+                flush()
+        flush()
+        # Явні id не рухають послідовність PostgreSQL
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Lesson]):
+                cursor.execute(sql)
+        rebuild_weeks()
+        refresh_workload()
+    return created
+
+
+def _write_rows(model, columns, rows, use_copy, batch_size):
+    if not rows:
+        return
+    if use_copy:
+        _copy_rows(model, columns, rows)
+    else:
+        model.objects.bulk_create([model(**dict(zip(columns, row))) for row in rows], batch_size=batch_size)
+
+
+def _copy_rows(model, columns, rows):
+    """COPY ... FROM STDIN однією порцією рядків (psycopg2 або psycopg 3)"""
+    sql = "COPY {} ({}) FROM STDIN".format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in columns),
+    )
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(map(str, row)) + '\n')
+    with connection.cursor() as cursor:
+        _copy_chunk(cursor.cursor, sql, buffer)
+
+
+def _copy_chunk(raw_cursor, sql, buffer):
+    buffer.seek(0)
+    if hasattr(raw_cursor, 'copy_expert'):
+        raw_cursor.copy_expert(sql, buffer)
+    else:
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
@@ -1,16 +1,31 @@
 from django.test import TestCase
 
 # Create your tests here.
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.messages import get_messages
 from datetime import date, time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from database.models import (
     StudyPlan, Teacher, Course,
-    Group, Subgroup, Lesson
+    Group, Subgroup, Lesson, LessonAttendance, LessonPattern, PatternAttendance
 )
+from database.lessons import create_lesson
+
+
+def all_lessons():
+    """
+    Заняття підгруп активної версії з подій і розгорнутих серій:
+    (subgroup_id, teacher_id, course_id, тип, дата, пара)
+    """
+    from database.recurrence import occurrence_rows
+    return list(occurrence_rows(
+        LessonAttendance.objects.in_version(), PatternAttendance.objects.in_version(),
+        ('subgroup_id', 'lesson__course__teacher_id', 'lesson__course_id', 'lesson__lesson_type', 'date', 'start_time'),
+    ))
 
 class HomeViewTests(TestCase):
     def setUp(self):
@@ -114,9 +129,9 @@ class DashboardViewTests(TestCase):
         self.subgroup = Subgroup.objects.create(
             group=self.group, number=1
         )
-        self.lesson = Lesson.objects.create(
+        self.lesson = create_lesson(
             course=self.course,
-            subgroup=self.subgroup,
+            subgroups=[self.subgroup],
             date=date(2022,1,5),
             start_time=time(9,0),
             lesson_type='Lab'
@@ -157,10 +172,51 @@ class DashboardViewTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         # Should gracefully handle invalid date => no lessons or None
         lessons = resp.context.get('lessons')
-        self.assertTrue(lessons is None or not lessons.exists())
+        self.assertTrue(lessons is None or not lessons)
+
+    def test_dashboard_range_keyset_pagination(self):
+        from unittest import mock
+        for day in (3, 4, 5):
+            create_lesson(course=self.course, subgroups=[self.subgroup], date=date(2022, 1, day),
+                          start_time=time(11, 0), lesson_type='Practice')
+        self.client.login(username='u', password='pass')
+        params = {'subgroup': self.subgroup.id, 'start': '2022-01-01', 'end': '2022-01-31'}
+
+        seen = []
+        with mock.patch('database.views.DASHBOARD_PAGE_SIZE', 2):
+            resp = self.client.get(reverse('dashboard'), params)
+            seen += [(l.date, l.start_time) for l in resp.context['lessons']]
+            while resp.context['next_query']:
+                resp = self.client.get(reverse('dashboard') + '?' + resp.context['next_query'])
+                seen += [(l.date, l.start_time) for l in resp.context['lessons']]
+        self.assertEqual(seen, [
+            (date(2022, 1, 3), time(11, 0)), (date(2022, 1, 4), time(11, 0)),
+            (date(2022, 1, 5), time(9, 0)), (date(2022, 1, 5), time(11, 0)),
+        ])
+
+    def test_dashboard_queries_do_not_grow_with_subgroups(self):
+        self.client.login(username='u', password='pass')
+        params = {'subgroup': self.subgroup.id, 'date': '2022-01-05'}
+        self.client.get(reverse('dashboard'), params)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('dashboard'), params)
+        Subgroup.objects.bulk_create([Subgroup(group=self.group, number=n) for n in range(2, 30)])
+        with CaptureQueriesContext(connection) as after:
+            resp = self.client.get(reverse('dashboard'), params)
+        self.assertEqual(len(after), len(before))
+        self.assertContains(resp, 'G1 / 29')
+
+    def test_subgroup_search(self):
+        other = Group.objects.create(name='Other', major='M', year=1, start_year=2022, study_plan=self.plan)
+        Subgroup.objects.create(group=other, number=1)
+        self.client.login(username='u', password='pass')
+        resp = self.client.get(reverse('subgroup_search'), {'q': 'oth'})
+        self.assertEqual([item['label'] for item in resp.json()['results']], ['Other / 1'])
 
 class ScheduleViewTests(TestCase):
     def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
         self.client = Client()
         # Create minimal schedule data for one week
         self.plan = StudyPlan.objects.create(
@@ -186,9 +242,9 @@ class ScheduleViewTests(TestCase):
             group=self.group, number=1
         )
         # Monday of a known week
-        self.lesson = Lesson.objects.create(
+        self.lesson = create_lesson(
             course=self.course,
-            subgroup=self.subgroup,
+            subgroups=[self.subgroup],
             date=date(2022,1,3),
             start_time=time(9,0),
             lesson_type='Lecture'
@@ -220,3 +276,1051 @@ class ScheduleViewTests(TestCase):
         self.assertEqual(ctx['page_obj'].paginator.num_pages, 1)
         # Template used
         self.assertTemplateUsed(resp, 'database/schedule.html')
+
+    def test_schedule_week_is_two_queries(self):
+        other = Subgroup.objects.create(group=self.group, number=2)
+        for day in range(3, 8):
+            create_lesson(course=self.course, subgroups=[other], date=date(2022, 1, day),
+                          start_time=time(11, 0), lesson_type='Practice')
+        create_lesson(course=self.course, subgroups=[self.subgroup], date=date(2022, 3, 1),
+                      start_time=time(9, 0), lesson_type='Lecture')
+
+        # Індекс тижнів + події тижня + серії тижня, незалежно від кількості занять і підгруп
+        with self.assertNumQueries(3):
+            resp = self.client.get(reverse('schedule'))
+        ctx = resp.context
+        self.assertEqual([sg.number for sg in ctx['groups'][0]['subgroups']], [1, 2])
+        self.assertEqual(len(ctx['rows']), 7 * 2)
+        self.assertEqual(ctx['page_obj'].paginator.num_pages, 2)
+        tuesday = next(r for r in ctx['rows'] if r['day'] == date(2022, 1, 4) and r['time'] == time(11, 0))
+        self.assertEqual(tuesday['cells'][0], None)
+        self.assertEqual(tuesday['cells'][1].course.teacher.full_name, 'T')
+        self.assertContains(resp, 'class="course-%d"' % self.course.id)
+
+    def test_week_index_pagination_and_jump(self):
+        from database.planning import PlannedLesson
+        from database.lessons import save_lessons
+        from database.models import ScheduleWeek
+        from database.weeks import rebuild_weeks
+        other_group = Group.objects.create(name='G2', major='M', year=1, start_year=2022, study_plan=self.plan)
+        other = Subgroup.objects.create(group=other_group, number=1)
+        save_lessons([
+            PlannedLesson(self.course.id, other.id, date(2022, 3, 1), time(9, 0), 'Practice'),
+            PlannedLesson(self.course.id, self.subgroup.id, date(2022, 3, 2), time(9, 0), 'Practice'),
+        ])
+        rebuild_weeks()
+        self.assertEqual(
+            list(ScheduleWeek.objects.order_by('week_start').values_list('week_start', 'lesson_count', 'group_counts')),
+            [(date(2022, 1, 3), 1, {str(self.group.id): 1}),
+             (date(2022, 2, 28), 2, {str(self.group.id): 1, str(other_group.id): 1})],
+        )
+
+        # Перехід до наступного непорожнього тижня після 10.01
+        resp = self.client.get(reverse('schedule'), {'from': '2022-01-10'})
+        self.assertEqual(resp.context['start_week'], date(2022, 2, 28))
+        self.assertEqual(resp.context['week_lessons'], 2)
+        self.assertEqual(resp.context['page_obj'].number, 2)
+
+        resp = self.client.get(reverse('schedule'), {'group': other_group.id})
+        self.assertEqual(resp.context['page_obj'].paginator.num_pages, 1)
+        self.assertEqual(resp.context['start_week'], date(2022, 2, 28))
+        self.assertEqual(resp.context['week_lessons'], 1)  # лише заняття цієї групи
+
+    def test_week_index_follows_generator_writes(self):
+        from database.models import ScheduleWeek
+        from database.weeks import refresh_weeks
+        Lesson.objects.filter(pk=self.lesson.pk).delete()
+        refresh_weeks([self.lesson.date])
+        self.assertFalse(ScheduleWeek.objects.exists())
+
+    def test_create_lesson_refreshes_week_once(self):
+        from database.models import ScheduleWeek, active_version
+        revision = active_version().revision
+        create_lesson(course=self.course, subgroups=[self.subgroup], date=date(2022, 1, 4),
+                      start_time=time(11, 0), lesson_type='Practice')
+        self.assertEqual(active_version().revision, revision + 1)
+        self.assertEqual(ScheduleWeek.objects.get(week_start=date(2022, 1, 3)).lesson_count, 2)
+
+    def test_repeat_view_served_from_cache_until_invalidated(self):
+        from database.cache import invalidate_dates
+        self.client.get(reverse('schedule'))
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse('schedule'))
+        self.assertEqual(resp.context['rows'][0]['cells'][0].id, self.lesson.id)
+
+        # Масовий запис без сигналів: кеш скидається лише явним викликом після коміту
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.filter(pk=self.lesson.pk).update(lesson_type='Practice')
+            invalidate_dates([self.lesson.date])
+        resp = self.client.get(reverse('schedule'))
+        self.assertEqual(resp.context['rows'][0]['cells'][0].lesson_type, 'Practice')
+
+    def test_schedule_filtered_by_subgroup(self):
+        other = Subgroup.objects.create(group=self.group, number=2)
+        create_lesson(course=self.course, subgroups=[other], date=date(2022, 1, 4),
+                      start_time=time(11, 0), lesson_type='Practice')
+        create_lesson(course=self.course, subgroups=[other], date=date(2022, 2, 1),
+                      start_time=time(11, 0), lesson_type='Practice')
+
+        resp = self.client.get(reverse('schedule'), {'subgroup': self.subgroup.id})
+        ctx = resp.context
+        self.assertEqual([sg.id for sg in ctx['groups'][0]['subgroups']], [self.subgroup.id])
+        self.assertEqual(len(ctx['rows']), 7)
+        self.assertEqual(ctx['page_obj'].paginator.num_pages, 1)
+
+        resp = self.client.get(reverse('schedule'), {'subgroup': other.id})
+        self.assertEqual(resp.context['page_obj'].paginator.num_pages, 2)  # лише непорожні тижні
+        self.assertContains(resp, 'href="?subgroup=%d&page=2"' % other.id)
+
+    def test_teacher_schedule_groups_subgroups_per_slot(self):
+        other = Subgroup.objects.create(group=self.group, number=2)
+        LessonAttendance.objects.create(lesson=self.lesson, subgroup=other, version=self.lesson.version,
+                                        date=date(2022, 1, 3), start_time=time(9, 0))
+
+        # Викладач, тижні подій і серій, події і серії тижня
+        with self.assertNumQueries(5):
+            resp = self.client.get(reverse('teacher_schedule', args=[self.teacher.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTemplateUsed(resp, 'database/teacher_schedule.html')
+        monday = resp.context['rows'][0]
+        self.assertEqual(monday['day'], date(2022, 1, 3))
+        self.assertEqual(len(monday['lessons']), 1)
+        self.assertEqual(monday['lessons'][0].subgroups, ['G1/1', 'G1/2'])
+        self.assertEqual(self.client.get(reverse('teacher_schedule', args=[999])).status_code, 404)
+
+    def test_ical_feeds(self):
+        other = Subgroup.objects.create(group=self.group, number=2)
+        LessonAttendance.objects.create(lesson=self.lesson, subgroup=other, version=self.lesson.version,
+                                        date=date(2022, 1, 3), start_time=time(9, 0))
+
+        with self.assertNumQueries(3):  # підгрупа, події, серії
+            resp = self.client.get(reverse('subgroup_ical', args=[self.subgroup.id]))
+            body = b''.join(resp.streaming_content).decode()
+        self.assertEqual(resp['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('DTSTART:20220103T090000Z\r\n', body)
+        self.assertIn('DTEND:20220103T102000Z\r\n', body)  # кінець з LECTURE_TIMESLOTS
+        self.assertIn('SUMMARY:C1 (Lecture)\r\n', body)
+
+        # Лекція на дві підгрупи в стрічці викладача — одна подія
+        resp = self.client.get(reverse('teacher_ical', args=[self.teacher.id]))
+        body = b''.join(resp.streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('DESCRIPTION:G1/1\\, G1/2\r\n', body)
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse('teacher_ical', args=[self.teacher.id]), HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.client.get(reverse('subgroup_ical', args=[999])).status_code, 404)
+
+    def test_api_week_payload_and_filters(self):
+        url = reverse('schedule_api')
+        resp = self.client.get(url, {'week': '2022-01-05'})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['week'], '2022-01-03')
+        self.assertEqual(data['timeslots'], ['09:00'])
+        self.assertEqual(data['courses'], {str(self.course.id): {'name': 'C1', 'teacher': self.teacher.id}})
+        self.assertEqual(data['lessons'], [[self.lesson.id, 0, 0, self.subgroup.id, self.course.id, 0]])
+
+        other = Teacher.objects.create(full_name='T2', position='Prof', allowed_hours=10, rate=1.0)
+        resp = self.client.get(url, {'week': '2022-01-03', 'teacher': other.id})
+        self.assertEqual(resp.json()['lessons'], [])
+        self.assertEqual(self.client.get(url, {'week': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'group': 'x'}).status_code, 400)
+
+    def test_api_conditional_get(self):
+        url = reverse('schedule_api')
+        resp = self.client.get(url, {'week': '2022-01-03'})
+        etag, last_modified = resp['ETag'], resp['Last-Modified']
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(url, {'week': '2022-01-03'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(url, {'week': '2022-01-03'}, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_lesson(course=self.course, subgroups=[self.subgroup], date=date(2022, 1, 4),
+                          start_time=time(9, 0), lesson_type='Practice')
+        resp = self.client.get(url, {'week': '2022-01-03'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()['lessons']), 2)
+
+    def test_api_response_is_compressed(self):
+        from database.planning import PlannedLesson
+        from database.lessons import save_lessons
+        save_lessons([
+            PlannedLesson(self.course.id, self.subgroup.id, date(2022, 1, day), time(hour, 0), 'Practice')
+            for day in range(4, 9) for hour in (11, 13, 15)
+        ])
+        resp = self.client.get(reverse('schedule_api'), {'week': '2022-01-03'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+
+
+class ScheduleGeneratorTests(TestCase):
+    def setUp(self):
+        self.plan = StudyPlan.objects.create(
+            name='P', year_of_effect=2022,
+            number_of_semesters=2,
+            approval_date=date(2022,1,1), plan_author='A'
+        )
+        self.teachers = [
+            Teacher.objects.create(
+                full_name=f'T{i}', position='Prof',
+                allowed_hours=1000, rate=1.0
+            ) for i in range(2)
+        ]
+        self.courses = [
+            Course.objects.create(
+                study_plan=self.plan,
+                course_name=f'C{i}', lecture_hours=8,
+                practice_hours=8, semester=2,
+                credits=1, teacher=self.teachers[i % 2]
+            ) for i in range(3)
+        ]
+        for g in range(2):
+            group = Group.objects.create(
+                name=f'G{g}', major='M', year=1,
+                start_year=2022, study_plan=self.plan
+            )
+            for n in (1, 2):
+                Subgroup.objects.create(group=group, number=n)
+
+    def _generator(self, end_date=date(2025,2,16)):
+        from create_schedule import ScheduleGenerator
+        return ScheduleGenerator(self.plan, 2, date(2025,1,20), end_date)
+
+    def test_dropped_conflicts_count_as_unmet(self):
+        from create_schedule import PlannedLesson, _drop_conflicts
+        subgroups = list(Subgroup.objects.values_list('id', flat=True))
+        slot = (date(2025,1,20), time(9, 0))
+        planned = [PlannedLesson(self.courses[0].id, subgroup_id, *slot, 'Lecture') for subgroup_id in subgroups]
+        planned += [PlannedLesson(self.courses[2].id, subgroup_id, *slot, 'Lecture') for subgroup_id in subgroups]
+        planned.append(PlannedLesson(self.courses[2].id, subgroups[0], date(2025,1,21), time(9, 0), 'Practice'))
+        planned.append(PlannedLesson(self.courses[0].id, subgroups[1], date(2025,1,21), time(9, 0), 'Practice'))
+        unmet = {self.courses[2].id: {'lecture_hours': 2, 'practice_hours': 0}}
+
+        accepted = _drop_conflicts(planned, unmet)
+        self.assertEqual(len(accepted), len(subgroups) + 1)
+        self.assertEqual(unmet, {
+            self.courses[0].id: {'lecture_hours': 0, 'practice_hours': 2},
+            self.courses[2].id: {'lecture_hours': 4, 'practice_hours': 0},
+        })
+
+    def test_no_double_booking(self):
+        self._generator().generate_schedule()
+        lessons = all_lessons()
+        self.assertTrue(lessons)
+        subgroup_slots = [(subgroup_id, day, start) for subgroup_id, _, _, _, day, start in lessons]
+        self.assertEqual(len(subgroup_slots), len(set(subgroup_slots)))
+        teacher_slots = {}
+        for _, teacher_id, course_id, _, day, start in lessons:
+            teacher_slots.setdefault((teacher_id, day, start), set()).add(course_id)
+        self.assertTrue(all(len(c) == 1 for c in teacher_slots.values()))
+        self.assertEqual(self._generator().validate(), [])
+
+    def test_lecture_stored_once_for_all_subgroups(self):
+        from django.db.models import Count
+        self._generator().generate_schedule()
+        lectures = Lesson.objects.filter(lesson_type='Lecture').annotate(attending=Count('attendance'))
+        self.assertTrue(lectures.exists())
+        self.assertEqual(max(lecture.attending for lecture in lectures), 4)
+        # Одна подія на слот курсу; у підгруп — по рядку відвідування
+        self.assertLess(Lesson.objects.count(), LessonAttendance.objects.count())
+        self.assertFalse(Lesson.objects.filter(attendance__isnull=True).exists())
+
+    def test_query_count_does_not_grow_with_semester(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        generator = self._generator(end_date=date(2025,1,26))
+        with CaptureQueriesContext(connection) as short_run:
+            generator.generate_schedule()
+        Lesson.objects.all().delete()
+
+        generator = self._generator(end_date=date(2025,5,31))
+        with CaptureQueriesContext(connection) as long_run:
+            generator.generate_schedule()
+        self.assertEqual(len(short_run), len(long_run))
+
+    def test_csp_strategy_reports_unmet_hours(self):
+        from create_schedule import ScheduleGenerator
+        generator = ScheduleGenerator(
+            self.plan, 2, date(2025,1,20), date(2025,1,24),
+            strategy='csp', time_budget=5
+        )
+        generator.generate_schedule()
+        subgroup_slots = list(LessonAttendance.objects.values_list('subgroup_id', 'date', 'start_time'))
+        self.assertEqual(len(subgroup_slots), len(set(subgroup_slots)))
+        # За тиждень увесь план не вміщується — недовиставлені години мають бути у звіті
+        self.assertTrue(generator.unmet_hours)
+        for course in self.courses:
+            placed = LessonAttendance.objects.filter(lesson__course=course, lesson__lesson_type='Practice').count()
+            required = (course.practice_hours // 2) * 4
+            unmet = generator.unmet_hours.get(course.id, {}).get('practice_hours', 0)
+            self.assertEqual(placed * 2 + unmet, required * 2)
+
+    def test_unknown_strategy_rejected(self):
+        from create_schedule import ScheduleGenerator
+        with self.assertRaises(ValueError):
+            ScheduleGenerator(self.plan, 2, date(2025,1,20), date(2025,1,24), strategy='magic')
+
+    def test_plans_sharing_teachers_form_one_cluster(self):
+        from create_schedule import _plan_clusters, generate_all_plans
+        shared = StudyPlan.objects.create(
+            name='P2', year_of_effect=2022, number_of_semesters=2,
+            approval_date=date(2022,1,1), plan_author='A'
+        )
+        alone = StudyPlan.objects.create(
+            name='P3', year_of_effect=2022, number_of_semesters=2,
+            approval_date=date(2022,1,1), plan_author='A'
+        )
+        other_teacher = Teacher.objects.create(
+            full_name='T9', position='Prof', allowed_hours=1000, rate=1.0
+        )
+        for plan, teacher in ((shared, self.teachers[0]), (alone, other_teacher)):
+            Course.objects.create(
+                study_plan=plan, course_name='X', lecture_hours=4,
+                practice_hours=4, semester=2, credits=1, teacher=teacher
+            )
+            group = Group.objects.create(
+                name=plan.name, major='M', year=1, start_year=2022, study_plan=plan
+            )
+            Subgroup.objects.create(group=group, number=1)
+
+        clusters = sorted(sorted(c) for c in _plan_clusters(2))
+        self.assertEqual(clusters, [sorted([self.plan.id, shared.id]), [alone.id]])
+
+        generate_all_plans(2, date(2025,1,20), date(2025,3,1), workers=1)
+        self.assertEqual(
+            set(Lesson.objects.values_list('course__study_plan_id', flat=True).distinct()),
+            {self.plan.id, shared.id, alone.id}
+        )
+        teacher_slots = {}
+        for teacher_id, course_id, day, start in Lesson.objects.values_list(
+                'course__teacher_id', 'course_id', 'date', 'start_time'):
+            teacher_slots.setdefault((teacher_id, day, start), set()).add(course_id)
+        self.assertTrue(all(len(c) == 1 for c in teacher_slots.values()))
+
+    def test_reschedule_teacher_keeps_other_lessons(self):
+        generator = self._generator(end_date=date(2025,3,30))
+        generator.generate_schedule()
+        teacher = self.teachers[0]
+        day = Lesson.objects.filter(course__teacher=teacher).order_by('date').first().date
+        untouched = set(Lesson.objects.exclude(course__teacher=teacher, date=day).values_list('id', flat=True))
+        total = LessonAttendance.objects.filter(lesson__course__teacher=teacher).count()
+
+        removed, placed = generator.reschedule(teacher=teacher, unavailable_dates=[day])
+
+        self.assertGreater(removed, 0)
+        self.assertEqual(removed, placed)
+        self.assertFalse(Lesson.objects.filter(course__teacher=teacher, date=day).exists())
+        self.assertEqual(LessonAttendance.objects.filter(lesson__course__teacher=teacher).count(), total)
+        self.assertTrue(untouched <= set(Lesson.objects.values_list('id', flat=True)))
+
+    def test_reschedule_teacher_clears_other_plans(self):
+        from create_schedule import ScheduleGenerator
+        other = StudyPlan.objects.create(name='P2', year_of_effect=2022, number_of_semesters=2,
+                                         approval_date=date(2022,1,1), plan_author='A')
+        Course.objects.create(study_plan=other, course_name='X', lecture_hours=8, practice_hours=8, semester=2,
+                              credits=1, teacher=self.teachers[0])
+        group = Group.objects.create(name='O', major='M', year=1, start_year=2022, study_plan=other)
+        Subgroup.objects.create(group=group, number=1)
+        generator = self._generator(end_date=date(2025,3,30))
+        generator.generate_schedule()
+        ScheduleGenerator(other, 2, date(2025,1,20), date(2025,3,30)).generate_schedule()
+        teacher = self.teachers[0]
+        day = min(row[4] for row in all_lessons() if row[1] == teacher.id and row[0] == group.subgroups.get().id)
+
+        generator.reschedule(teacher=teacher, unavailable_dates=[day])
+        self.assertFalse([row for row in all_lessons() if row[1] == teacher.id and row[4] == day])
+
+    def test_reschedule_week_only_touches_that_week(self):
+        generator = self._generator()
+        generator.generate_schedule()
+        week_start = date(2025,1,27)
+        outside = set(Lesson.objects.exclude(
+            date__range=(week_start, date(2025,2,2))
+        ).values_list('id', flat=True))
+
+        generator.reschedule(week_start=week_start)
+
+        self.assertEqual(outside, set(Lesson.objects.exclude(
+            date__range=(week_start, date(2025,2,2))
+        ).values_list('id', flat=True)))
+        self.assertTrue(Lesson.objects.filter(date__range=(week_start, date(2025,2,2))).exists())
+        with self.assertRaises(ValueError):
+            generator.reschedule()
+
+    def test_optimizer_keeps_schedule_valid(self):
+        generator = self._generator(end_date=date(2025,3,30))
+        generator.optimize = True
+        generator.optimizer_iterations = 5000
+        generator.generate_schedule()
+        lessons = all_lessons()  # рознесені по тижнях заняття частково зберігаються серіями
+        subgroup_slots = [(subgroup_id, day, start) for subgroup_id, _, _, _, day, start in lessons]
+        self.assertEqual(len(subgroup_slots), len(set(subgroup_slots)))
+        for course in self.courses:
+            practices = sum(1 for row in lessons if row[2] == course.id and row[3] == 'Practice')
+            unmet = generator.unmet_hours.get(course.id, {}).get('practice_hours', 0)
+            self.assertEqual(practices * 2 + unmet, course.practice_hours * 4)
+
+    def test_dry_run_streams_without_writing(self):
+        import io
+        import json
+        from create_schedule import write_jsonl
+        generator = self._generator()
+        records = generator.dry_run()
+        self.assertFalse(Lesson.objects.exists())
+
+        out = io.StringIO()
+        write_jsonl(records, out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertTrue(lines)
+        self.assertFalse(Lesson.objects.exists())
+        self.assertEqual(
+            set(lines[0]), {'course_id', 'subgroup_id', 'date', 'slot', 'start_time', 'type'}
+        )
+        self.assertEqual(lines, sorted(lines, key=lambda r: (r['date'], r['slot'], r['subgroup_id'])))
+
+
+class ParallelGenerationTests(TransactionTestCase):
+    def setUp(self):
+        self.courses = []
+        for name in ('A', 'B'):
+            plan = StudyPlan.objects.create(name=name, year_of_effect=2022, number_of_semesters=2,
+                                            approval_date=date(2022,1,1), plan_author='A')
+            teacher = Teacher.objects.create(full_name=f'T{name}', position='Prof', allowed_hours=1000, rate=1.0)
+            self.courses.append(Course.objects.create(study_plan=plan, course_name=name, lecture_hours=8,
+                                                      practice_hours=8, semester=2, credits=1, teacher=teacher))
+            group = Group.objects.create(name=f'G{name}', major='M', year=1, start_year=2022, study_plan=plan)
+            for number in (1, 2):
+                Subgroup.objects.create(group=group, number=number)
+
+    def test_worker_processes_account_for_every_hour(self):
+        from create_schedule import _plan_clusters, plan_all_plans
+        self.assertEqual(len(_plan_clusters(2)), 2)
+        planned, unmet = plan_all_plans(2, date(2025,1,20), date(2025,2,16), workers=2)
+        for course in self.courses:
+            lessons = [p for p in planned if p.course_id == course.id]
+            self.assertTrue(lessons)
+            lectures = {(p.date, p.start_time) for p in lessons if p.lesson_type == 'Lecture'}
+            practices = [p for p in lessons if p.lesson_type != 'Lecture']
+            hours = unmet.get(course.id, {'lecture_hours': 0, 'practice_hours': 0})
+            self.assertEqual(len(lectures) * 2 + hours['lecture_hours'], course.lecture_hours)
+            self.assertEqual(len(practices) * 2 + hours['practice_hours'], course.practice_hours * 2)
+
+
+class ScheduleOptimizerTests(TestCase):
+    def test_closes_subgroup_gaps(self):
+        from schedule_optimizer import ScheduleOptimizer
+        from schedule_solver import Unit
+        day_slots = list(range(7))
+        units = [
+            Unit(1, 10, (100,), 'Practice', day_slots),
+            Unit(2, 20, (100,), 'Practice', day_slots),
+        ]
+        optimizer = ScheduleOptimizer(
+            units, [0, 5], 7, [0], 4,
+            weights={'teacher_daily_load': 0, 'course_spread': 0}, seed=1
+        )
+        self.assertEqual(optimizer.score, 3 * 4)
+        first, second = sorted(optimizer.run(2000))
+        self.assertEqual(second - first, 1)
+
+
+class ConstraintSolverTests(TestCase):
+    def test_identical_units_take_increasing_slots(self):
+        from schedule_solver import ConstraintSolver, Unit
+        unit = Unit(1, 10, (100,), 'Practice', list(range(14)))
+        result = ConstraintSolver([unit] * 4, 7, 2, seed=3).solve()
+        self.assertTrue(result.complete)
+        slots = [result.assignment[index] for index in range(4)]
+        self.assertEqual(slots, sorted(slots))
+        self.assertEqual(len(set(slots)), 4)
+
+    def test_most_constrained_unit_goes_first(self):
+        from schedule_solver import ConstraintSolver, Unit
+        units = [
+            Unit(1, 10, (100,), 'Practice', [0, 1]),
+            Unit(2, 20, (100,), 'Practice', [1]),
+        ]
+        result = ConstraintSolver(units, 7, 4, seed=1).solve()
+        self.assertEqual(result.assignment, {0: 0, 1: 1})
+        self.assertEqual(result.backtracks, 0)
+
+
+class SeedingTests(TestCase):
+    def test_build_dataset_sizes(self):
+        from database.seeding import build_dataset, reset_dataset
+        counts = build_dataset(plans=2, groups_per_plan=3, subgroups_per_group=2,
+                               courses_per_plan=3, courses_per_teacher=2)
+        self.assertEqual(counts, {'plans': 2, 'teachers': 3, 'courses': 6, 'groups': 6, 'subgroups': 12})
+        self.assertEqual(Subgroup.objects.filter(group__study_plan__name__startswith='Навчальний').count(), 12)
+        reset_dataset()
+        self.assertFalse(StudyPlan.objects.exists())
+
+    def test_build_lessons_is_deterministic(self):
+        from database.seeding import build_dataset, build_lessons
+        build_dataset(plans=1, groups_per_plan=2, subgroups_per_group=2, courses_per_plan=2)
+        created = build_lessons(10, date(2025,1,20), date(2025,2,2), seed=7, use_copy=False)
+        self.assertEqual(created, 40)
+        self.assertEqual(LessonAttendance.objects.count(), 40)
+        first = list(LessonAttendance.objects.order_by('id').values_list('subgroup_id', 'date', 'start_time'))
+        self.assertEqual(len(first), len(set(first)))
+
+        Lesson.objects.all().delete()
+        build_lessons(10, date(2025,1,20), date(2025,2,2), seed=7, use_copy=False)
+        second = list(LessonAttendance.objects.order_by('id').values_list('subgroup_id', 'date', 'start_time'))
+        self.assertEqual(first, second)
+
+
+class GenerateScheduleCommandTests(TestCase):
+    def setUp(self):
+        from database.seeding import build_dataset
+        build_dataset(plans=1, groups_per_plan=2, subgroups_per_group=2, courses_per_plan=2,
+                      lecture_hours=8, practice_hours=8)
+
+    def test_commits_weekly_and_resumes(self):
+        import io
+        from django.core.management import call_command
+        from database.models import ScheduleRun, ScheduleVersion
+        from database.versions import prune_versions
+
+        call_command('generate_schedule', semester=2, start=date(2025,1,20), end=date(2025,3,2), no_publish=True,
+                     stdout=io.StringIO())
+        run = ScheduleRun.objects.get()
+        self.assertEqual(run.status, ScheduleRun.STATUS_DONE)
+        self.assertEqual(run.committed_through, date(2025,3,2))
+        self.assertEqual(run.lessons_written, LessonAttendance.objects.in_version(run.version).count())
+        self.assertFalse(LessonAttendance.objects.in_version().exists())  # чернетку читачі не бачать
+        self.assertEqual(prune_versions(drafts=True), [])  # неопублікована чернетка завершеного запуску
+        total = run.lessons_written
+
+        # Імітуємо збій після першого тижня: пізніші тижні не записані
+        Lesson.objects.filter(date__gt=date(2025,1,26)).delete()
+        ScheduleRun.objects.filter(pk=run.pk).update(
+            status=ScheduleRun.STATUS_FAILED, committed_through=date(2025,1,26)
+        )
+        call_command('generate_schedule', resume=run.pk, stdout=io.StringIO())
+
+        run.version.refresh_from_db()
+        self.assertEqual(run.version.status, ScheduleVersion.STATUS_ACTIVE)
+        self.assertEqual(LessonAttendance.objects.in_version().count(), total)
+        subgroup_slots = list(LessonAttendance.objects.values_list('subgroup_id', 'date', 'start_time'))
+        self.assertEqual(len(subgroup_slots), len(set(subgroup_slots)))
+
+    def test_second_run_counts_existing_lessons_and_keeps_settings(self):
+        import io
+        from unittest import mock
+        from django.core.management import call_command
+        from database.models import ScheduleRun
+
+        call_command('generate_schedule', semester=2, start=date(2025,1,20), end=date(2025,3,2), workers=1,
+                     stdout=io.StringIO())
+        total = len(all_lessons())
+        call_command('generate_schedule', semester=2, start=date(2025,1,20), end=date(2025,3,2), optimize=True,
+                     workers=1, no_publish=True, stdout=io.StringIO())
+        run = ScheduleRun.objects.latest('id')
+        self.assertEqual((run.optimize, run.workers, run.lessons_written), (True, 1, 0))
+
+        # --resume планує з налаштуваннями запуску, а не з аргументів команди
+        ScheduleRun.objects.filter(pk=run.pk).update(status=ScheduleRun.STATUS_FAILED, committed_through=None)
+        with mock.patch('create_schedule.plan_all_plans', return_value=([], {})) as plan_all_plans:
+            call_command('generate_schedule', resume=run.pk, no_publish=True, stdout=io.StringIO())
+        self.assertEqual((plan_all_plans.call_args.kwargs['optimize'], plan_all_plans.call_args.kwargs['workers']),
+                         (True, 1))
+
+        call_command('schedule_versions', publish=run.version_id, stdout=io.StringIO())
+        self.assertEqual(len(all_lessons()), total)  # без --replace розклад не дублюється
+
+
+class LessonIndexTests(TestCase):
+    """Плани запитів для гарячих шляхів: кожен має йти через відповідний індекс"""
+
+    def setUp(self):
+        from database.seeding import build_dataset, build_lessons
+        build_dataset(plans=2, groups_per_plan=2, subgroups_per_group=2, courses_per_plan=3)
+        build_lessons(20, date(2025, 1, 20), date(2025, 3, 2), use_copy=False)
+        self.lesson = LessonAttendance.objects.select_related('lesson__course').first()
+
+    def _plan(self, queryset):
+        from django.db import connection
+        if connection.vendor == 'postgresql':
+            # На маленькій таблиці планувальник і так обрав би seq scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def assertUsesUniqueSlotIndex(self, plan):
+        from django.db import connection
+        # SQLite створює унікальне обмеження разом з таблицею і дає індексу власне ім'я
+        if connection.vendor == 'sqlite':
+            self.assertIn('sqlite_autoindex_database_lessonattendance', plan)
+        else:
+            self.assertIn('attendance_subgroup_slot_uniq', plan)
+
+    def test_subgroup_slot_lookup_uses_unique_index(self):
+        self.assertUsesUniqueSlotIndex(self._plan(LessonAttendance.objects.filter(
+            subgroup_id=self.lesson.subgroup_id, date=self.lesson.date, start_time=self.lesson.start_time,
+        )))
+
+    def test_dashboard_lookup_uses_unique_index_prefix(self):
+        self.assertUsesUniqueSlotIndex(self._plan(
+            LessonAttendance.objects.filter(subgroup_id=self.lesson.subgroup_id, date=self.lesson.date)
+        ))
+
+    def test_course_range_lookup_uses_course_index(self):
+        from django.db import connection
+        plan = self._plan(Lesson.objects.filter(
+            course_id=self.lesson.lesson.course_id, date__range=(date(2025, 1, 20), date(2025, 1, 26)),
+        ))
+        self.assertIn(
+            'sqlite_autoindex_database_lesson_' if connection.vendor == 'sqlite' else 'lesson_course_slot_uniq', plan
+        )
+
+    def test_week_range_uses_date_index(self):
+        plan = self._plan(
+            LessonAttendance.objects.filter(date__range=(date(2025, 1, 20), date(2025, 1, 26)))
+            .order_by('date', 'start_time')
+        )
+        self.assertIn('attendance_date_slot_idx', plan)
+
+    def test_database_rejects_double_booking(self):
+        from django.db import IntegrityError, transaction
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_lesson(self.lesson.lesson.course, [self.lesson.subgroup], self.lesson.date,
+                          self.lesson.start_time, 'Practice')
+        # Пакетна вставка просто пропускає зайнятий слот і не лишає порожньої події
+        from database.planning import PlannedLesson
+        from database.lessons import save_lessons
+        other_course = Course.objects.exclude(pk=self.lesson.lesson.course_id).first()
+        inserted = save_lessons([PlannedLesson(other_course.id, self.lesson.subgroup_id, self.lesson.date,
+                                               self.lesson.start_time, 'Practice')])
+        self.assertEqual(inserted, 0)  # відкинутий конфлікт не рахується записаним
+        self.assertEqual(LessonAttendance.objects.filter(
+            subgroup_id=self.lesson.subgroup_id, date=self.lesson.date, start_time=self.lesson.start_time,
+        ).count(), 1)
+        self.assertFalse(Lesson.objects.filter(attendance__isnull=True).exists())
+
+
+class LessonExportTests(TestCase):
+    def setUp(self):
+        from database.seeding import build_dataset, build_lessons
+        build_dataset(plans=1, groups_per_plan=2, subgroups_per_group=2, courses_per_plan=3)
+        build_lessons(15, date(2025, 1, 20), date(2025, 3, 2), use_copy=False)
+
+    def test_columnar_round_trip_matches_database(self):
+        import io
+        from database.export import COLUMN_NAMES, iter_columnar, lesson_rows, read_columnar
+
+        buffer = io.BytesIO(b''.join(iter_columnar(lesson_rows(), row_group_size=7)))
+        blocks = list(read_columnar(buffer))
+        self.assertEqual(len(blocks), -(-LessonAttendance.objects.count() // 7))
+
+        restored = [row for block in blocks for row in zip(*(block[name] for name in COLUMN_NAMES))]
+        self.assertEqual(restored, list(lesson_rows()))
+
+    def test_command_writes_csv(self):
+        import csv
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'lessons.csv')
+            call_command('export_lessons', output=path, start=date(2025, 2, 1), stderr=io.StringIO())
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), LessonAttendance.objects.filter(date__gte=date(2025, 2, 1)).count())
+        first = LessonAttendance.objects.filter(date__gte=date(2025, 2, 1)).order_by('date', 'start_time', 'id') \
+            .select_related('lesson__course__teacher').first()
+        self.assertEqual(rows[0]['lesson_id'], str(first.lesson_id))
+        self.assertEqual(rows[0]['teacher_name'], first.lesson.course.teacher.full_name)
+
+    def test_export_view_is_staff_only(self):
+        url = reverse('export_lessons', args=['csv'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), LessonAttendance.objects.count() + 1)
+        self.assertEqual(self.client.get(reverse('export_lessons', args=['xlsx'])).status_code, 404)
+
+
+class WorkloadSummaryTests(TestCase):
+    def setUp(self):
+        self.plan = StudyPlan.objects.create(
+            name='P', year_of_effect=2022,
+            number_of_semesters=2,
+            approval_date=date(2022,1,1), plan_author='A'
+        )
+        self.teacher = Teacher.objects.create(full_name='T', position='Prof', allowed_hours=2, rate=1.0)
+        self.course = Course.objects.create(
+            study_plan=self.plan, course_name='C', lecture_hours=4,
+            practice_hours=4, semester=2, credits=1, teacher=self.teacher
+        )
+        self.group = Group.objects.create(name='G', major='M', year=1, start_year=2022, study_plan=self.plan)
+        self.sg1 = Subgroup.objects.create(group=self.group, number=1)
+        self.sg2 = Subgroup.objects.create(group=self.group, number=2)
+        # Лекція на обидві підгрупи в одному слоті і практика першої підгрупи
+        create_lesson(course=self.course, subgroups=[self.sg1, self.sg2], date=date(2025, 1, 20),
+                      start_time=time(8, 30), lesson_type='Lecture')
+        create_lesson(course=self.course, subgroups=[self.sg1], date=date(2025, 1, 21),
+                      start_time=time(8, 30), lesson_type='Practice')
+
+    def test_refresh_counts_lessons_and_teacher_slots(self):
+        from create_schedule import ScheduleGenerator
+        from database.models import SubgroupWorkload, TeacherWorkload
+        from database.workload import refresh_workload
+        refresh_workload()
+        self.assertEqual(
+            {(w.subgroup_id, w.lectures, w.practices) for w in SubgroupWorkload.objects.all()},
+            {(self.sg1.id, 1, 1), (self.sg2.id, 1, 0)},
+        )
+        workload = TeacherWorkload.objects.get(teacher=self.teacher)
+        self.assertEqual(workload.lessons, 2)
+        self.assertEqual(workload.scheduled_hours, 2 * ScheduleGenerator.HOURS_PER_LESSON)
+
+    def test_partial_refresh_touches_only_given_rows(self):
+        from database.models import SubgroupWorkload
+        from database.workload import refresh_workload
+        refresh_workload()
+        LessonAttendance.objects.filter(subgroup=self.sg2).delete()
+        refresh_workload(subgroup_ids=[self.sg1.id], teacher_ids=[])
+        self.assertEqual(SubgroupWorkload.objects.get(subgroup=self.sg2).lectures, 1)
+        refresh_workload(subgroup_ids=[self.sg2.id], teacher_ids=[])
+        self.assertEqual(SubgroupWorkload.objects.get(subgroup=self.sg2).lectures, 0)
+
+    def test_report_view_flags_overloaded_teacher_in_constant_queries(self):
+        from database.workload import refresh_workload
+        refresh_workload()
+        User.objects.create_user(username='staff', password='pass')
+        self.client.login(username='staff', password='pass')
+        # Сесія і користувач, підгрупи з групами, викладачі — незалежно від кількості рядків
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('workload_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'G/2')
+        self.assertContains(response, 'table-danger')
+
+
+class ScheduleValidationTests(TestCase):
+    def _arrays(self, rows):
+        # (teacher, subgroup, course, day, пара, лекція)
+        from database.validation import lesson_arrays
+        return lesson_arrays(
+            (i, teacher, subgroup, course, date(2025,1,20 + day), time(8 + slot, 0), 'Lecture' if lecture else 'Practice')
+            for i, (teacher, subgroup, course, day, slot, lecture) in enumerate(rows)
+        )
+
+    def test_finds_every_kind_of_violation(self):
+        from database.validation import find_violations
+        lessons = self._arrays([
+            (1, 10, 100, 0, 0, True), (1, 11, 100, 0, 0, True),   # лекція на дві підгрупи — не конфлікт
+            (1, 12, 101, 0, 0, False),                            # той самий викладач, інший курс
+            (2, 10, 102, 0, 1, False), (3, 10, 103, 0, 1, False),  # підгрупа 10 двічі в слоті
+            (2, 13, 104, 1, 0, False), (2, 13, 104, 1, 1, False), (2, 13, 104, 1, 2, False),
+        ])
+        found = find_violations(lessons, max_daily=2, hours_per_lesson=2,
+                                allowed_hours=([1, 2, 3], [100, 4, 100]))
+
+        teacher_ids, days, minutes, counts = found['teacher_conflict']
+        self.assertEqual((teacher_ids.tolist(), counts.tolist()), ([1], [2]))
+        self.assertEqual((date.fromordinal(int(days[0])), int(minutes[0])), (date(2025,1,20), 8 * 60))
+        self.assertEqual(found['subgroup_conflict'][0].tolist(), [10])
+        self.assertEqual(found['subgroup_daily'][0].tolist(), [13])
+        self.assertEqual(found['subgroup_daily'][2].tolist(), [3])
+        # Викладач 2: чотири різні слоти по дві години при ліміті 4
+        self.assertEqual([a.tolist() for a in found['teacher_hours']], [[2], [8], [4]])
+
+    def test_clean_schedule_has_no_violations(self):
+        from database.validation import find_violations
+        lessons = self._arrays([(1, 10, 100, 0, 0, True), (1, 11, 100, 0, 0, True), (1, 10, 100, 0, 1, False)])
+        found = find_violations(lessons, max_daily=4, hours_per_lesson=2)
+        self.assertTrue(all(len(column) == 0 for arrays in found.values() for column in arrays))
+
+    def test_command_fails_on_overloaded_teacher(self):
+        import io
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from database.seeding import build_dataset, build_lessons
+        build_dataset(plans=1, groups_per_plan=1, subgroups_per_group=2, courses_per_plan=2)
+        build_lessons(6, date(2025,1,20), date(2025,2,2), use_copy=False)
+
+        call_command('validate_schedule', stdout=io.StringIO())
+        Teacher.objects.update(allowed_hours=0)
+        with self.assertRaisesMessage(CommandError, 'teacher_hours='):
+            call_command('validate_schedule', stdout=io.StringIO())
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.plan = StudyPlan.objects.create(
+            name='P', year_of_effect=2022,
+            number_of_semesters=2,
+            approval_date=date(2022,1,1), plan_author='A'
+        )
+        self.teacher = Teacher.objects.create(full_name='T', position='Prof', allowed_hours=1000, rate=1.0)
+        self.course = Course.objects.create(
+            study_plan=self.plan, course_name='C', lecture_hours=8,
+            practice_hours=8, semester=2, credits=1, teacher=self.teacher
+        )
+        self.group = Group.objects.create(name='G', major='M', year=1, start_year=2022, study_plan=self.plan)
+        self.sg1 = Subgroup.objects.create(group=self.group, number=1)
+        self.sg2 = Subgroup.objects.create(group=self.group, number=2)
+
+    def _save_series(self):
+        """Лекція щопонеділка 20.01–17.02 на обидві підгрупи без 03.02 і одна практика"""
+        from database.planning import PlannedLesson
+        from database.lessons import save_schedule
+        from database.weeks import rebuild_weeks
+        planned = [
+            PlannedLesson(self.course.id, subgroup.id, day, time(9, 0), 'Lecture')
+            for day in (date(2025,1,20), date(2025,1,27), date(2025,2,10), date(2025,2,17))
+            for subgroup in (self.sg1, self.sg2)
+        ] + [PlannedLesson(self.course.id, self.sg1.id, date(2025,1,21), time(9, 0), 'Practice')]
+        save_schedule(planned)
+        rebuild_weeks()
+        return LessonPattern.objects.get()
+
+    def test_weekly_series_stored_once_and_expanded_in_window(self):
+        from database.recurrence import occurrence_dates
+        pattern = self._save_series()
+        self.assertEqual((pattern.weekday, pattern.start_date, pattern.end_date), (0, date(2025,1,20), date(2025,2,17)))
+        self.assertEqual(pattern.exceptions, ['2025-02-03'])
+        self.assertEqual(PatternAttendance.objects.count(), 2)
+        self.assertEqual(LessonAttendance.objects.count(), 1)  # практика — окрема подія
+        self.assertEqual(len(all_lessons()), 9)
+        self.assertEqual(
+            list(occurrence_dates(0, pattern.start_date, pattern.end_date, pattern.exceptions,
+                                  date(2025,1,25), date(2025,2,12))),
+            [date(2025,1,27), date(2025,2,10)],
+        )
+
+        data = self.client.get(reverse('schedule_api'), {'week': '2025-01-20'}).json()
+        self.assertEqual(sorted(row[0] for row in data['lessons'] if row[0] < 0), [-pattern.id, -pattern.id])
+        self.assertEqual(len(data['lessons']), 3)
+        self.assertEqual(self.client.get(reverse('schedule_api'), {'week': '2025-02-03'}).json()['lessons'], [])
+        resp = self.client.get(reverse('schedule'))
+        self.assertEqual(resp.context['page_obj'].paginator.num_pages, 4)  # тиждень винятку порожній
+
+        User.objects.create_user(username='u', password='pass')
+        self.client.login(username='u', password='pass')
+        resp = self.client.get(reverse('dashboard'), {'subgroup': self.sg2.id, 'start': '2025-02-01', 'end': '2025-02-28'})
+        self.assertEqual([lesson.date for lesson in resp.context['lessons']], [date(2025,2,10), date(2025,2,17)])
+
+    def test_exports_and_feeds_include_series(self):
+        from database.export import lesson_rows
+        from database.validation import validate_schedule
+        pattern = self._save_series()
+        rows = list(lesson_rows(window_days=7))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual([row[1] for row in rows], sorted(row[1] for row in rows))
+        self.assertEqual({row[0] for row in rows if row[1] == date(2025,2,17)}, {-pattern.id})
+        self.assertEqual(validate_schedule(), [])
+
+        body = b''.join(self.client.get(reverse('teacher_ical', args=[self.teacher.id])).streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20250217T090000Z\r\n', body)
+        self.assertIn('EXDATE:20250203T090000Z\r\n', body)
+        self.assertIn('DESCRIPTION:G/1\\, G/2\r\n', body)
+
+    def test_ical_series_keeps_local_time_across_dst(self):
+        from django.test import override_settings
+        from database.planning import PlannedLesson
+        from database.lessons import save_schedule
+        save_schedule([PlannedLesson(self.course.id, self.sg1.id, day, time(9, 0), 'Practice')
+                       for day in (date(2025,3,17), date(2025,3,24), date(2025,4,7))])
+        with override_settings(TIME_ZONE='Europe/Kyiv'):
+            response = self.client.get(reverse('teacher_ical', args=[self.teacher.id]))
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('BEGIN:VTIMEZONE\r\nTZID:Europe/Kyiv\r\n', body)
+        self.assertIn('DTSTART:20250330T030000\r\nTZOFFSETFROM:+0200\r\nTZOFFSETTO:+0300\r\n', body)
+        self.assertIn('DTSTART;TZID=Europe/Kyiv:20250317T090000\r\n', body)
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20250407T060000Z\r\n', body)
+        self.assertIn('EXDATE;TZID=Europe/Kyiv:20250331T090000\r\n', body)
+
+    def test_remove_occurrences_trims_series_and_adds_exceptions(self):
+        from database.recurrence import remove_occurrences
+        pattern = self._save_series()
+        removal = remove_occurrences(LessonPattern.objects.all(), date(2025,1,20), date(2025,1,31))
+        self.assertEqual((removal.count, removal.dates), (4, {date(2025,1,20), date(2025,1,27)}))
+        pattern.refresh_from_db()
+        self.assertEqual((pattern.start_date, pattern.exceptions), (date(2025,2,10), []))
+
+        remove_occurrences(LessonPattern.objects.all(), date(2025,1,1), date(2025,3,1), dates=[date(2025,2,17)])
+        pattern.refresh_from_db()
+        self.assertEqual((pattern.start_date, pattern.end_date), (date(2025,2,10), date(2025,2,10)))
+        remove_occurrences(LessonPattern.objects.all(), date(2025,2,10), date(2025,2,10))
+        self.assertFalse(LessonPattern.objects.exists())
+
+    def test_series_over_taken_slot_is_written_as_events(self):
+        from database.planning import PlannedLesson
+        from database.lessons import save_schedule
+        from database.validation import validate_schedule
+        other = Course.objects.create(study_plan=self.plan, course_name='D', lecture_hours=2, practice_hours=2,
+                                      semester=2, credits=1, teacher=self.teacher)
+        create_lesson(other, [self.sg1], date(2025,1,27), time(9, 0), 'Practice')
+        save_schedule([PlannedLesson(self.course.id, self.sg1.id, day, time(9, 0), 'Practice')
+                       for day in (date(2025,1,20), date(2025,1,27), date(2025,2,3), date(2025,2,10))])
+        self.assertFalse(LessonPattern.objects.exists())
+        self.assertEqual(LessonAttendance.objects.filter(lesson__course=self.course).count(), 3)
+        self.assertEqual(validate_schedule(), [])
+
+    def test_weekly_strategy_generates_valid_series(self):
+        from create_schedule import ScheduleGenerator
+        generator = ScheduleGenerator(self.plan, 2, date(2025,1,20), date(2025,3,2), strategy='weekly')
+        generator.generate_schedule()
+        self.assertTrue(LessonPattern.objects.exists())
+        self.assertEqual(generator.unmet_hours, {})
+        lessons = all_lessons()
+        self.assertEqual(sum(1 for row in lessons if row[3] == 'Practice'), 2 * 4)
+        self.assertLess(LessonPattern.objects.count() + Lesson.objects.count(), len(lessons))
+        self.assertEqual(generator.validate(), [])
+
+
+class ScheduleVersionTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.courses = {}
+        for name in ('A', 'B'):
+            plan = StudyPlan.objects.create(name=name, year_of_effect=2022, number_of_semesters=2,
+                                            approval_date=date(2022,1,1), plan_author='A')
+            teacher = Teacher.objects.create(full_name=f'T{name}', position='Prof', allowed_hours=1000, rate=1.0)
+            self.courses[name] = Course.objects.create(study_plan=plan, course_name=name, lecture_hours=4,
+                                                       practice_hours=4, semester=2, credits=1, teacher=teacher)
+            group = Group.objects.create(name=f'G{name}', major='M', year=1, start_year=2022, study_plan=plan)
+            Subgroup.objects.create(group=group, number=1)
+        self.old_a = create_lesson(self.courses['A'], Subgroup.objects.filter(group__name='GA'), date(2025,1,20),
+                                   time(9, 0), 'Lecture')
+        create_lesson(self.courses['B'], Subgroup.objects.filter(group__name='GB'), date(2025,1,20), time(9, 0),
+                      'Lecture')
+
+    def _week(self):
+        """(курс, день тижня) занять тижня 20.01 з JSON API"""
+        data = self.client.get(reverse('schedule_api'), {'week': '2025-01-20'}).json()
+        return sorted((data['courses'][str(row[4])]['name'], row[1]) for row in data['lessons'])
+
+    def test_draft_is_invisible_until_published(self):
+        from database.planning import PlannedLesson
+        from database.lessons import save_lessons
+        from database.models import ScheduleVersion
+        from database.versions import create_draft, publish
+        old = self.old_a.version
+        draft = create_draft(courses=Course.objects.filter(pk=self.courses['B'].pk))
+        self.assertEqual(LessonAttendance.objects.in_version(draft).count(), 1)  # скопійована лише лекція B
+        save_lessons([PlannedLesson(self.courses['A'].id, Subgroup.objects.get(group__name='GA').id,
+                                    date(2025,1,21), time(9, 0), 'Practice')], version=draft)
+        self.assertEqual(self._week(), [('A', 0), ('B', 0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publish(draft)
+        old.refresh_from_db()
+        self.assertEqual(old.status, ScheduleVersion.STATUS_RETIRED)
+        self.assertEqual(ScheduleVersion.objects.get(status=ScheduleVersion.STATUS_ACTIVE), draft)
+        self.assertEqual(self._week(), [('A', 1), ('B', 0)])
+        self.assertEqual(
+            set(LessonAttendance.objects.in_version().values_list('date', 'lesson__course__course_name')),
+            {(date(2025,1,21), 'A'), (date(2025,1,20), 'B')},
+        )
+        with self.assertRaises(ValueError):
+            publish(draft)
+
+    def test_publish_refuses_draft_of_changed_schedule(self):
+        from database.models import ScheduleVersion
+        from database.versions import create_draft, publish
+        draft = create_draft()
+        create_lesson(self.courses['B'], Subgroup.objects.filter(group__name='GB'), date(2025,1,21), time(9, 0),
+                      'Practice')
+        with self.assertRaises(ValueError):
+            publish(draft)
+        draft.refresh_from_db()
+        self.assertEqual(draft.status, ScheduleVersion.STATUS_BUILDING)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish(draft, force=True)
+        self.assertEqual(self._week(), [('A', 0), ('B', 0)])  # зміну після копіювання force відкидає
+
+    def test_generate_all_plans_updates_active_version_in_place(self):
+        from create_schedule import generate_all_plans
+        from database.models import ScheduleVersion
+        from database.versions import prune_versions
+        generate_all_plans(2, date(2025,1,20), date(2025,2,2), plan_ids=[self.courses['A'].study_plan_id], workers=1)
+        active = LessonAttendance.objects.in_version()
+        self.assertEqual(active.filter(lesson__course=self.courses['B']).count(), 1)
+        self.assertEqual(sum(1 for row in all_lessons() if row[2] == self.courses['A'].id), 2 + 2)
+        self.assertEqual(ScheduleVersion.objects.count(), 1)
+        self.assertEqual(prune_versions(keep=0), [])
+
+    def test_generate_all_plans_keeps_other_semesters_and_dates(self):
+        from create_schedule import generate_all_plans
+        course_a = self.courses['A']
+        first_semester = Course.objects.create(study_plan=course_a.study_plan, course_name='A1', lecture_hours=2,
+                                               practice_hours=0, semester=1, credits=1, teacher=course_a.teacher)
+        subgroups = Subgroup.objects.filter(group__name='GA')
+        kept = [create_lesson(first_semester, subgroups, date(2025,1,22), time(9, 0), 'Lecture'),
+                create_lesson(course_a, subgroups, date(2025,4,7), time(9, 0), 'Lecture')]
+        generate_all_plans(2, date(2025,1,20), date(2025,3,2), plan_ids=[course_a.study_plan_id], workers=1)
+        self.assertEqual(Lesson.objects.filter(pk__in=[lesson.pk for lesson in kept]).count(), 2)
+
+    def test_apply_diff_writes_only_changed_lessons(self):
+        from database.planning import PlannedLesson
+        from database.diff import ScheduleDiff, apply_diff
+        from database.models import LessonPattern
+        subgroup = Subgroup.objects.get(group__name='GA')
+        courses = Course.objects.filter(pk=self.courses['A'].pk)
+
+        def lecture(day):
+            return PlannedLesson(self.courses['A'].id, subgroup.id, day, time(9, 0), 'Lecture')
+
+        mondays = [date(2025,1,20), date(2025,1,27), date(2025,2,3), date(2025,2,10)]
+        with self.captureOnCommitCallbacks(execute=True):
+            diff = apply_diff([lecture(day) for day in mondays], courses)
+        self.assertEqual(diff, ScheduleDiff(3, 0, mondays[1:]))
+        self.assertTrue(Lesson.objects.filter(pk=self.old_a.pk).exists())  # незмінене заняття не переписане
+        self.assertEqual(LessonPattern.objects.in_version().get().start_date, date(2025,1,27))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            diff = apply_diff([lecture(day) for day in mondays if day != date(2025,2,3)], courses)
+        self.assertEqual(diff, ScheduleDiff(0, 1, [date(2025,2,3)]))
+        self.assertEqual(LessonPattern.objects.in_version().get().exceptions, ['2025-02-03'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            diff = apply_diff([], courses)
+        self.assertEqual(diff, ScheduleDiff(0, 3, [date(2025,1,20), date(2025,1,27), date(2025,2,10)]))
+        self.assertEqual(self._week(), [('B', 0)])
+        self.assertEqual([row[2] for row in all_lessons()], [self.courses['B'].id])
+
+
+class LessonPartitionTests(TestCase):
+    def test_month_partitions_cover_whole_weeks(self):
+        from datetime import timedelta
+        from database.partitions import month_of, month_range, months
+        self.assertEqual(month_range(2025, 2), (date(2025,1,27), date(2025,2,24)))
+        self.assertEqual(month_range(2024, 12), (date(2024,11,25), date(2024,12,30)))
+        self.assertEqual(month_of(date(2024,12,31)), (2025, 1))  # тиждень з 1 січня
+        self.assertEqual(list(months(date(2024,12,29), date(2025,2,1))), [(2024, 12), (2025, 1), (2025, 2)])
+        monday = date(2024,12,30)
+        for week in range(60):
+            days = [monday + timedelta(days=7 * week + offset) for offset in range(7)]
+            section = month_of(days[0])
+            self.assertEqual({month_of(day) for day in days}, {section})
+            start, end = month_range(*section)
+            self.assertTrue(start <= days[0] and days[-1] < end)
+
+    def test_command_requires_partitioned_tables(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        if connection.vendor == 'postgresql':
+            self.skipTest("на PostgreSQL таблиці секціоновані міграцією 0013")
+        with self.assertRaisesMessage(CommandError, 'not partitioned'):
+            call_command('lesson_partitions')
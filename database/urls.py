@@ -10,6 +10,13 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
 
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('api/subgroups/', views.subgroup_search, name='subgroup_search'),
 
-    path('schedule/', schedule_view, name='schedule')
+    path('schedule/', schedule_view, name='schedule'),
+    path('schedule/teacher/<int:teacher_id>/', views.teacher_schedule_view, name='teacher_schedule'),
+    path('ical/subgroup/<int:subgroup_id>.ics', views.subgroup_ical, name='subgroup_ical'),
+    path('ical/teacher/<int:teacher_id>.ics', views.teacher_ical, name='teacher_ical'),
+    path('export/lessons.<str:extension>', views.export_lessons_view, name='export_lessons'),
+    path('reports/workload/', views.workload_report, name='workload_report'),
+    path('api/schedule/', views.schedule_api, name='schedule_api'),
 ]
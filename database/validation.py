@@ -0,0 +1,221 @@
+"""
+Перевірка готового розкладу семестру на порушення обмежень.
+
+Заняття завантажуються один раз у стовпчикові масиви NumPy (викладач, підгрупа, курс,
+індекс дня, індекс пари), після чого всі перевірки — це np.unique / np.bincount
+за складеними цілочисловими ключами, без циклів Python по заняттях:
+
+- teacher_conflict — у викладача в одному слоті більше однієї події
+  (лекція на кілька підгруп — одна подія, кожна практика — окрема);
+- subgroup_conflict — у підгрупи в одному слоті більше одного заняття;
+- subgroup_daily — у підгрупи за день більше пар, ніж MAX_LESSONS_FOR_SUBGROUP (database.planning);
+- teacher_hours — години викладача (різні слоти × HOURS_PER_LESSON) перевищують allowed_hours.
+
+find_violations не залежить від Django; validate_schedule додає завантаження з БД.
+"""
+from array import array
+from collections import namedtuple
+from datetime import date, time
+
+import numpy as np
+
+from django.db.models import Q
+
+from database.models import LessonAttendance, PatternAttendance, Teacher
+from database.planning import HOURS_PER_LESSON, MAX_LESSONS_FOR_SUBGROUP
+from database.recurrence import occurrence_rows, pattern_field
+
+CHUNK_SIZE = 20000
+KINDS = ('teacher_conflict', 'subgroup_conflict', 'subgroup_daily', 'teacher_hours')
+
+# Стовпці занять підгруп: id (події; у серії — -id серії), teacher, subgroup, course — id з БД; day — ordinal дати; minute — хвилина початку пари
+LessonArrays = namedtuple('LessonArrays', 'id teacher subgroup course day minute lecture')
+
+# Одне порушення; поля, що не стосуються виду, — None
+Violation = namedtuple('Violation', 'kind teacher_id subgroup_id date start_time count limit')
+
+LESSON_FIELDS = (
+    'lesson_id', 'lesson__course__teacher_id', 'subgroup_id', 'lesson__course_id', 'date', 'start_time',
+    'lesson__lesson_type',
+)
+
+
+def lesson_arrays(rows):
+    """Масиви з кортежів у порядку LESSON_FIELDS (values_list або PlannedLesson, перетворені викликачем)"""
+    columns = [array('q') for _ in LessonArrays._fields]
+    ids, teachers, subgroups, courses, days, minutes, lectures = columns
+    for lesson_id, teacher_id, subgroup_id, course_id, day, start_time, lesson_type in rows:
+        ids.append(lesson_id)
+        teachers.append(teacher_id)
+        subgroups.append(subgroup_id)
+        courses.append(course_id)
+        days.append(day.toordinal())
+        minutes.append(start_time.hour * 60 + start_time.minute)
+        lectures.append(lesson_type == 'Lecture')
+    return LessonArrays(*(np.frombuffer(column, dtype=np.int64) for column in columns))
+
+
+def load_lessons(semester=None, start_date=None, end_date=None, plan_ids=None, subgroup_ids=None, teacher_ids=None,
+                 version=None):
+    """
+    Заняття підгруп семестру і/або діапазону дат з БД плоскими кортежами порціями:
+    LessonAttendance і розгорнуті у той самий діапазон серії PatternAttendance версії version (None — активної).
+    subgroup_ids/teacher_ids — лише заняття цих підгруп або цих викладачів (як Occupancy.from_db).
+    """
+    conditions = {}
+    if semester is not None:
+        conditions['lesson__course__semester'] = semester
+    if plan_ids:
+        conditions['lesson__course__study_plan_id__in'] = plan_ids
+
+    def narrow(queryset, field):
+        queryset = queryset.filter(**{field(name): value for name, value in conditions.items()})
+        if subgroup_ids is not None or teacher_ids is not None:
+            queryset = queryset.filter(Q(**{field('subgroup_id__in'): subgroup_ids or ()})
+                                       | Q(**{field('lesson__course__teacher_id__in'): teacher_ids or ()}))
+        return queryset
+
+    rows = occurrence_rows(
+        narrow(LessonAttendance.objects.in_version(version), str),
+        narrow(PatternAttendance.objects.in_version(version), pattern_field),
+        LESSON_FIELDS, start_date, end_date, chunk_size=CHUNK_SIZE,
+    )
+    return lesson_arrays(rows)
+
+
+def _dense(values):
+    """Щільні індекси 0..n-1 і самі унікальні значення"""
+    unique, inverse = np.unique(values, return_inverse=True)
+    return inverse.astype(np.int64), unique
+
+
+def _compact(values):
+    """
+    Те саме, що _dense, але за O(n) через bincount — для id і дат,
+    діапазон значень яких порівнянний з розміром таблиць
+    """
+    offset = values.min()
+    shifted = values - offset
+    present = np.flatnonzero(np.bincount(shifted))
+    index = np.zeros(int(shifted.max()) + 1, dtype=np.int64)
+    index[present] = np.arange(len(present))
+    return index[shifted], present + offset
+
+
+def _distinct(keys):
+    """Відсортовані різні ключі (сортування замість хеш-таблиці np.unique — на int64 швидше)"""
+    keys = np.sort(keys)
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+
+def _over(keys, limit):
+    """Унікальні ключі, що зустрічаються частіше за limit, і їхні кількості"""
+    unique, counts = np.unique(keys, return_counts=True)
+    mask = counts > limit
+    return unique[mask], counts[mask]
+
+
+def find_violations(lessons, max_daily, hours_per_lesson, allowed_hours=None):
+    """
+    Усі порушення у вигляді масивів; allowed_hours — пара масивів (teacher_ids, hours) або None.
+    Повертає словник вид -> кортеж масивів:
+    teacher_conflict / subgroup_conflict — (id, day, minute, count),
+    subgroup_daily — (subgroup_id, day, count), teacher_hours — (teacher_id, hours, allowed).
+    """
+    if not len(lessons.id):
+        empty = np.empty(0, np.int64)
+        return {'teacher_conflict': (empty,) * 4, 'subgroup_conflict': (empty,) * 4,
+                'subgroup_daily': (empty,) * 3, 'teacher_hours': (empty,) * 3}
+
+    teacher, teachers = _compact(lessons.teacher)
+    subgroup, subgroups = _compact(lessons.subgroup)
+    course, _ = _compact(lessons.course)
+    day, days = _compact(lessons.day)
+    slot, minutes = _compact(lessons.minute)
+    n_slots = len(minutes)
+    n_days = len(days)
+
+    # (день, пара) -> один індекс слоту; далі ключі (суб'єкт, слот) і (суб'єкт, день)
+    day_slot = day * n_slots + slot
+    n_day_slots = n_days * n_slots
+    teacher_slot = teacher * n_day_slots + day_slot
+    subgroup_slot = subgroup * n_day_slots + day_slot
+
+    def unpack_slot(keys, counts, ids):
+        owner, rest = np.divmod(keys, n_day_slots)
+        day_index, slot_index = np.divmod(rest, n_slots)
+        return ids[owner], days[day_index], minutes[slot_index], counts
+
+    # Подія викладача: лекція — курс, практика — (курс, підгрупа); лекція на кілька
+    # підгруп дає однакові ключі і рахується один раз. Спершу унікальні (слот, подія),
+    # потім їх кількість на слот викладача.
+    event_subgroup = np.where(lessons.lecture.astype(bool), 0, subgroup + 1)
+    event, _ = _dense(course * (len(subgroups) + 1) + event_subgroup)
+    n_events = int(event.max()) + 1
+    events = _distinct(teacher_slot * n_events + event) // n_events
+    teacher_keys, teacher_counts = _over(events, 1)
+
+    subgroup_keys, subgroup_counts = _over(subgroup_slot, 1)
+
+    # Денне навантаження рахується за різними слотами, як Occupancy.subgroup_daily
+    busy = _distinct(subgroup_slot)
+    busy_day = busy // n_slots  # = subgroup * n_days + day
+    daily_keys, daily_counts = _over(busy_day, max_daily)
+    daily_subgroup, daily_day = np.divmod(daily_keys, n_days)
+
+    teacher_busy = _distinct(teacher_slot) // n_day_slots
+    hours = np.bincount(teacher_busy, minlength=len(teachers)) * hours_per_lesson
+    if allowed_hours is None:
+        hours_over = (np.empty(0, np.int64),) * 3
+    else:
+        allowed_ids, allowed = (np.asarray(values, dtype=np.int64) for values in allowed_hours)
+        limit = np.full(len(teachers), np.iinfo(np.int64).max)
+        position = np.searchsorted(teachers, allowed_ids)
+        known = (position < len(teachers)) & (teachers[np.minimum(position, len(teachers) - 1)] == allowed_ids)
+        limit[position[known]] = allowed[known]
+        over = hours > limit
+        hours_over = (teachers[over], hours[over], limit[over])
+
+    return {
+        'teacher_conflict': unpack_slot(teacher_keys, teacher_counts, teachers),
+        'subgroup_conflict': unpack_slot(subgroup_keys, subgroup_counts, subgroups),
+        'subgroup_daily': (subgroups[daily_subgroup], days[daily_day], daily_counts),
+        'teacher_hours': hours_over,
+    }
+
+
+def _records(found, max_daily):
+    """Масиви порушень -> Violation; цикл лише по знайдених порушеннях"""
+    def when(day, minute):
+        return date.fromordinal(int(day)), time(int(minute) // 60, int(minute) % 60)
+
+    records = []
+    for teacher_id, day, minute, count in zip(*found['teacher_conflict']):
+        records.append(Violation('teacher_conflict', int(teacher_id), None, *when(day, minute), int(count), 1))
+    for subgroup_id, day, minute, count in zip(*found['subgroup_conflict']):
+        records.append(Violation('subgroup_conflict', None, int(subgroup_id), *when(day, minute), int(count), 1))
+    for subgroup_id, day, count in zip(*found['subgroup_daily']):
+        records.append(Violation('subgroup_daily', None, int(subgroup_id), date.fromordinal(int(day)), None,
+                                 int(count), max_daily))
+    for teacher_id, hours, allowed in zip(*found['teacher_hours']):
+        records.append(Violation('teacher_hours', int(teacher_id), None, None, None, int(hours), int(allowed)))
+    return records
+
+
+def check_lessons(lessons, max_daily=None, hours_per_lesson=None):
+    """find_violations для вже завантажених масивів з лімітами database.planning і allowed_hours з БД"""
+    max_daily = MAX_LESSONS_FOR_SUBGROUP if max_daily is None else max_daily
+    hours_per_lesson = HOURS_PER_LESSON if hours_per_lesson is None else hours_per_lesson
+    limits = np.array(
+        Teacher.objects.filter(id__in=np.unique(lessons.teacher).tolist()).values_list('id', 'allowed_hours'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    found = find_violations(lessons, max_daily, hours_per_lesson, (limits[:, 0], limits[:, 1]))
+    return _records(found, max_daily)
+
+
+def validate_schedule(semester=None, start_date=None, end_date=None, plan_ids=None, subgroup_ids=None,
+                      teacher_ids=None, version=None, **limits):
+    """Завантажує заняття версії з БД і повертає список Violation (порожній — розклад коректний)"""
+    lessons = load_lessons(semester, start_date, end_date, plan_ids, subgroup_ids, teacher_ids, version)
+    return check_lessons(lessons, **limits)
@@ -0,0 +1,132 @@
+"""
+Версії розкладу: чернетка, атомарна публікація, очищення архівних.
+
+Запуск generate_schedule не видаляє активний розклад і не пише в нього: create_draft створює нову версію
+(building) з копією тих занять активної, що лишаються без змін, генератор пише в неї, а publish
+однією транзакцією архівує попередню активну версію, робить активною нову і перебудовує
+індекс тижнів і зведення навантаження. Читачі відбирають заняття за статусом версії
+(VersionedQuerySet.in_version) у тому самому запиті, тож до коміту publish бачать попередній
+розклад повністю, після — новий, і ніколи не чекають на генерацію. Перегенерація
+create_schedule.generate_all_plans натомість пише в активну версію лише різницю (database.diff).
+
+Чернетка пам'ятає джерело і його revision: якщо активну версію після копіювання змінили на місці
+чи опублікували іншу, publish відмовляє, бо ці зміни зникли б разом з архівованою версією
+(force — опублікувати все одно).
+
+Архівні версії видаляє prune_versions порціями, кожна у своїй короткій транзакції
+(команда schedule_versions --prune, напр. з cron).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from database.lessons import save_lessons
+from database.models import Lesson, LessonAttendance, LessonPattern, PatternAttendance, ScheduleVersion, active_version
+from database.planning import PlannedLesson
+from database.recurrence import CHUNK_SIZE, save_patterns, schedule_bounds, windows
+from database.weeks import rebuild_weeks
+from database.workload import refresh_workload
+
+KEEP_RETIRED = 2      # скільки останніх архівних версій лишати для відкату
+DELETE_BATCH = 5000   # подій або серій на одну транзакцію видалення
+
+COPY_FIELDS = ('lesson__course_id', 'subgroup_id', 'date', 'start_time', 'lesson__lesson_type')
+
+
+def create_draft(label='', courses=None):
+    """
+    Нова версія (building) з копією активного розкладу — подій і серій курсів courses
+    (QuerySet Course; None — усіх, Course.objects.none() — порожня версія).
+    Події копіюються вікнами по WINDOW_DAYS днів через save_lessons, серії — через save_patterns.
+    """
+    source = active_version()
+    draft = ScheduleVersion.objects.create(label=label, source=source, source_revision=source.revision)
+    lessons = LessonAttendance.objects.in_version(source)
+    patterns = LessonPattern.objects.in_version(source)
+    if courses is not None:
+        lessons = lessons.filter(lesson__course__in=courses)
+        patterns = patterns.filter(course__in=courses)
+
+    first, last = schedule_bounds(source)
+    for window_start, window_end in windows(first, last) if first is not None else ():
+        rows = lessons.filter(date__range=(window_start, window_end)).values_list(*COPY_FIELDS)
+        save_lessons([PlannedLesson(*row) for row in rows.iterator(chunk_size=CHUNK_SIZE)], version=draft)
+
+    subgroups = defaultdict(list)
+    attendance = PatternAttendance.objects.filter(pattern__in=patterns).values_list('pattern_id', 'subgroup_id')
+    for pattern_id, subgroup_id in attendance.iterator(chunk_size=CHUNK_SIZE):
+        subgroups[pattern_id].append(subgroup_id)
+    save_patterns([
+        (LessonPattern(version=draft, course_id=pattern.course_id, weekday=pattern.weekday,
+                       start_time=pattern.start_time, lesson_type=pattern.lesson_type,
+                       start_date=pattern.start_date, end_date=pattern.end_date, exceptions=pattern.exceptions),
+         subgroups[pattern.pk])
+        for pattern in patterns.iterator(chunk_size=CHUNK_SIZE) if subgroups[pattern.pk]
+    ], draft, check=False)  # серії активної версії вже перевірені під час запису
+    return draft
+
+
+def is_stale(version, active):
+    """Чи змінилася активна версія active після копіювання чернетки version"""
+    if version.source_revision is None:  # чернетка не з копії активної
+        return False
+    return active is None or active.pk != version.source_id or active.revision != version.source_revision
+
+
+def publish(version, force=False):
+    """
+    Робить чернетку активною: попередня активна версія архівується, індекс тижнів і зведення
+    навантаження перебудовуються в тій самій транзакції, кеш скидається після коміту.
+    Чернетку, скопійовану з розкладу, що відтоді змінився (is_stale), публікує лише force.
+    """
+    with transaction.atomic():
+        version = ScheduleVersion.objects.select_for_update().get(pk=version.pk)
+        if version.status != ScheduleVersion.STATUS_BUILDING:
+            raise ValueError(f"Only a building version can be published, #{version.pk} is {version.status}")
+        # Блокування активної версії чекає на записи в неї, що вже йдуть (вони збільшують revision)
+        active = ScheduleVersion.objects.select_for_update().filter(status=ScheduleVersion.STATUS_ACTIVE).first()
+        if not force and is_stale(version, active):
+            raise ValueError(
+                f"The active schedule changed after draft #{version.pk} was copied from it; "
+                f"regenerate the draft or publish it with force"
+            )
+        if active is not None:
+            active.status = ScheduleVersion.STATUS_RETIRED
+            active.save(update_fields=['status'])
+        version.status = ScheduleVersion.STATUS_ACTIVE
+        version.published_at = timezone.now()
+        version.save(update_fields=['status', 'published_at'])
+        rebuild_weeks()
+        refresh_workload()
+    return version
+
+
+def _delete_batches(queryset):
+    """Видаляє рядки порціями по DELETE_BATCH, кожна порція — окрема транзакція"""
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:DELETE_BATCH])
+        if not ids:
+            return
+        with transaction.atomic():
+            queryset.model.objects.filter(id__in=ids).delete()
+
+
+def prune_versions(keep=KEEP_RETIRED, drafts=False):
+    """
+    Видаляє архівні версії, крім keep останніх опублікованих; drafts — ще й чернетки без запуску
+    generate_schedule. Чернетки запусків лишаються: незавершений продовжує --resume, а завершений
+    з --no-publish чекає на schedule_versions --publish. Повертає id видалених версій.
+    """
+    retired = ScheduleVersion.objects.filter(status=ScheduleVersion.STATUS_RETIRED).order_by('-published_at', '-id')
+    stale = list(retired.values_list('id', flat=True)[keep:])
+    if drafts:
+        stale += list(
+            ScheduleVersion.objects.filter(status=ScheduleVersion.STATUS_BUILDING, runs__isnull=True)
+            .values_list('id', flat=True)
+        )
+    for version_id in stale:
+        _delete_batches(Lesson.objects.filter(version_id=version_id))
+        _delete_batches(LessonPattern.objects.filter(version_id=version_id))
+        ScheduleVersion.objects.filter(pk=version_id).delete()
+    return stale
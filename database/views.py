@@ -1,10 +1,27 @@
+from bisect import bisect_left
+from urllib.parse import urlencode
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
 
-from database.models import Lesson, Subgroup
+from database.models import Course, Lesson, Subgroup, Teacher
+from database.cache import (
+    cached_teacher_grid, cached_week_grid, cached_week_payload, cached_weeks, feed_version, week_version,
+)
+from database.export import iter_columnar, iter_csv, lesson_rows
+from database.ical import subgroup_calendar, teacher_calendar
+from database.recurrence import window_rows
+from database.grid import filter_lessons, filter_patterns, parse_filters
+from database.weeks import week_list
+from database.workload import subgroup_report, teacher_report
 
 
 # Create your views here.
@@ -39,150 +56,293 @@ def logout_view(request):
 
 import datetime
 
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_ORDER = ('date', 'start_time', 'lesson_id')
+DASHBOARD_FIELDS = DASHBOARD_ORDER + (
+    'lesson__lesson_type', 'lesson__course_id', 'lesson__course__course_name',
+    'subgroup__group__name', 'subgroup__number',
+)
+SUBGROUP_SELECT_LIMIT = 300
+
+
+def _parse_day(value, default):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date() if value else default
+    except ValueError:
+        return default
+
+
+def _parse_cursor(value):
+    """Курсор keyset-пагінації 'YYYY-MM-DD_HH:MM:SS_id' -> (date, time, id) або None"""
+    try:
+        day, moment, lesson_id = value.split('_')
+        return (datetime.date.fromisoformat(day), datetime.time.fromisoformat(moment), int(lesson_id))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _dashboard_lesson(row):
+    """Lesson для шаблону дашборду з рядка DASHBOARD_FIELDS; заняття серії — без id"""
+    day, start_time, lesson_id, lesson_type, course_id, course_name, group_name, number = row
+    lesson = Lesson(id=lesson_id if lesson_id > 0 else None, date=day, start_time=start_time,
+                    lesson_type=lesson_type, course=Course(id=course_id, course_name=course_name))
+    lesson.group_name, lesson.subgroup_number = group_name, number
+    return lesson
+
+
+def _subgroup_options(selected_id=None):
+    """
+    Підгрупи для селектора одним запитом разом з назвою групи.
+    Якщо їх більше за SUBGROUP_SELECT_LIMIT, повертає (None, ...) — шаблон показує пошук.
+    """
+    options = list(
+        Subgroup.objects.order_by('group__name', 'number')
+        .values_list('id', 'group__name', 'number')[:SUBGROUP_SELECT_LIMIT + 1]
+    )
+    if len(options) > SUBGROUP_SELECT_LIMIT:
+        selected = Subgroup.objects.filter(pk=selected_id).values_list('id', 'group__name', 'number') \
+            if selected_id else []
+        return None, [(pk, f"{name} / {number}") for pk, name, number in selected]
+    return [(pk, f"{name} / {number}") for pk, name, number in options], []
+
+
 @login_required(login_url='login')
 def dashboard(request):
-    # 1) Зчитуємо параметри
+    # 1) Зчитуємо параметри: ?date= — один день (як раніше), ?start=&end= — діапазон
     subgroup_id = request.GET.get('subgroup')
-    date_str    = request.GET.get('date')
+    today = datetime.date.today()
+    if request.GET.get('start'):
+        start = _parse_day(request.GET.get('start'), today)
+        end = max(_parse_day(request.GET.get('end'), start), start)
+    else:
+        start = end = _parse_day(request.GET.get('date'), today)
 
     # 2) За замовчуванням — lessons=None
     lessons = None
+    next_cursor = None
 
-    # 3) Якщо є subgroup — обов’язково повертаємо QuerySet (можливо порожній)
+    # 3) Якщо є subgroup — сторінка занять діапазону, keyset-пагінація за (date, start_time, id)
     if subgroup_id:
-        # Парсимо дату, або беремо сьогодні
-        if date_str:
-            try:
-                parsed_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-            except ValueError:
-                parsed_date = datetime.date.today()
+        if not subgroup_id.isdigit():
+            lessons = []
         else:
-            parsed_date = datetime.date.today()
-
-        # Формуємо QuerySet (може бути порожнім)
-        lessons = (
-            Lesson.objects
-                  .filter(subgroup__id=subgroup_id, date=parsed_date)
-                  .order_by('course__course_name')
-                  .distinct('course__course_name')[:10]
-        )
+            # Події підгрупи через її відвідування (діапазон іде індексом attendance_subgroup_slot_uniq)
+            # разом із заняттями її щотижневих серій, розгорнутими лише в цей діапазон
+            filters = {'subgroup': int(subgroup_id)}
+            rows = list(window_rows(
+                filter_lessons(filters=filters), filter_patterns(filters=filters), DASHBOARD_FIELDS, start, end,
+                order=DASHBOARD_ORDER, after=_parse_cursor(request.GET.get('after')), limit=DASHBOARD_PAGE_SIZE,
+            ))
+            lessons = [_dashboard_lesson(row) for row in rows]
+            if len(rows) == DASHBOARD_PAGE_SIZE:
+                day, moment, lesson_id = rows[-1][:3]
+                next_cursor = f"{day.isoformat()}_{moment.isoformat()}_{lesson_id}"
 
-    # 4) Завжди передаємо підгрупи для селектора
-    subgroups = Subgroup.objects.all()
+    # 4) Підгрупи для селектора — одним запитом, або пошук, якщо їх забагато
+    subgroups, selected_subgroups = _subgroup_options(subgroup_id if subgroup_id and subgroup_id.isdigit() else None)
 
     # 5) Контекст
     return render(request, 'database/dashboard.html', {
-        'user':      request.user,
-        'lessons':   lessons,
-        'subgroups': subgroups,
+        'user':               request.user,
+        'lessons':            lessons,
+        'subgroups':          subgroups,
+        'selected_subgroups': selected_subgroups,
+        'start':              start,
+        'end':                end,
+        'next_query':         urlencode({'subgroup': subgroup_id, 'start': start, 'end': end,
+                                         'after': next_cursor}) if next_cursor else None,
     })
 
+
+@login_required(login_url='login')
+@require_safe
+def subgroup_search(request):
+    """Пошук підгруп за назвою групи для селектора дашборду (?q=)"""
+    query = request.GET.get('q', '').strip()
+    subgroups = Subgroup.objects.order_by('group__name', 'number')
+    if query:
+        subgroups = subgroups.filter(group__name__icontains=query)
+    return JsonResponse({'results': [
+        {'id': pk, 'label': f"{name} / {number}"}
+        for pk, name, number in subgroups.values_list('id', 'group__name', 'number')[:20]
+    ]})
+
 from django.core.paginator import Paginator
-from collections import defaultdict
-from itertools import cycle
+
+
+def _week_page(request, filters):
+    """
+    Сторінка-тиждень серед непорожніх тижнів з урахуванням фільтрів (індекс ScheduleWeek, з кешу).
+    ?from=YYYY-MM-DD без ?page= — перехід до першого непорожнього тижня, не раніше цієї дати.
+    Повертає (page_obj, понеділок, кількість занять тижня).
+    """
+    weeks = cached_weeks(lambda: week_list(filters), params=filters)
+    page_number = request.GET.get('page')
+    jump = _parse_day(request.GET.get('from'), None)
+    if not page_number and jump:
+        monday = jump - datetime.timedelta(days=jump.weekday())
+        page_number = bisect_left([week for week, _ in weeks], monday) + 1
+    page_obj = Paginator(weeks, 1).get_page(page_number or 1)
+    if not page_obj.object_list:
+        return page_obj, None, 0
+    start_week, week_lessons = page_obj.object_list[0]
+    return page_obj, start_week, week_lessons
+
+
 def schedule_view(request):
-    lessons_qs = (
-        Lesson.objects
-        .select_related('course', 'course__teacher', 'subgroup', 'subgroup__group')
-        .order_by('date', 'start_time')
-    )
+    # фільтри group / subgroup / teacher переносяться в запит; некоректні ігноруються
+    try:
+        filters = parse_filters(request.GET)
+    except ValueError:
+        filters = {}
+    page_obj, start_week, week_lessons = _week_page(request, filters)
 
-    # розбиття на тижні (як раніше)
-    if lessons_qs.exists():
-        first_date = lessons_qs.first().date
-        last_date  = lessons_qs.last().date
-        first_monday = first_date - datetime.timedelta(days=first_date.weekday())
-        last_monday  = last_date  - datetime.timedelta(days=last_date.weekday())
-        total_weeks = ((last_monday - first_monday).days // 7) + 1
-        week_starts = [ first_monday + datetime.timedelta(weeks=i) for i in range(total_weeks) ]
+    if start_week:
+        end_week = start_week + datetime.timedelta(days=6)
+        grid     = cached_week_grid(start_week, filters)
     else:
-        week_starts = []
+        end_week = None
+        grid     = {'groups': [], 'rows': [], 'course_colors': {}}
+
+    return render(request, 'database/schedule.html', {
+        'groups':        grid['groups'],
+        'rows':          grid['rows'],
+        'page_obj':      page_obj,
+        'start_week':    start_week,
+        'end_week':      end_week,
+        'course_colors': grid['course_colors'],  # передаємо до шаблону
+        'week_lessons':  week_lessons,
+        'filter_query':  urlencode(filters),     # щоб пагінація зберігала фільтри
+    })
 
-    paginator   = Paginator(week_starts, 1)
-    page_number = request.GET.get('page') or 1
-    page_obj    = paginator.get_page(page_number)
 
-    if page_obj.object_list:
-        start_week = page_obj.object_list[0]
-        end_week   = start_week + datetime.timedelta(days=6)
-        lessons    = lessons_qs.filter(date__range=(start_week, end_week))
+def teacher_schedule_view(request, teacher_id):
+    teacher = get_object_or_404(Teacher, pk=teacher_id)
+    filters = {'teacher': teacher.id}
+    page_obj, start_week, week_lessons = _week_page(request, filters)
+
+    if start_week:
+        end_week = start_week + datetime.timedelta(days=6)
+        grid     = cached_teacher_grid(start_week, filters)
     else:
-        start_week = end_week = None
-        lessons    = Lesson.objects.none()
-
-    # дні тижня
-    days = [ start_week + datetime.timedelta(days=i) for i in range(7) ] if start_week else []
-
-    # унікальні timeslots
-    timeslots = sorted({ l.start_time for l in lessons })
-
-    # групи + підгрупи
-    subgroups_qs = (
-        Subgroup.objects
-        .filter(lessons__in=lessons)
-        .select_related('group')
-        .order_by('group__name', 'number')
-        .distinct()
-    )
-    group_map = defaultdict(list)
-    for sg in subgroups_qs:
-        group_map[sg.group].append(sg)
-    groups = [ {'group': g, 'subgroups': group_map[g]} for g in sorted(group_map.keys(), key=lambda x: x.name) ]
-
-    # створюємо lesson_map[дата][час][subgroup_id] = lesson
-    lesson_map = {}
-    for l in lessons:
-        lesson_map.setdefault(l.date, {}).setdefault(l.start_time, {})[l.subgroup.id] = l
-
-    # збираємо рядки
-    rows = []
-    for day in days:
-        for idx, time in enumerate(timeslots):
-            cells = []
-            for grp in groups:
-                for sg in grp['subgroups']:
-                    cells.append( lesson_map.get(day, {}).get(time, {}).get(sg.id) )
-            rows.append({
-                'day':     day,
-                'time':    time,
-                'is_first': idx == 0,
-                'rowspan': len(timeslots),
-                'cells':   cells,
-            })
-
-    # ————— тепер мапа курсів на кольори —————
-    # беремо унікальні курси в цьому тижні
-    seen = set()
-    unique_courses = []
-    for l in lessons:
-        cid = l.course.id
-        if cid not in seen:
-            seen.add(cid)
-            unique_courses.append(l.course)
-
-    seen_teachers = set()
-    unique_teachers = []
-    for l in lessons:
-        tid = l.course.teacher.id
-        if tid not in seen_teachers:
-            seen_teachers.add(tid)
-            unique_teachers.append(l.course.teacher)
-
-    # палітра і цикл
-    palette = ['#e57373', '#81c784', '#64b5f6', '#fff176', '#ba68c8', '#4db6ac', '#ffb74d', '#a1887f', '#90a4ae',
-               '#aed581']
-    color_cycle = cycle(palette)
-
-    # мапимо ID викладача на колір
-    teacher_colors = {teacher.id: next(color_cycle) for teacher in unique_teachers}
-
-    # мапа курсів на колір викладача (щоб використовувати в шаблоні як course_colors[course.id])
-    course_colors = {course.id: teacher_colors[course.teacher.id] for course in unique_courses}
-    return render(request, 'database/schedule.html', {
-        'groups':        groups,
-        'rows':          rows,
+        end_week = None
+        grid     = {'rows': [], 'course_colors': {}}
+
+    return render(request, 'database/teacher_schedule.html', {
+        'teacher':       teacher,
+        'rows':          grid['rows'],
         'page_obj':      page_obj,
         'start_week':    start_week,
         'end_week':      end_week,
-        'course_colors': course_colors,  # передаємо до шаблону
-    })
\ No newline at end of file
+        'week_lessons':  week_lessons,
+        'course_colors': grid['course_colors'],
+    })
+
+
+def _api_query(request):
+    """(понеділок тижня, фільтри) з GET-параметрів або None, якщо параметри некоректні"""
+    if not hasattr(request, '_schedule_query'):
+        try:
+            week = request.GET.get('week')
+            day = datetime.date.fromisoformat(week) if week else datetime.date.today()
+            request._schedule_query = (day - datetime.timedelta(days=day.weekday()), parse_filters(request.GET))
+        except ValueError:
+            request._schedule_query = None
+    return request._schedule_query
+
+
+def _api_version(request):
+    """Версія тижня з кешу (без запитів до БД), одна на запит для ETag і Last-Modified"""
+    if not hasattr(request, '_schedule_version'):
+        query = _api_query(request)
+        request._schedule_version = week_version(*query) if query else (None, None)
+    return request._schedule_version
+
+
+@require_safe
+@gzip_page
+@condition(etag_func=lambda request: _api_version(request)[0],
+           last_modified_func=lambda request: _api_version(request)[1])
+def schedule_api(request):
+    """
+    Компактна JSON-сітка тижня (?week=YYYY-MM-DD, за замовчуванням поточний) з фільтрами
+    group / subgroup / teacher. Незмінений тиждень відповідає 304 за ETag або Last-Modified.
+    """
+    query = _api_query(request)
+    if query is None:
+        return JsonResponse({'error': 'Invalid week or filter'}, status=400)
+    start_week, filters = query
+    payload = cached_week_payload(start_week, filters)
+    response = JsonResponse(payload, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    response['Cache-Control'] = 'no-cache'  # клієнт кешує, але щоразу перевіряє версію
+    return response
+
+
+def _feed_version(request, **kwargs):
+    """Версія стрічки з кешу; ключ — сама стрічка (підгрупа або викладач)"""
+    if not hasattr(request, '_feed_version'):
+        request._feed_version = feed_version(kwargs)
+    return request._feed_version
+
+
+def _calendar_response(lines, filename):
+    response = StreamingHttpResponse(lines, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_safe
+@gzip_page
+@condition(etag_func=lambda request, **kwargs: _feed_version(request, **kwargs)[0],
+           last_modified_func=lambda request, **kwargs: _feed_version(request, **kwargs)[1])
+def subgroup_ical(request, subgroup_id):
+    subgroup = get_object_or_404(Subgroup.objects.select_related('group'), pk=subgroup_id)
+    lines = subgroup_calendar(subgroup, _feed_version(request, subgroup_id=subgroup_id)[1], request.get_host())
+    return _calendar_response(lines, f'subgroup-{subgroup.id}.ics')
+
+
+@require_safe
+@gzip_page
+@condition(etag_func=lambda request, **kwargs: _feed_version(request, **kwargs)[0],
+           last_modified_func=lambda request, **kwargs: _feed_version(request, **kwargs)[1])
+def teacher_ical(request, teacher_id):
+    teacher = get_object_or_404(Teacher, pk=teacher_id)
+    lines = teacher_calendar(teacher, _feed_version(request, teacher_id=teacher_id)[1], request.get_host())
+    return _calendar_response(lines, f'teacher-{teacher.id}.ics')
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'lcol': (iter_columnar, 'application/octet-stream'),
+}
+
+
+@staff_member_required
+@require_safe
+def export_lessons_view(request, extension):
+    """Повне вивантаження занять для аналітики (?start=, ?end= — необов'язковий діапазон дат)"""
+    if extension not in EXPORT_FORMATS:
+        raise Http404("Unknown export format")
+    try:
+        start = datetime.date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = datetime.date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+
+    encode, content_type = EXPORT_FORMATS[extension]
+    response = StreamingHttpResponse(encode(lesson_rows(start, end)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="lessons.{extension}"'
+    return response
+
+
+@login_required(login_url='login')
+def workload_report(request):
+    """Навантаження підгруп і викладачів з матеріалізованих зведень (database.workload)"""
+    teachers = list(teacher_report())
+    for row in teachers:
+        row.over_limit = row.scheduled_hours > row.teacher.allowed_hours
+    return render(request, 'database/workload.html', {
+        'subgroups': subgroup_report(),
+        'teachers':  teachers,
+    })
@@ -0,0 +1,157 @@
+"""
+Індекс тижнів розкладу (ScheduleWeek): для кожного непорожнього тижня —
+понеділок, кількість занять і кількість занять кожної групи, що має заняття.
+
+Пагінація, перехід до наступного непорожнього тижня і лічильники читають цей індекс
+(десятки рядків) замість агрегатів по всій таблиці занять; заняття щотижневих серій
+(LessonPattern) рахуються розгорнутими. Індекс описує лише активну версію розкладу
+(database.versions.publish перебудовує його при публікації). Індекс оновлюється тими ж
+викликами, що скидають кеш розкладу: refresh_weeks після масових записів за датами,
+rebuild_weeks після повного перестворення даних. Обидва виклики збільшують revision активної
+версії — так publish бачить, що чернетка скопійована з уже зміненого розкладу.
+"""
+import datetime
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncWeek
+
+from database.cache import invalidate_all, invalidate_dates
+from database.grid import filter_lessons, filter_patterns
+from database.models import Lesson, PatternAttendance, ScheduleVersion, ScheduleWeek
+from database.recurrence import expand_rows
+
+
+def _monday(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _summaries(lessons, patterns, start_date=None, end_date=None):
+    """
+    {понеділок: (кількість занять підгруп, {str(group_id): кількість})}: події Lesson — одним агрегатним запитом,
+    серії — розгорнутими у вікно. Тиждень береться з дати самої події Lesson: так post_save
+    заняття бачить нову дату ще до того, як Lesson.save перенесе її у відвідування.
+    """
+    rows = (
+        lessons.annotate(week=TruncWeek('date'))
+        .values_list('week', 'attendance__subgroup__group_id')
+        .annotate(total=Count('attendance'))
+        .order_by()
+    )
+    summaries = defaultdict(Counter)
+    for week, group_id, total in rows:
+        if group_id is None:  # подія без жодної підгрупи
+            continue
+        summaries[week][group_id] += total
+    for day, group_id in expand_rows(patterns, ('date', 'subgroup__group_id'), start_date, end_date):
+        summaries[_monday(day)][group_id] += 1
+    return {
+        week: (sum(groups.values()), {str(group_id): groups[group_id] for group_id in sorted(groups)})
+        for week, groups in summaries.items()
+    }
+
+
+def _replace(weeks_query, lessons, start_date=None, end_date=None):
+    """
+    Записує тижні вибірки weeks_query заново: порожні видаляються, решта вставляються або
+    оновлюються за week_start (upsert), тож паралельне оновлення того самого тижня не порушує унікальність
+    """
+    summaries = _summaries(lessons, PatternAttendance.objects.in_version(), start_date, end_date)
+    with transaction.atomic():
+        weeks_query.exclude(week_start__in=list(summaries)).delete()
+        ScheduleWeek.objects.bulk_create(
+            [
+                ScheduleWeek(week_start=week, lesson_count=count, group_counts=groups)
+                for week, (count, groups) in sorted(summaries.items())
+            ],
+            update_conflicts=True,
+            unique_fields=['week_start'],
+            update_fields=['lesson_count', 'group_counts'],
+        )
+
+
+def _touch():
+    ScheduleVersion.objects.filter(status=ScheduleVersion.STATUS_ACTIVE).update(revision=F('revision') + 1)
+
+
+def refresh_weeks(dates):
+    """
+    Перераховує тижні від першої до останньої з дат (викликати після запису в активну версію)
+    і скидає їх у кеші розкладу
+    """
+    mondays = {_monday(day) for day in dates}
+    if not mondays:
+        return
+    _touch()
+    first, last = min(mondays), max(mondays) + datetime.timedelta(days=6)
+    _replace(
+        ScheduleWeek.objects.filter(week_start__range=(first, last)),
+        Lesson.objects.in_version().filter(date__range=(first, last)),
+        first, last,
+    )
+    invalidate_dates(mondays)
+
+
+def refresh_range(start_date, end_date):
+    """Перераховує всі тижні діапазону дат"""
+    refresh_weeks([start_date, end_date])
+
+
+def rebuild_weeks():
+    """Повне перестворення індексу і скидання всього кешу розкладу"""
+    _touch()
+    _replace(ScheduleWeek.objects.all(), Lesson.objects.in_version())
+    invalidate_all()
+
+
+def indexed_weeks(group_id=None):
+    """[(понеділок, кількість занять)] непорожніх тижнів, за потреби — лише тих, де є група, з її кількістю"""
+    rows = ScheduleWeek.objects.order_by('week_start').values_list('week_start', 'lesson_count', 'group_counts')
+    if group_id is None:
+        return [(week, count) for week, count, _ in rows]
+    return [(week, groups[str(group_id)]) for week, _, groups in rows if str(group_id) in groups]
+
+
+def lesson_weeks(lessons, patterns):
+    """
+    [(понеділок, кількість)] непорожніх тижнів довільної вибірки занять підгруп (LessonAttendance)
+    і відвідувань серій (PatternAttendance) — для фільтрів, яких немає в індексі
+    """
+    weeks = dict(
+        lessons.annotate(week=TruncWeek('date')).values_list('week').annotate(total=Count('id')).order_by()
+    )
+    for (day,) in expand_rows(patterns, ('date',)):
+        monday = _monday(day)
+        weeks[monday] = weeks.get(monday, 0) + 1
+    return sorted(weeks.items())
+
+
+def week_list(filters):
+    """Непорожні тижні для сторінки: з індексу без фільтра чи за групою, інакше — агрегатом по вибірці"""
+    if set(filters) <= {'group'}:
+        return indexed_weeks(filters.get('group'))
+    return lesson_weeks(filter_lessons(filters=filters), filter_patterns(filters=filters))
+
+
+def _is_active(version_id):
+    return ScheduleVersion.objects.filter(pk=version_id, status=ScheduleVersion.STATUS_ACTIVE).exists()
+
+
+def lesson_saved(sender, instance, created=False, **kwargs):
+    """
+    post_save Lesson і LessonAttendance для поодиноких змін (адмінка, shell); чернетки індекс не зачіпають.
+    Нова подія ще без відвідувань лічильників не змінює — тиждень оновить запис її відвідувань
+    (create_lesson — одним refresh_weeks після них).
+    """
+    if created and sender is Lesson:
+        return
+    if _is_active(instance.version_id):
+        refresh_weeks([instance.date])
+
+
+def pattern_saved(sender, instance, **kwargs):
+    """post_save LessonPattern і PatternAttendance: перераховує всі тижні серії активної версії"""
+    pattern = getattr(instance, 'pattern', instance)
+    if _is_active(pattern.version_id):
+        refresh_range(pattern.start_date, pattern.end_date)
@@ -0,0 +1,91 @@
+"""
+Матеріалізовані зведення навантаження: заняття підгруп (SubgroupWorkload)
+і години викладачів (TeacherWorkload) для порівняння з Teacher.allowed_hours.
+
+Звіти (output.py, workload_report) читають лише ці таблиці; агрегація по Lesson
+і щотижневих серіях LessonPattern активної версії розкладу виконується тут, після генерації
+чи публікації розкладу — повністю або для зачеплених підгруп і викладачів.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from database.models import (
+    Lesson, LessonAttendance, LessonPattern, PatternAttendance, Subgroup, SubgroupWorkload, Teacher, TeacherWorkload,
+)
+from database.planning import HOURS_PER_LESSON
+from database.recurrence import expand_rows, occurrence_dates
+
+
+def refresh_workload(subgroup_ids=None, teacher_ids=None):
+    """
+    Перераховує зведення для заданих підгруп і викладачів (None — для всіх).
+    Заняття підгруп рахуються за LessonAttendance, викладача — за подіями Lesson,
+    заняття серій — розгорнутими; години викладача — кількість різних його слотів (дата, пара).
+    """
+    subgroups = Subgroup.objects.all()
+    subgroup_lessons = LessonAttendance.objects.in_version()
+    subgroup_patterns = PatternAttendance.objects.in_version()
+    if subgroup_ids is not None:
+        subgroups = subgroups.filter(id__in=subgroup_ids)
+        subgroup_lessons = subgroup_lessons.filter(subgroup_id__in=subgroup_ids)
+        subgroup_patterns = subgroup_patterns.filter(subgroup_id__in=subgroup_ids)
+    counts = {
+        subgroup_id: [lectures, practices]
+        for subgroup_id, lectures, practices in subgroup_lessons.values_list('subgroup_id').annotate(
+            lectures=Count('id', filter=Q(lesson__lesson_type='Lecture')),
+            practices=Count('id', filter=Q(lesson__lesson_type='Practice')),
+        ).order_by()
+    }
+    for subgroup_id, lesson_type in expand_rows(subgroup_patterns, ('subgroup_id', 'lesson__lesson_type')):
+        if lesson_type in ('Lecture', 'Practice'):
+            counts.setdefault(subgroup_id, [0, 0])[lesson_type == 'Practice'] += 1
+
+    teachers = Teacher.objects.all()
+    teacher_lessons = Lesson.objects.in_version()
+    teacher_patterns = LessonPattern.objects.in_version()
+    if teacher_ids is not None:
+        teachers = teachers.filter(id__in=teacher_ids)
+        teacher_lessons = teacher_lessons.filter(course__teacher_id__in=teacher_ids)
+        teacher_patterns = teacher_patterns.filter(course__teacher_id__in=teacher_ids)
+    rows = Counter(dict(teacher_lessons.values_list('course__teacher_id').annotate(total=Count('id')).order_by()))
+    busy = set(
+        teacher_lessons.values_list('course__teacher_id', 'date', 'start_time').distinct().order_by().iterator()
+    )
+    series = teacher_patterns.values_list(
+        'course__teacher_id', 'start_time', 'weekday', 'start_date', 'end_date', 'exceptions',
+    ).order_by().iterator()
+    for teacher_id, start_time, *dates in series:
+        for day in occurrence_dates(*dates):
+            rows[teacher_id] += 1
+            busy.add((teacher_id, day, start_time))
+    slots = Counter(teacher_id for teacher_id, _, _ in busy)
+    hours = HOURS_PER_LESSON
+
+    with transaction.atomic():
+        SubgroupWorkload.objects.filter(subgroup__in=subgroups).delete()
+        SubgroupWorkload.objects.bulk_create([
+            SubgroupWorkload(subgroup_id=subgroup_id, lectures=counts.get(subgroup_id, (0, 0))[0],
+                             practices=counts.get(subgroup_id, (0, 0))[1])
+            for subgroup_id in subgroups.values_list('id', flat=True)
+        ], batch_size=1000)
+        TeacherWorkload.objects.filter(teacher__in=teachers).delete()
+        TeacherWorkload.objects.bulk_create([
+            TeacherWorkload(teacher_id=teacher_id, lessons=rows.get(teacher_id, 0),
+                            scheduled_hours=slots[teacher_id] * hours)
+            for teacher_id in teachers.values_list('id', flat=True)
+        ], batch_size=1000)
+
+
+def subgroup_report():
+    """Підгрупи з кількістю лекцій і практик — з матеріалізованої таблиці, групи одним join"""
+    return (
+        SubgroupWorkload.objects.select_related('subgroup__group')
+        .order_by('subgroup__group__name', 'subgroup__number')
+    )
+
+
+def teacher_report():
+    """Викладачі з годинами за розкладом проти allowed_hours"""
+    return TeacherWorkload.objects.select_related('teacher').order_by('teacher__full_name')
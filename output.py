@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import argparse
 import os
 import django
 
@@ -6,23 +7,29 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")  # замініть на шлях до ваших налаштувань
 django.setup()
 
-# 2) Імпортуємо моделі
-from database.models import Subgroup, Lesson
-from django.db.models import Count, Q
+# 2) Зведення читаються з матеріалізованих таблиць (database.workload), а не агрегацією по Lesson
+from database.workload import refresh_workload, subgroup_report, teacher_report
 
-def main():
-    # 3) Анотуємо кожну підгрупу двома лічильниками: lectures і practices
-    subgroups = Subgroup.objects.annotate(
-        lectures=Count('lessons', filter=Q(lessons__lesson_type='Lecture')),
-        practices=Count('lessons', filter=Q(lessons__lesson_type='Practice')),
-    ).order_by('group__name', 'number')
+def main(refresh=False):
+    if refresh:
+        refresh_workload()
 
-    # 4) Виводимо результат
+    # 3) Кількість лекцій і практик по підгрупах
     print(f"{'Підгрупа':<20} {'Лекцій':>8} {'Практик':>8}")
     print("-" * 38)
-    for sg in subgroups:
-        name = f"{sg.group.name}/{sg.number}"
-        print(f"{name:<20} {sg.lectures:>8} {sg.practices:>8}")
+    for row in subgroup_report():
+        name = f"{row.subgroup.group.name}/{row.subgroup.number}"
+        print(f"{name:<20} {row.lectures:>8} {row.practices:>8}")
+
+    # 4) Години викладачів проти дозволеного навантаження
+    print()
+    print(f"{'Викладач':<30} {'Годин':>8} {'Дозволено':>10}")
+    print("-" * 50)
+    for row in teacher_report():
+        mark = " !" if row.scheduled_hours > row.teacher.allowed_hours else ""
+        print(f"{row.teacher.full_name:<30} {row.scheduled_hours:>8} {row.teacher.allowed_hours:>10}{mark}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Звіт навантаження підгруп і викладачів")
+    parser.add_argument('--refresh', action='store_true', help="Спершу перерахувати зведення з таблиці занять")
+    main(parser.parse_args().refresh)
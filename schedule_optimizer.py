@@ -0,0 +1,192 @@
+"""
+Пост-оптимізація готового розкладу локальним пошуком (імітація відпалу).
+
+Як і schedule_solver, працює лише з цілими номерами слотів і не залежить від Django.
+Зайнятість кожної підгрупи і викладача за день зберігається бітовою маскою пар,
+тому перевірка обмежень і зміна цільової функції для одного ходу коштують O(1)
+(O(k) для лекції на k підгруп).
+"""
+from collections import defaultdict
+import logging
+import math
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_WEIGHTS = {
+    'subgroup_gaps': 3.0,       # вікна між парами у підгрупи
+    'teacher_daily_load': 1.0,  # нерівномірність навантаження викладача по днях
+    'course_spread': 1.0,       # скупченість занять курсу в окремі тижні
+}
+
+
+class ScheduleOptimizer:
+    """
+    Ходи: перенесення одиниці в інший допустимий слот і обмін слотами двох одиниць
+    з однаковим набором підгруп. Гірший хід приймається з імовірністю exp(-delta / T).
+    """
+
+    START_TEMPERATURE = 2.0
+    END_TEMPERATURE = 0.01
+    SWAP_RATIO = 0.3
+
+    def __init__(self, units, slots, slots_per_day, week_of_day, max_daily,
+                 subgroup_masks=None, teacher_masks=None, weights=None, seed=None):
+        self.units = units
+        self.slot = list(slots)
+        self.slots_per_day = slots_per_day
+        self.week_of_day = week_of_day
+        self.max_daily = max_daily
+        self.rng = random.Random(seed)
+
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.w_gaps = weights['subgroup_gaps']
+        self.w_load = weights['teacher_daily_load']
+        self.w_spread = weights['course_spread']
+
+        # Вікна для кожної можливої маски дня: (остання - перша + 1) - кількість пар
+        self.gaps = [
+            0 if not mask else mask.bit_length() - (mask & -mask).bit_length() + 1 - mask.bit_count()
+            for mask in range(1 << slots_per_day)
+        ]
+
+        self.subgroup_mask = defaultdict(int, subgroup_masks or {})  # (subgroup_id, day) -> маска
+        self.teacher_mask = defaultdict(int, teacher_masks or {})    # (teacher_id, day) -> маска
+        self.stream_week = defaultdict(int)                          # (потік, тиждень) -> кількість
+
+        self.peers = defaultdict(list)
+        for index, unit in enumerate(units):
+            self.peers[(unit.subgroup_ids, unit.lesson_type)].append(index)
+        for index, slot in enumerate(self.slot):
+            self._drop(index, slot)
+
+        self.score = self._full_score()
+
+    @staticmethod
+    def _stream(unit):
+        return unit.course_id, unit.lesson_type, unit.subgroup_ids
+
+    def _full_score(self):
+        subgroups = {g for unit in self.units for g in unit.subgroup_ids}
+        teachers = {unit.teacher_id for unit in self.units}
+        return (
+            self.w_gaps * sum(self.gaps[m] for (g, _), m in self.subgroup_mask.items() if g in subgroups)
+            + self.w_load * sum(m.bit_count() ** 2 for (t, _), m in self.teacher_mask.items() if t in teachers)
+            + self.w_spread * sum(n * n for n in self.stream_week.values())
+        )
+
+    def run(self, iterations=10000, time_limit=None):
+        """Повертає найкращі знайдені слоти для одиниць (у тому ж порядку)"""
+        if not self.units:
+            return []
+        started = time.monotonic()
+        deadline = started + time_limit if time_limit else None
+        cooling = (self.END_TEMPERATURE / self.START_TEMPERATURE) ** (1 / max(iterations, 1))
+        temperature = self.START_TEMPERATURE
+        initial = best_score = self.score
+        best = list(self.slot)
+
+        done = 0
+        for done in range(1, iterations + 1):
+            if self.rng.random() < self.SWAP_RATIO:
+                self._try_swap(temperature)
+            else:
+                self._try_move(temperature)
+            if self.score < best_score - 1e-9:
+                best_score = self.score
+                best = list(self.slot)
+            temperature *= cooling
+            if deadline and not done % 1000 and time.monotonic() > deadline:
+                break
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Optimizer: score {initial:.1f} -> {best_score:.1f} "
+                    f"in {done} iterations ({done / max(elapsed, 1e-9):.0f} it/s)")
+        return best
+
+    def _accept(self, delta, temperature):
+        return delta <= 0 or self.rng.random() < math.exp(-delta / temperature)
+
+    def _try_move(self, temperature):
+        index = self.rng.randrange(len(self.units))
+        old = self.slot[index]
+        new = self.rng.choice(self.units[index].slots)
+        if new == old:
+            return
+        delta = self._lift(index)
+        if self._fits(index, new):
+            delta += self._drop(index, new)
+            if self._accept(delta, temperature):
+                self.score += delta
+                return
+            self._lift(index)
+        self._drop(index, old)
+
+    def _try_swap(self, temperature):
+        index = self.rng.randrange(len(self.units))
+        unit = self.units[index]
+        peers = self.peers[(unit.subgroup_ids, unit.lesson_type)]
+        other = peers[self.rng.randrange(len(peers))]
+        first, second = self.slot[index], self.slot[other]
+        if other == index or first == second:
+            return
+        delta = self._lift(index) + self._lift(other)
+        if self._fits(index, second):
+            delta += self._drop(index, second)
+            if self._fits(other, first):
+                delta += self._drop(other, first)
+                if self._accept(delta, temperature):
+                    self.score += delta
+                    return
+                self._lift(other)
+            self._lift(index)
+        self._drop(index, first)
+        self._drop(other, second)
+
+    def _fits(self, index, slot):
+        unit = self.units[index]
+        day, pair = divmod(slot, self.slots_per_day)
+        bit = 1 << pair
+        if self.teacher_mask[(unit.teacher_id, day)] & bit:
+            return False
+        for subgroup_id in unit.subgroup_ids:
+            mask = self.subgroup_mask[(subgroup_id, day)]
+            if mask & bit or mask.bit_count() >= self.max_daily:
+                return False
+        return True
+
+    def _lift(self, index):
+        """Знімає одиницю з її слоту, повертає зміну цільової функції"""
+        return self._toggle(index, self.slot[index], -1)
+
+    def _drop(self, index, slot):
+        """Ставить одиницю в слот, повертає зміну цільової функції"""
+        self.slot[index] = slot
+        return self._toggle(index, slot, 1)
+
+    def _toggle(self, index, slot, sign):
+        unit = self.units[index]
+        day, pair = divmod(slot, self.slots_per_day)
+        bit = 1 << pair
+        delta = 0.0
+
+        for subgroup_id in unit.subgroup_ids:
+            key = (subgroup_id, day)
+            mask = self.subgroup_mask[key]
+            updated = mask | bit if sign > 0 else mask & ~bit
+            delta += self.w_gaps * (self.gaps[updated] - self.gaps[mask])
+            self.subgroup_mask[key] = updated
+
+        key = (unit.teacher_id, day)
+        mask = self.teacher_mask[key]
+        count = mask.bit_count()
+        delta += self.w_load * ((count + sign) ** 2 - count ** 2)
+        self.teacher_mask[key] = mask | bit if sign > 0 else mask & ~bit
+
+        key = (self._stream(unit), self.week_of_day[day])
+        count = self.stream_week[key]
+        delta += self.w_spread * ((count + sign) ** 2 - count ** 2)
+        self.stream_week[key] = count + sign
+        return delta
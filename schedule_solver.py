@@ -0,0 +1,238 @@
+"""
+Розв'язувач розкладу як задачі задоволення обмежень (CSP).
+
+Працює лише з цілими ідентифікаторами і номерами слотів, тому не залежить від Django.
+Слот — це номер пари від початку семестру: slot = day_index * slots_per_day + pair_index.
+"""
+from collections import defaultdict, namedtuple
+import heapq
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Одне заняття, яке треба поставити в слот (лекція — одразу для всіх своїх підгруп)
+Unit = namedtuple('Unit', 'course_id teacher_id subgroup_ids lesson_type slots')
+
+SolverResult = namedtuple('SolverResult', 'assignment complete backtracks elapsed')
+
+
+class ConstraintSolver:
+    """
+    Пошук з поверненням: спочатку найбільш обмежена одиниця (MRV, купа за розміром домену),
+    після кожного призначення — forward checking по слотах викладача і підгруп.
+    Однакові одиниці (кілька годин того самого заняття) ставляться по черзі у зростаючі слоти,
+    щоб пошук не перебирав їхні перестановки.
+    Повертає найкраще повне або часткове призначення, знайдене за відведений час.
+    """
+
+    def __init__(self, units, slots_per_day, max_daily, teacher_busy=(), subgroup_busy=(),
+                 subgroup_load=None, time_budget=10.0, max_backtracks=200, seed=None):
+        self.units = units
+        self.slots_per_day = slots_per_day
+        self.max_daily = max_daily
+        self.time_budget = time_budget
+        self.max_backtracks = max_backtracks
+        self.rng = random.Random(seed)
+
+        self.teacher_used = set(teacher_busy)     # (teacher_id, slot)
+        self.subgroup_used = set(subgroup_busy)   # (subgroup_id, slot)
+        self.load = defaultdict(int, subgroup_load or {})  # (subgroup_id, day) -> кількість
+
+        self.units_by_teacher = defaultdict(list)
+        self.units_by_subgroup = defaultdict(list)
+        self.previous = [None] * len(units)  # попередня така сама одиниця
+        last_of = {}
+        for index, unit in enumerate(units):
+            self.units_by_teacher[unit.teacher_id].append(index)
+            for subgroup_id in unit.subgroup_ids:
+                self.units_by_subgroup[subgroup_id].append(index)
+            key = (unit.course_id, unit.teacher_id, tuple(unit.subgroup_ids), unit.lesson_type, tuple(unit.slots))
+            self.previous[index] = last_of.get(key)
+            last_of[key] = index
+
+        self.domains = [
+            {slot for slot in unit.slots if self._fits(unit, slot)}
+            for unit in units
+        ]
+        self.assigned = [None] * len(units)
+        # Одиниці без жодного допустимого слоту одразу пропускаємо, інакше вони блокують пошук
+        self.skipped = {index for index, domain in enumerate(self.domains) if not domain}
+        self.pending = set(range(len(units))) - self.skipped
+        # Записи (розмір домену, -кількість підгруп, index); застарілі відкидаються при виборі
+        self.queue = [self._queue_key(index) for index in self.pending]
+        heapq.heapify(self.queue)
+        self.trail = []
+        self.backtracks = 0
+        self.best = {}
+
+    def _fits(self, unit, slot):
+        if (unit.teacher_id, slot) in self.teacher_used:
+            return False
+        day = slot // self.slots_per_day
+        return all(
+            (subgroup_id, slot) not in self.subgroup_used
+            and self.load[(subgroup_id, day)] < self.max_daily
+            for subgroup_id in unit.subgroup_ids
+        )
+
+    def solve(self):
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        stack = []  # [unit, values, next_value, trail_mark]
+        stalled = 0
+
+        while time.monotonic() < deadline:
+            index = self._select_unit()
+            if index is None:
+                break
+            stack.append([index, self._order_values(index), 0, len(self.trail)])
+
+            if self._advance(stack[-1]):
+                stalled = 0  # одиницю поставлено: ліміт повернень рахується для кожної одиниці окремо
+                continue
+            while stack:
+                self._remember_best()
+                failed = stack.pop()
+                self.backtracks += 1
+                stalled += 1
+                if not stack or stalled > self.max_backtracks:
+                    # Не вдалось поставити: фіксуємо поточні призначення і пропускаємо одиницю
+                    self.pending.discard(failed[0])
+                    self.skipped.add(failed[0])
+                    stack.clear()
+                    self.trail.clear()
+                    stalled = 0
+                    break
+                if self._advance(stack[-1]):
+                    break
+
+        self._remember_best()
+        assignment = self.best
+        elapsed = time.monotonic() - started
+        complete = len(assignment) == len(self.units)
+        logger.info(f"Solver placed {len(assignment)}/{len(self.units)} units "
+                    f"in {elapsed:.2f}s with {self.backtracks} backtracks")
+        return SolverResult(assignment, complete, self.backtracks, elapsed)
+
+    def _queue_key(self, index):
+        return len(self.domains[index]), -len(self.units[index].subgroup_ids), index
+
+    def _requeue(self, index):
+        if index in self.pending:
+            heapq.heappush(self.queue, self._queue_key(index))
+
+    def _select_unit(self):
+        """
+        Найменший домен; при рівності — лекції (більше підгруп) першими, далі менший index,
+        тож з однакових одиниць (однакові домени) першою береться найраніша
+        """
+        queue = self.queue
+        while queue:
+            size, _, index = queue[0]
+            if index in self.pending and size == len(self.domains[index]):
+                return index
+            heapq.heappop(queue)
+        return None
+
+    def _order_values(self, index):
+        """
+        Спершу слоти в менш завантажені дні, щоб рівномірно розподілити заняття;
+        лише слоти після слоту попередньої такої самої одиниці (порушення симетрії)
+        """
+        unit = self.units[index]
+
+        def day_load(slot):
+            day = slot // self.slots_per_day
+            return sum(self.load[(subgroup_id, day)] for subgroup_id in unit.subgroup_ids)
+
+        previous = self.previous[index]
+        while previous is not None and self.assigned[previous] is None:  # пропущені одиниці не обмежують
+            previous = self.previous[previous]
+        values = list(self.domains[index])
+        if previous is not None:
+            values = [slot for slot in values if slot > self.assigned[previous]]
+        self.rng.shuffle(values)
+        values.sort(key=day_load)
+        return values
+
+    def _advance(self, frame):
+        index, values, position, mark = frame
+        self._undo(mark)
+        while position < len(values):
+            slot = values[position]
+            position += 1
+            frame[2] = position
+            if self._assign(index, slot):
+                return True
+            self._undo(mark)
+        return False
+
+    def _assign(self, index, slot):
+        unit = self.units[index]
+        day = slot // self.slots_per_day
+        self.assigned[index] = slot
+        self.pending.discard(index)
+        self.trail.append(('assign', index, slot))
+
+        self.teacher_used.add((unit.teacher_id, slot))
+        for subgroup_id in unit.subgroup_ids:
+            self.subgroup_used.add((subgroup_id, slot))
+            self.load[(subgroup_id, day)] += 1
+
+        # Forward checking: прибираємо слот у сусідів і весь день, якщо підгрупа вичерпала ліміт
+        ok = self._prune(self.units_by_teacher[unit.teacher_id], (slot,))
+        day_slots = range(day * self.slots_per_day, (day + 1) * self.slots_per_day)
+        for subgroup_id in unit.subgroup_ids:
+            neighbours = self.units_by_subgroup[subgroup_id]
+            ok = self._prune(neighbours, (slot,)) and ok
+            if self.load[(subgroup_id, day)] >= self.max_daily:
+                ok = self._prune(neighbours, day_slots) and ok
+        return ok
+
+    def _prune(self, neighbours, slots):
+        ok = True
+        for other in neighbours:
+            if other not in self.pending:
+                continue
+            domain = self.domains[other]
+            size = len(domain)
+            for slot in slots:
+                if slot in domain:
+                    domain.discard(slot)
+                    self.trail.append(('prune', other, slot))
+            if len(domain) != size:
+                self._requeue(other)
+            if not domain:
+                ok = False
+        return ok
+
+    def _undo(self, mark):
+        while len(self.trail) > mark:
+            entry = self.trail.pop()
+            if entry[0] == 'prune':
+                self.domains[entry[1]].add(entry[2])
+                self._requeue(entry[1])
+                continue
+            _, index, slot = entry
+            unit = self.units[index]
+            day = slot // self.slots_per_day
+            self.assigned[index] = None
+            self.pending.add(index)
+            self._requeue(index)
+            self.teacher_used.discard((unit.teacher_id, slot))
+            for subgroup_id in unit.subgroup_ids:
+                self.subgroup_used.discard((subgroup_id, slot))
+                self.load[(subgroup_id, day)] -= 1
+
+    def _assigned_count(self):
+        return len(self.assigned) - self.assigned.count(None)
+
+    def _current(self):
+        return {index: slot for index, slot in enumerate(self.assigned) if slot is not None}
+
+    def _remember_best(self):
+        if self._assigned_count() > len(self.best):
+            self.best = self._current()